@@ -0,0 +1,149 @@
+"""
+Local alarm rules
+Compiles threshold, hysteresis, duration and staleness rules once and
+evaluates them against each snapshot with cost linear in the number of
+rules, reporting only state transitions
+"""
+
+import time
+import config
+
+# Compiled operator codes
+OP_BELOW = 0       # value < set threshold, clears at value >= clear threshold
+OP_ABOVE = 1       # value > set threshold, clears at value <= clear threshold
+OP_ABS_ABOVE = 2   # abs(value) > set threshold, clears at abs(value) <= clear threshold
+OP_STALE = 3       # value missing or stale, or snapshot older than set threshold (seconds)
+
+_OPS = {'<': OP_BELOW, '>': OP_ABOVE, 'abs>': OP_ABS_ABOVE, 'stale': OP_STALE}
+
+# Indexes into a compiled rule
+_NAME, _FIELD, _OP, _SET, _CLEAR, _DELAY_MS = range(6)
+
+
+def compile_rules(rules):
+    """
+    Validate and compile rule tuples
+
+    Args:
+        rules: Iterable of (name, field, op, set_value, clear_value, delay_s);
+               op is '<', '>', 'abs>' or 'stale'; clear_value None means no
+               hysteresis (clears at set_value); for 'stale' set_value is the
+               max snapshot age in seconds
+
+    Returns:
+        List of compiled rules
+
+    Raises:
+        ValueError: On an unknown operator or duplicate name
+    """
+    compiled = []
+    names = set()
+    for name, field, op, set_value, clear_value, delay_s in rules:
+        if op not in _OPS:
+            raise ValueError(f"alarm {name}: unknown operator {op!r}")
+        if name in names:
+            raise ValueError(f"duplicate alarm name {name}")
+        names.add(name)
+        code = _OPS[op]
+        if code == OP_STALE:
+            set_value = set_value * 1000  # Compare against age in ms
+        if clear_value is None:
+            clear_value = set_value
+        compiled.append((name, field, code, set_value, clear_value, int(delay_s * 1000)))
+    return compiled
+
+
+class AlarmEngine:
+    """Incremental evaluator for compiled alarm rules"""
+
+    def __init__(self, rules=None):
+        """
+        Args:
+            rules: Rule tuples (default config.ALARM_RULES), see compile_rules()
+        """
+        self.rules = compile_rules(config.ALARM_RULES if rules is None else rules)
+        count = len(self.rules)
+        self.active = [False] * count
+        self._pending_since = [None] * count  # ticks when the set condition started
+        self.raise_counts = [0] * count
+        self.transitions = 0
+        self.evaluations = 0
+
+    def evaluate(self, data, age_ms=0, now_ms=None):
+        """
+        Evaluate all rules against one snapshot
+
+        Args:
+            data: Data dictionary from read_all_data() (None = no data yet)
+            age_ms: Age of the snapshot (for 'stale' rules)
+            now_ms: Evaluation time in ticks_ms (default: now)
+
+        Returns:
+            List of (name, active) for rules that changed state
+        """
+        now = time.ticks_ms() if now_ms is None else now_ms
+        changes = []
+        active = self.active
+        pending = self._pending_since
+        self.evaluations += 1
+
+        for i, rule in enumerate(self.rules):
+            value = data.get(rule[_FIELD]) if data else None
+            op = rule[_OP]
+
+            if op == OP_STALE:
+                set_now = (value is None or age_ms > rule[_SET] or
+                           rule[_FIELD] in data.get('stale_fields', ()))
+                clear_now = not set_now
+            elif value is None:
+                continue  # Missing value: hold the current state
+            else:
+                if op == OP_ABS_ABOVE:
+                    value = abs(value)
+                if op == OP_BELOW:
+                    set_now = value < rule[_SET]
+                    clear_now = value >= rule[_CLEAR]
+                else:
+                    set_now = value > rule[_SET]
+                    clear_now = value <= rule[_CLEAR]
+
+            if not active[i]:
+                if not set_now:
+                    pending[i] = None
+                    continue
+                if pending[i] is None:
+                    pending[i] = now
+                if time.ticks_diff(now, pending[i]) >= rule[_DELAY_MS]:
+                    active[i] = True
+                    pending[i] = None
+                    self.raise_counts[i] += 1
+                    self.transitions += 1
+                    changes.append((rule[_NAME], True))
+            elif clear_now:
+                active[i] = False
+                self.transitions += 1
+                changes.append((rule[_NAME], False))
+
+        return changes
+
+    def active_alarms(self):
+        """
+        Returns:
+            List of names of the currently active alarms
+        """
+        return [rule[_NAME] for i, rule in enumerate(self.rules) if self.active[i]]
+
+    def get_stats(self):
+        """
+        Get alarm statistics
+
+        Returns:
+            Dictionary with evaluations, transitions, active alarm names and
+            the raise count per alarm
+        """
+        return {
+            'evaluations': self.evaluations,
+            'transitions': self.transitions,
+            'active': self.active_alarms(),
+            'raised': {rule[_NAME]: self.raise_counts[i] for i, rule in enumerate(self.rules)},
+        }
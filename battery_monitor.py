@@ -9,10 +9,43 @@ Copy this file to your HA-Waveshare-Display repository.
 
 from LCD_1inch28 import LCD_1inch28
 from circular_gauge import CircularGauge, rgb_to_brg565
-from image_display import display_image_with_overlays
-from image_data import get_image
+from image_stream import FlashImageSource, export_image
+import os
 import time
 
+
+def split_sequence(line):
+    """
+    Split the optional feedback sequence number off a received line
+
+    With UART_FEEDBACK_ENABLED on the Pico every message ends in ';<seq>'
+    (e.g. 'BATTERY:75;42'); without it the line is returned unchanged.
+
+    Args:
+        line: Decoded, stripped UART line
+
+    Returns:
+        Tuple of (line without the suffix, seq or None)
+    """
+    head, sep, tail = line.rpartition(';')
+    if not sep or not tail.isdigit():
+        return line, None
+    return head, int(tail)
+
+
+def send_ack(uart, seq, start_ms):
+    """
+    Acknowledge a processed message so the Pico can pace its updates
+
+    Args:
+        uart: UART connected to the Pico (its RX pin)
+        seq: Sequence number from split_sequence()
+        start_ms: time.ticks_ms() taken when the line was received
+    """
+    render_ms = time.ticks_diff(time.ticks_ms(), start_ms)
+    uart.write(f"ACK:{seq},{render_ms}\n".encode('utf-8'))
+
+
 class BatteryMonitor:
     """Battery SOC visualization using circular gauge"""
 
@@ -31,6 +64,16 @@ class BatteryMonitor:
     # Staleness threshold (3x poll interval = 15 seconds)
     STALENESS_TIMEOUT_MS = 15000
 
+    # Background images are streamed from raw RGB565 files in flash
+    IMAGE_DIR = "/images"
+    IMAGE_WIDTH = 240
+    IMAGE_HEIGHT = 240
+
+    # Rows touched by the gauge as (start_row, end_row), or None.
+    # When set, these rows are cached in RAM and only they are restored
+    # on SOC updates; otherwise every render streams the full frame.
+    GAUGE_DIRTY_ROWS = None
+
     def __init__(self, lcd, image_index=0):
         """
         Initialize battery monitor display
@@ -59,20 +102,78 @@ class BatteryMonitor:
             clockwise=True
         )
 
-        # Load background image
+        # Open background image (streamed from flash, not loaded into RAM)
+        self.image_source = self._open_image_source(image_index)
+        self._background_drawn = False
+
+    def _open_image_source(self, image_index):
+        """
+        Open the flash copy of a background image, exporting it on first use
+
+        The image_data module is only imported when the flash file does not
+        exist yet, so normal boots never hold the full image in RAM. A file
+        of the wrong size (e.g. a different image format) is deleted and
+        exported again.
+
+        Args:
+            image_index: Which background image to use
+
+        Returns:
+            FlashImageSource or None if no image is available
+        """
+        path = f"{self.IMAGE_DIR}/bg{image_index}.rgb565"
+        try:
+            return self._make_image_source(path)
+        except OSError:
+            pass  # Not exported yet
+        except ValueError as e:
+            print(f"Warning: Invalid image file {path}: {e}, exporting again")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        except Exception as e:
+            print(f"Warning: Invalid image file {path}: {e}")
+            return None
+
         try:
-            from image_data import get_image_names
+            from image_data import get_image, get_image_names
             img_names = get_image_names()
-            if img_names and len(img_names) > image_index:
-                img_name = img_names[image_index]
-                self.image_data = get_image(img_name)
-                print(f"Battery monitor: Loaded image '{img_name}'")
-            else:
+            if not img_names or len(img_names) <= image_index:
                 print(f"Warning: No image at index {image_index}")
-                self.image_data = None
+                return None
+
+            img_name = img_names[image_index]
+            try:
+                os.mkdir(self.IMAGE_DIR)
+            except OSError:
+                pass  # Already exists
+            size = export_image(get_image(img_name), path)
+            print(f"Battery monitor: Exported image '{img_name}' to {path} ({size} bytes)")
         except Exception as e:
             print(f"Warning: Failed to load image {image_index}: {e}")
-            self.image_data = None
+            return None
+        finally:
+            # Drop the in-RAM copy before streaming from flash
+            import gc
+            gc.collect()
+
+        try:
+            return self._make_image_source(path)
+        except Exception as e:
+            print(f"Warning: Failed to open image {path}: {e}")
+            return None
+
+    def _make_image_source(self, path):
+        """Create the flash image source for path"""
+        source = FlashImageSource(
+            path,
+            width=self.IMAGE_WIDTH,
+            height=self.IMAGE_HEIGHT,
+            cache_rows=self.GAUGE_DIRTY_ROWS
+        )
+        print(f"Battery monitor: Streaming image from {path}")
+        return source
 
     def update_soc(self, soc_percentage):
         """
@@ -112,12 +213,16 @@ class BatteryMonitor:
         soc = self.current_soc if self.current_soc is not None else 0
 
         # Render image with gauge overlay
-        if self.image_data:
-            display_image_with_overlays(
-                lcd=self.lcd,
-                image_data=self.image_data,
-                gauge_items=[(self.gauge, soc)]
-            )
+        if self.image_source:
+            if self._background_drawn and self.GAUGE_DIRTY_ROWS:
+                # Only restore the rows under the gauge (from the RAM cache)
+                start_row, end_row = self.GAUGE_DIRTY_ROWS
+                self.image_source.blit_rows(self.lcd.buffer, start_row, end_row)
+            else:
+                self.image_source.blit_rows(self.lcd.buffer)
+                self._background_drawn = True
+            self.gauge.draw_full(soc)
+            self.lcd.show()
         else:
             # Fallback: just draw gauge on black background
             self.lcd.fill(0x0000)  # Black
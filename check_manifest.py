@@ -0,0 +1,117 @@
+"""
+Manifest completeness check (host tool)
+Follows every import reachable from main.py and boot.py, including the
+lazy imports inside functions, and reports local modules missing from
+manifest.py and manifest entries that do not exist
+
+Examples:
+    python check_manifest.py            # Exit status 1 if incomplete
+    python check_manifest.py --list     # Print the module file names (used by deploy.sh)
+"""
+
+import ast
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = os.path.join(ROOT, "manifest.py")
+ENTRY_POINTS = ("main.py", "boot.py")
+
+
+def read_manifest(path=MANIFEST):
+    """
+    Evaluate a MicroPython manifest with recording stubs
+
+    Returns:
+        List of module file names in manifest order
+    """
+    modules = []
+
+    def module(name, base_path=".", opt=None):
+        modules.append(name)
+
+    def ignore(*args, **kwargs):
+        pass
+
+    with open(path) as f:
+        source = f.read()
+    exec(compile(source, path, "exec"), {
+        'module': module, 'include': ignore, 'freeze': ignore,
+        'package': ignore, 'require': ignore, 'options': None,
+    })
+    return modules
+
+
+def imported_names(path):
+    """Top-level module names imported anywhere in a source file"""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return names
+
+
+def reachable_modules(entry_points=ENTRY_POINTS):
+    """
+    Local module files reachable from the entry points
+
+    Returns:
+        Set of file names (e.g. "victron_client.py")
+    """
+    seen = set()
+    pending = [name for name in entry_points if os.path.exists(os.path.join(ROOT, name))]
+    while pending:
+        filename = pending.pop()
+        if filename in seen:
+            continue
+        seen.add(filename)
+        for name in imported_names(os.path.join(ROOT, filename)):
+            candidate = name + ".py"
+            if os.path.exists(os.path.join(ROOT, candidate)) and candidate not in seen:
+                pending.append(candidate)
+    return seen
+
+
+def benchmark_modules(path=os.path.join(ROOT, "import_benchmark.py")):
+    """The MODULES tuple of import_benchmark.py, as file names"""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and getattr(node.targets[0], 'id', None) == 'MODULES':
+            return [name + ".py" for name in ast.literal_eval(node.value)]
+    return []
+
+
+def check():
+    """
+    Compare the manifest with the import graph
+
+    Returns:
+        List of problem descriptions (empty if the manifest is complete)
+    """
+    listed = read_manifest()
+    problems = []
+    for name in listed:
+        if not os.path.exists(os.path.join(ROOT, name)):
+            problems.append(f"{name}: listed in manifest.py but does not exist")
+    for name in sorted(reachable_modules() - set(listed) - {"boot.py"}):
+        problems.append(f"{name}: imported by the application but missing from manifest.py")
+    if benchmark_modules() != [name for name in listed if name != "main.py"]:
+        problems.append("import_benchmark.py: MODULES is out of step with manifest.py")
+    return problems
+
+
+if __name__ == "__main__":
+    problems = check()
+    if "--list" in sys.argv:
+        print("\n".join(read_manifest()))
+    else:
+        for problem in problems:
+            print(problem)
+        if not problems:
+            print(f"manifest.py complete: {len(read_manifest())} modules")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,106 @@
+"""
+Circuit breaker for Modbus reads
+Stops a dead unit ID or register block from costing a full request timeout
+on every poll: after repeated failures the breaker opens and reads fail
+fast, with a single probe request let through at a backed-off interval
+"""
+
+import time
+
+CLOSED = 0      # Requests flow normally
+OPEN = 1        # Requests fail fast until the retry interval has passed
+HALF_OPEN = 2   # One probe request in flight; its result closes or reopens
+
+STATE_NAMES = ('closed', 'open', 'half_open')
+
+
+class CircuitOpenError(OSError):
+    """Raised instead of a request while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Failure counter with open/half-open/closed states and probe backoff"""
+
+    def __init__(self, failure_threshold=3, open_ms=10000, max_open_ms=120000):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+            open_ms: Wait before the first probe after opening
+            max_open_ms: Upper bound for the doubling probe interval
+        """
+        self.failure_threshold = failure_threshold
+        self.base_open_ms = open_ms
+        self.max_open_ms = max_open_ms
+
+        self.state = CLOSED
+        self.failures = 0
+        self.open_ms = open_ms
+        self._opened_at = None
+
+        self.trips = 0
+        self.rejections = 0
+        self.probes = 0
+
+    def allow(self, now_ms=None):
+        """
+        Check whether a request may be sent
+
+        Args:
+            now_ms: Current ticks_ms (default: now)
+
+        Returns:
+            True to send the request (normally, or as the half-open probe)
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            now = time.ticks_ms() if now_ms is None else now_ms
+            if time.ticks_diff(now, self._opened_at) >= self.open_ms:
+                self.state = HALF_OPEN
+                self.probes += 1
+                return True
+        self.rejections += 1
+        return False
+
+    def record_success(self):
+        """Close the breaker after a successful request"""
+        self.state = CLOSED
+        self.failures = 0
+        self.open_ms = self.base_open_ms
+
+    def record_failure(self, now_ms=None):
+        """
+        Count a failed request, opening the breaker at the threshold
+
+        A failed probe reopens the breaker with a doubled interval.
+
+        Args:
+            now_ms: Current ticks_ms (default: now)
+        """
+        now = time.ticks_ms() if now_ms is None else now_ms
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.open_ms = min(self.open_ms * 2, self.max_open_ms)
+            self.state = OPEN
+            self._opened_at = now
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self._opened_at = now
+            self.trips += 1
+
+    def get_stats(self):
+        """
+        Get breaker statistics
+
+        Returns:
+            Dictionary with state name, consecutive failures, trips,
+            rejected requests, probes and the current probe interval
+        """
+        return {
+            'state': STATE_NAMES[self.state],
+            'failures': self.failures,
+            'trips': self.trips,
+            'rejections': self.rejections,
+            'probes': self.probes,
+            'open_ms': self.open_ms,
+        }
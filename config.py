@@ -16,9 +16,38 @@ WIFI_PASSWORD = "7zehc2ey"
 WIFI_TIMEOUT = 30
 CONNECT_TIMEOUT = 10
 
-# Polling interval (seconds)
+# Per-request Modbus deadline (seconds) - CONNECT_TIMEOUT only applies while connecting
+MODBUS_REQUEST_TIMEOUT = 2
+
+# Circuit breaker per unit ID and register block: after repeated failures, reads
+# fail fast and one probe is sent per interval (doubling up to the max)
+BREAKER_FAILURE_THRESHOLD = 3  # Consecutive failures that open the breaker
+BREAKER_OPEN_MS = 10000        # First probe interval
+BREAKER_MAX_OPEN_MS = 120000   # Max probe interval
+STALE_MAX_AGE_S = 300          # Serve last-known values (marked stale) up to this age
+
+# Polling interval (seconds) - Modbus is read once every POLL_INTERVAL
 POLL_INTERVAL = 5
 
+# Main loop timing: one UART message slot per UART_MESSAGE_INTERVAL_MS, held
+# against absolute deadlines so Modbus/print/UART time does not add drift
+UART_MESSAGE_INTERVAL_MS = 1000
+SCHEDULER_POLICY = "skip"    # After an overrun: "skip" missed slots or "catch_up" (max 3)
+SCHEDULER_STATS_EVERY = 60   # Print loop timing stats every N slots (0 = never)
+
+# Console logging in the main loop (console_logger.py)
+LOG_LEVEL = "INFO"           # "DEBUG", "INFO", "WARNING" or "ERROR"
+LOG_RATE_LIMIT = 20          # Max INFO/DEBUG lines per second (0 = unlimited); warnings always pass
+LOG_TABLE_EVERY = 1          # Full data table every N polls, one summary line for the others
+
+# Register response cache (per unit ID and register)
+# Reads younger than the max age are served from memory instead of Modbus
+REGISTER_CACHE_DEFAULT_TTL_MS = 500   # Covers repeated reads within one poll cycle (0 = off)
+REGISTER_CACHE_TTL_MS = {             # Per-register overrides: register or (unit_id, register)
+    61: 10000,                        # Battery temperature changes slowly
+}
+REGISTER_CACHE_MAX_ENTRIES = 64       # Oldest entries are evicted beyond this
+
 # Modbus register addresses (examples - update based on your needs)
 # See Victron Modbus TCP documentation
 REGISTERS = {
@@ -27,6 +56,56 @@ REGISTERS = {
     "battery_soc": 843,
 }
 
+# Device discovery: find unit IDs on the Cerbo GX, cached in flash and verified on boot
+DISCOVERY_ENABLED = True
+DEVICE_MAP_FILE = "device_map.json"               # Delete to force a rescan
+DISCOVERY_UNIT_IDS = [100] + list(range(200, 248))  # Candidate unit IDs
+DISCOVERY_TIMEOUT_MS = 500   # Max wait for one batch of pipelined probes
+DISCOVERY_WINDOW = 16        # Probes in flight per batch
+
+# Extended data: solar charger (MPPT) and inverter (VE.Bus) block reads
+EXTENDED_DATA_ENABLED = False  # Only enable if the installation has these devices
+
+# Derived metrics (power, Ah/Wh counters, time-to-full/empty) computed from each poll
+DERIVED_METRICS_ENABLED = True
+BATTERY_CAPACITY_AH = 200    # Usable capacity for time-to-full/empty estimates
+LOAD_SMOOTHING_S = 60        # Time constant of the smoothed load/current
+METRICS_MAX_GAP_S = 30       # Do not integrate across longer gaps between samples
+
+# Sample history in RAM (history.py): recent samples plus min/max/avg rollups
+HISTORY_ENABLED = True
+HISTORY_SAMPLES = 120        # Recent samples kept (10 min at a 5 s poll)
+HISTORY_ROLLUP_S = 300       # Rollup period (seconds)
+HISTORY_ROLLUPS = 144        # Rollup periods kept (12 h at 5 min)
+
+# Sample log in flash (sample_log.py): every poll appended to rotating segment files
+SAMPLE_LOG_ENABLED = False
+SAMPLE_LOG_DIR = "log"
+SAMPLE_LOG_SEGMENT_RECORDS = 1024  # Records per segment file (26 bytes each)
+SAMPLE_LOG_SEGMENTS = 20           # Segments kept (~520 KB, ~28 h at a 5 s poll)
+SAMPLE_LOG_BUFFER_RECORDS = 32     # Records buffered in RAM between flash writes
+SAMPLE_LOG_NTP_HOST = "pool.ntp.org"  # Set the clock once at boot, so records keep real times
+                                      # after a reboot (needs internet via the hotspot, None = off)
+
+# Bulk export over USB serial (history_export.py, read with history_pull.py on the host)
+EXPORT_ENABLED = False
+EXPORT_CHUNK_BYTES = 1024    # Max payload per chunk (rounded down to whole records)
+EXPORT_SLICE_MS = 200        # Streaming time per loop slot while an export runs
+
+# HTTP/JSON status endpoint (http_status.py): GET /status, /stats, /history
+HTTP_ENABLED = False
+HTTP_PORT = 80
+
+# Local alarms, evaluated against every snapshot (ALARM:<name>,<0|1> sent on each change)
+ALARMS_ENABLED = True
+ALARM_RULES = [
+    # (name, field, op, set, clear, delay_s) - op: '<', '>', 'abs>' or 'stale' (set = max age in s)
+    ("LOW_SOC", "battery_soc", "<", 20, 25, 30),
+    ("OVER_TEMP", "battery_temperature", ">", 45, 40, 10),
+    ("OVER_CURRENT", "battery_current", "abs>", 100, 90, 5),
+    ("STALE", "battery_voltage", "stale", 30, None, 15),
+]
+
 # UART settings for display communication
 UART_ENABLED = True          # Master enable/disable switch
 UART_ID = 0                  # UART peripheral (0 or 1)
@@ -34,7 +113,73 @@ UART_BAUDRATE = 115200       # Must match display setting
 UART_TX_PIN = 0              # GP0 (Pin 1)
 UART_RX_PIN = 1              # GP1 (Pin 2) - unused but required
 UART_DEBUG = False           # Print UART messages to console
+UART_TX_QUEUE_SIZE = 16      # Non-blocking transmit queue length (0 = blocking writes)
+UART_TX_OVERFLOW = "coalesce"  # "coalesce" (newest per type, alarms kept), or when full "drop_oldest"/"drop_newest"
+UART_TX_BUFFER = 256         # UART driver TX ring buffer (bytes)
+UART_SEND_EXTENDED = False   # Also cycle SOLAR and INVERTER messages (needs EXTENDED_DATA_ENABLED)
+UART_SEND_POWER = False      # Also cycle the POWER message (needs DERIVED_METRICS_ENABLED)
+
+# Display feedback: messages carry ";<seq>" and the display answers ACK:<seq>,<render_ms>
+# on UART_RX_PIN; the message rate then follows what the display keeps up with.
+# Needs the display-side helpers from battery_monitor.py (see DISPLAY_INTEGRATION.md)
+UART_FEEDBACK_ENABLED = False
+UART_FEEDBACK_MIN_PERIOD_MS = 200    # Fastest message slot while the display keeps up
+UART_FEEDBACK_MAX_PERIOD_MS = 4000   # Slowest message slot under load
+UART_FEEDBACK_WINDOW_MS = 3000       # Clean interval before each speed-up
+UART_FEEDBACK_STEP_HZ = 0.5          # Speed-up per clean window (messages/s)
+UART_FEEDBACK_LATE_MS = 500          # Render time over this (or ack after the next message): late, slow down
+UART_FEEDBACK_ACK_TIMEOUT_MS = 3000  # No ack after this: frame counted lost
+UART_FEEDBACK_MAX_IN_FLIGHT = 4      # More unacknowledged frames: slow down
+UART_FEEDBACK_REDUCE_BELOW = 0.75    # Below this fraction of the normal rate...
+UART_FEEDBACK_REDUCED_SLOTS = ("BATTERY", "BATSYS")  # ...only cycle these messages
+
+# Output fan-out: extra displays/loggers fed with every new snapshot, encoded once per
+# protocol however many sinks use it. Entries are dicts:
+#   {"type": "uart", "id": 1, "tx": 4, "rx": 5}   UART1 on GP4/GP5 ("baudrate" optional)
+#   {"type": "usb"}                              USB serial (shared with the console log)
+#   {"type": "file", "path": "/tmp/victron.bin"}  File (host mode)
+# plus optional "protocol": "text" (display lines) or "binary" (fixed frame with CRC,
+# see output_fanout.py) and "min_interval_ms". The display UART (UART_ID) is driven by
+# UARTManager and is skipped as a sink while UART_ENABLED.
+OUTPUT_SINKS = []
+
+# Low-power mode: one active window per period (Modbus poll + all UART messages in a
+# burst), sleeping in between with WLAN power save. Not combined with dual-core mode.
+LOW_POWER_ENABLED = False
+LOW_POWER_PERIOD_MS = 10000      # Must stay below DISPLAY_STALENESS_MS
+LOW_POWER_SLEEP = "lightsleep"   # "lightsleep" (lowest power, USB serial drops) or "idle"
+DISPLAY_STALENESS_MS = 15000     # Display's STALENESS_TIMEOUT_MS (battery_monitor.py)
+
+# Dual-core mode (RP2040): WiFi/Modbus polling on core 1, UART/console on core 0
+DUAL_CORE_ENABLED = False
+DUAL_CORE_POLL_MS = 1000     # Poll period on core 1
+
+# Stall supervisor (supervisor.py): a stage over its budget escalates socket reset ->
+# WiFi re-associate -> reboot; the hardware watchdog is fed only while no stage is stuck
+SUPERVISOR_ENABLED = False
+SUPERVISOR_BUDGETS_MS = {
+    "loop": 90000,     # Between main loop slots (includes reconnects and their 10 s retry waits)
+    "wifi": 40000,     # WiFi (re)connect - above WIFI_TIMEOUT
+    "modbus": 15000,   # Modbus connect or one read_all_data()
+    "uart": 3000,      # Sending/draining the UART messages of a slot
+    "poller": 90000,   # Between core 1 polls (dual-core mode)
+}
+SUPERVISOR_CHECK_MS = 500        # Budget check (Timer) period
+SUPERVISOR_ESCALATE_MS = 10000   # Time each recovery step gets before the next
+SUPERVISOR_WDT_MS = 8000         # Hardware watchdog (RP2040 max 8388, 0 = off; cannot be stopped once on)
+SUPERVISOR_LOG_FILE = "supervisor_log.json"  # Escalation log kept across reboots (None = RAM only)
+SUPERVISOR_LOG_SIZE = 20         # Escalation log entries kept
 
 # Demo mode settings
 DEMO_PIN = 2                 # GP2 - connect to GND to activate demo mode
 DEMO_PIN_PULL = 1            # 1=pull-up (normal high, grounded low)
+
+# Modbus trace recording and replay
+TRACE_RECORD_FILE = None     # e.g. "/trace.bin" - record raw Modbus responses (wears flash)
+TRACE_REPLAY_FILE = None     # e.g. "/trace.bin" - replay a recording instead of polling the Cerbo GX
+TRACE_REPLAY_SPEED = 1.0     # Playback speed multiplier (0 = one recorded cycle per poll)
+
+# Multi-site gateway (gateway.py, Linux host only)
+GATEWAY_CONCURRENCY = 64     # Max site polls in flight
+GATEWAY_SITE_DEADLINE = 3.0  # Seconds allowed for one site's full poll
+GATEWAY_POLL_INTERVAL = 5    # Seconds between polls of one site (each site has its own task)
@@ -0,0 +1,129 @@
+"""
+Console logger for the main loop
+Levelled, rate-limited logging over USB serial with deferred %-formatting,
+one timestamp per loop cycle and a preallocated line buffer written with a
+single call per line, so disabled levels cost one comparison
+"""
+
+import sys
+import time
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'ERROR': ERROR}
+_PREFIXES = {WARNING: b"WARNING: ", ERROR: b"ERROR: "}
+
+
+class ConsoleLogger:
+    """Levelled console logger with a per-second line budget"""
+
+    def __init__(self, level=INFO, rate_limit=0, line_bytes=160, stream=None):
+        """
+        Args:
+            level: Minimum level (DEBUG/INFO/WARNING/ERROR or its name)
+            rate_limit: Max DEBUG/INFO lines per second (0 = unlimited);
+                        warnings and errors are never suppressed
+            line_bytes: Size of the line buffer; longer lines are truncated
+            stream: Binary output stream (default sys.stdout)
+        """
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.rate_limit = rate_limit
+        if stream is None:
+            stream = getattr(sys.stdout, 'buffer', sys.stdout)
+        self._write = stream.write
+
+        self._buf = bytearray(line_bytes)
+        self._view = memoryview(self._buf)
+        self._stamp = b"[--:--:--] "
+
+        self._window_start = time.ticks_ms()
+        self._window_lines = 0
+        self.lines = 0
+        self.suppressed = 0
+        self._suppressed_pending = 0
+
+    def begin_cycle(self):
+        """Take the timestamp used by every line until the next cycle"""
+        t = time.localtime()
+        self._stamp = ("[%02d:%02d:%02d] " % (t[3], t[4], t[5])).encode()
+
+    def is_enabled(self, level):
+        return level >= self.level
+
+    def debug(self, fmt, *args):
+        if self.level <= DEBUG:
+            self._log(DEBUG, fmt, args, True)
+
+    def info(self, fmt, *args):
+        if self.level <= INFO:
+            self._log(INFO, fmt, args, True)
+
+    def detail(self, fmt, *args):
+        """INFO-level continuation line (no timestamp), e.g. rows of a table"""
+        if self.level <= INFO:
+            self._log(INFO, fmt, args, False)
+
+    def warning(self, fmt, *args):
+        if self.level <= WARNING:
+            self._log(WARNING, fmt, args, True)
+
+    def error(self, fmt, *args):
+        if self.level <= ERROR:
+            self._log(ERROR, fmt, args, True)
+
+    def _allow(self):
+        """Charge one line against the per-second budget"""
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._window_start) >= 1000:
+            self._window_start = now
+            self._window_lines = 0
+        if self._window_lines >= self.rate_limit:
+            return False
+        self._window_lines += 1
+        return True
+
+    def _log(self, level, fmt, args, stamped):
+        if self.rate_limit and level < WARNING and not self._allow():
+            self.suppressed += 1
+            self._suppressed_pending += 1
+            return
+
+        if self._suppressed_pending:
+            pending = self._suppressed_pending
+            self._suppressed_pending = 0
+            self._emit(_PREFIXES[WARNING], "%d log lines suppressed" % pending, True)
+
+        message = fmt % args if args else fmt
+        self._emit(_PREFIXES.get(level), message, stamped)
+
+    def _emit(self, prefix, message, stamped):
+        """Assemble one line in the buffer and write it with a single call"""
+        buf = self._buf
+        end = len(buf) - 1  # Room for the newline
+        n = 0
+        if stamped:
+            stamp = self._stamp
+            buf[0:len(stamp)] = stamp
+            n = len(stamp)
+        if prefix:
+            buf[n:n + len(prefix)] = prefix
+            n += len(prefix)
+        data = message.encode()
+        take = min(len(data), end - n)
+        buf[n:n + take] = data[:take] if take < len(data) else data
+        n += take
+        buf[n] = 10  # '\n'
+        self._write(self._view[:n + 1])
+        self.lines += 1
+
+    def get_stats(self):
+        """
+        Get logger statistics
+
+        Returns:
+            Dictionary with lines written and lines suppressed by the rate limit
+        """
+        return {'lines': self.lines, 'suppressed': self.suppressed}
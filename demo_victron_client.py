@@ -5,6 +5,7 @@ Generates realistic changing battery/solar data for testing without hardware
 
 import time
 import math
+import config
 
 class DemoVictronClient:
     """
@@ -23,6 +24,7 @@ class DemoVictronClient:
         """
         self.connected = False
         self.start_time = time.ticks_ms()
+        self.extended_data = config.EXTENDED_DATA_ENABLED
 
     def connect(self):
         """
@@ -114,6 +116,48 @@ class DemoVictronClient:
         soc = int(max(20, min(95, soc_base)))
         return soc
 
+    def read_solar_data(self):
+        """
+        Simulate solar charger: 240-second "day", up to 800W at 80-100V PV
+
+        Returns:
+            Dictionary with pv_power, pv_voltage and solar_yield_today
+        """
+        if not self.connected:
+            return {'pv_power': None, 'pv_voltage': None, 'solar_yield_today': None}
+
+        elapsed = self._get_elapsed_seconds()
+        sun = max(0.0, math.sin(elapsed * 2 * math.pi / 240.0))
+        pv_power = 800.0 * sun
+        pv_voltage = 80.0 + 20.0 * sun if sun > 0 else 0.0
+
+        # Yield follows the integral of the sun curve: 0 to 5 kWh per "day"
+        daylight = min(elapsed % 240.0, 120.0)
+        yield_today = 2.5 * (1 - math.cos(daylight * math.pi / 120.0))
+
+        return {
+            'pv_power': round(pv_power, 1),
+            'pv_voltage': round(pv_voltage, 2),
+            'solar_yield_today': round(yield_today, 1),
+        }
+
+    def read_inverter_data(self):
+        """
+        Simulate inverter: 200-600W AC load, state follows the battery current
+
+        Returns:
+            Dictionary with ac_load and inverter_state
+        """
+        if not self.connected:
+            return {'ac_load': None, 'inverter_state': None}
+
+        elapsed = self._get_elapsed_seconds()
+        ac_load = 400.0 + 200.0 * math.sin(elapsed * 2 * math.pi / 90.0)
+        current = self.read_battery_current()
+        state = 3 if current is not None and current > 0 else 9  # Bulk / Inverting
+
+        return {'ac_load': round(ac_load, -1), 'inverter_state': state}
+
     def get_charging_state(self, current=None):
         """
         Determine charging state from current
@@ -149,8 +193,17 @@ class DemoVictronClient:
             'battery_soc': self.read_battery_soc(),
             'charging_state': self.get_charging_state(battery_current),
         }
+
+        if self.extended_data:
+            data.update(self.read_solar_data())
+            data.update(self.read_inverter_data())
+
         return data
 
+    def sample_ms(self):
+        """Time of the last snapshot - mirrors VictronClient.sample_ms()"""
+        return time.ticks_ms()
+
     def close(self):
         """Simulate disconnect"""
         if self.connected:
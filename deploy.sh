@@ -1,9 +1,29 @@
 #!/bin/bash
 # Deployment script for Raspberry Pi Pico W
-# Copies all files to the Pico using mpremote
+# Copies the application modules listed in manifest.py to the Pico using mpremote
+#
+# Usage:
+#   ./deploy.sh            Copy .py sources (compiled on the Pico at every boot)
+#   ./deploy.sh --mpy      Cross-compile with mpy-cross and copy .mpy bytecode
+#   ./deploy.sh --frozen   Only boot.py, main.py and config.py (modules frozen in firmware)
+#   --bench                Also run import_benchmark.py on the Pico and save import_<mode>.txt
+
+MODE="py"
+BENCH=0
+for arg in "$@"; do
+    case "$arg" in
+        --mpy) MODE="mpy" ;;
+        --frozen) MODE="frozen" ;;
+        --bench) BENCH=1 ;;
+        *) echo "Unknown option: $arg"; exit 1 ;;
+    esac
+done
+
+# Always kept as source: run by name at boot, or meant to be edited on the device
+SOURCE_ONLY="boot.py main.py config.py"
 
 echo "=================================================="
-echo "Deploying Victron Cerbo GX Reader to Pico W"
+echo "Deploying Victron Cerbo GX Reader to Pico W ($MODE)"
 echo "=================================================="
 echo ""
 
@@ -14,6 +34,19 @@ if ! command -v mpremote &> /dev/null; then
     exit 1
 fi
 
+# Check that every imported module is in the manifest
+if ! python3 check_manifest.py; then
+    echo "ERROR: manifest.py is incomplete - add the modules above"
+    exit 1
+fi
+MODULES=$(python3 check_manifest.py --list)
+
+if [ "$MODE" = "mpy" ] && ! command -v mpy-cross &> /dev/null; then
+    echo "ERROR: mpy-cross not found"
+    echo "Install the version matching the Pico firmware, e.g.: pip install mpy-cross==1.22.2"
+    exit 1
+fi
+
 # Check if Pico is connected
 if ! mpremote ls &> /dev/null; then
     echo "ERROR: Pico W not detected"
@@ -26,11 +59,38 @@ echo ""
 
 # Copy all files
 echo "Copying files to Pico W..."
-mpremote fs cp main.py :main.py && echo "  ✓ main.py"
 mpremote fs cp boot.py :boot.py && echo "  ✓ boot.py"
-mpremote fs cp config.py :config.py && echo "  ✓ config.py"
-mpremote fs cp wifi_manager.py :wifi_manager.py && echo "  ✓ wifi_manager.py"
-mpremote fs cp victron_client.py :victron_client.py && echo "  ✓ victron_client.py"
+
+if [ "$MODE" = "mpy" ]; then
+    mkdir -p build
+fi
+
+for file in $MODULES; do
+    name="${file%.py}"
+    if [[ " $SOURCE_ONLY " == *" $file "* ]]; then
+        mpremote fs cp "$file" ":$file" && echo "  ✓ $file"
+    elif [ "$MODE" = "mpy" ]; then
+        # A .py next to the .mpy would be imported instead
+        mpy-cross "$file" -o "build/$name.mpy" || exit 1
+        mpremote fs cp "build/$name.mpy" ":$name.mpy" && echo "  ✓ $name.mpy"
+        mpremote fs rm ":$file" &> /dev/null
+    elif [ "$MODE" = "py" ]; then
+        mpremote fs cp "$file" ":$file" && echo "  ✓ $file"
+        mpremote fs rm ":$name.mpy" &> /dev/null
+    else
+        # Frozen: remove copies on the filesystem so the frozen modules are used
+        mpremote fs rm ":$file" &> /dev/null
+        mpremote fs rm ":$name.mpy" &> /dev/null
+    fi
+done
+
+if [ "$BENCH" = "1" ]; then
+    echo ""
+    echo "Measuring imports on the Pico..."
+    mpremote soft-reset
+    mpremote run import_benchmark.py | tee "import_$MODE.txt"
+    echo "Saved import_$MODE.txt - compare runs with: python import_benchmark.py import_py.txt import_$MODE.txt"
+fi
 
 echo ""
 echo "=================================================="
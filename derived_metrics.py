@@ -0,0 +1,160 @@
+"""
+Derived battery metrics
+Computes power, coulomb/energy counters, a smoothed load and time-to-full/
+time-to-empty estimates from the voltage, current and SOC already read
+each poll, in constant time per sample (no extra Modbus reads, no history)
+"""
+
+import math
+import time
+import config
+
+
+class DerivedMetrics:
+    """Incremental metrics over successive read_all_data() snapshots"""
+
+    def __init__(self, capacity_ah=None, smoothing_s=None, max_gap_s=None):
+        """
+        Args:
+            capacity_ah: Usable battery capacity (default config.BATTERY_CAPACITY_AH)
+            smoothing_s: Time constant of the smoothed load (default config.LOAD_SMOOTHING_S)
+            max_gap_s: Samples further apart than this are not integrated
+                       across (default config.METRICS_MAX_GAP_S)
+        """
+        self.capacity_ah = config.BATTERY_CAPACITY_AH if capacity_ah is None else capacity_ah
+        self.smoothing_ms = 1000 * (config.LOAD_SMOOTHING_S if smoothing_s is None else smoothing_s)
+        self.max_gap_ms = 1000 * (config.METRICS_MAX_GAP_S if max_gap_s is None else max_gap_s)
+        self.reset()
+
+    def reset(self):
+        """Clear the counters and smoothing state"""
+        self.charged_ah = 0.0
+        self.discharged_ah = 0.0
+        self.charged_wh = 0.0
+        self.discharged_wh = 0.0
+        self.avg_current = None
+        self.avg_power = None
+        self.samples = 0
+        self.gaps = 0
+        self._last_ticks = None
+        self._last_current = None
+        self._last_power = None
+
+    def update(self, data, now_ms=None):
+        """
+        Fold one snapshot into the metrics and add the derived fields to it
+
+        Adds battery_power (W), net_ah, net_wh (since start), load_power_avg
+        (smoothed W), time_to_full_min and time_to_empty_min (None when not
+        applicable) to data. Voltage or current served from last-known
+        values (listed in stale_fields) is not integrated, and battery_power
+        is then marked stale too.
+
+        Args:
+            data: Data dictionary from read_all_data()
+            now_ms: Sample time in ticks_ms (default: now), e.g. the client's
+                    sample_ms() so replays integrate over trace time
+
+        Returns:
+            The same dictionary
+        """
+        voltage = data.get('battery_voltage')
+        current = data.get('battery_current')
+        if voltage is None or current is None:
+            # Missing sample: no power, and do not integrate across the hole
+            self._last_ticks = None
+            self._add_fields(data, None)
+            return data
+
+        power = voltage * current
+        stale = data.get('stale_fields')
+        if stale and ('battery_voltage' in stale or 'battery_current' in stale):
+            # Last-known values: show them, but do not count them as charge
+            self._last_ticks = None
+            stale.append('battery_power')
+            self._add_fields(data, power)
+            return data
+
+        now = time.ticks_ms() if now_ms is None else now_ms
+
+        if self._last_ticks is not None:
+            dt_ms = time.ticks_diff(now, self._last_ticks)
+            if 0 < dt_ms <= self.max_gap_ms:
+                self._integrate(dt_ms, current, power)
+            elif dt_ms > self.max_gap_ms:
+                self.gaps += 1
+
+            # Exponential smoothing with a time constant, so irregular sample
+            # spacing weights each sample by the time it covers
+            if dt_ms > 0:
+                alpha = 1.0 - math.exp(-min(dt_ms, self.max_gap_ms) / self.smoothing_ms)
+                self.avg_current += alpha * (current - self.avg_current)
+                self.avg_power += alpha * (power - self.avg_power)
+        else:
+            if self.avg_current is None:
+                self.avg_current = current
+                self.avg_power = power
+
+        self._last_ticks = now
+        self._last_current = current
+        self._last_power = power
+        self.samples += 1
+
+        self._add_fields(data, power)
+        return data
+
+    def _integrate(self, dt_ms, current, power):
+        """Trapezoidal integration between the previous and this sample"""
+        hours = dt_ms / 3600000
+        ah = 0.5 * (self._last_current + current) * hours
+        wh = 0.5 * (self._last_power + power) * hours
+        if ah >= 0:
+            self.charged_ah += ah
+        else:
+            self.discharged_ah -= ah
+        if wh >= 0:
+            self.charged_wh += wh
+        else:
+            self.discharged_wh -= wh
+
+    def _add_fields(self, data, power):
+        data['battery_power'] = power
+        data['net_ah'] = self.charged_ah - self.discharged_ah
+        data['net_wh'] = self.charged_wh - self.discharged_wh
+        data['load_power_avg'] = self.avg_power
+        data['time_to_full_min'], data['time_to_empty_min'] = self._time_to_go(data.get('battery_soc'))
+
+    def _time_to_go(self, soc):
+        """
+        Estimate minutes to full or empty from SOC and the smoothed current
+
+        Returns:
+            Tuple (time_to_full_min, time_to_empty_min); the one not matching
+            the current direction is None
+        """
+        current = self.avg_current
+        if soc is None or current is None or not self.capacity_ah:
+            return None, None
+        if current > 0.1:
+            remaining_ah = (100 - soc) / 100 * self.capacity_ah
+            return int(remaining_ah / current * 60), None
+        if current < -0.1:
+            remaining_ah = soc / 100 * self.capacity_ah
+            return None, int(remaining_ah / -current * 60)
+        return None, None
+
+    def get_stats(self):
+        """
+        Get counter totals
+
+        Returns:
+            Dictionary with charged/discharged Ah and Wh, samples and gaps
+        """
+        return {
+            'charged_ah': self.charged_ah,
+            'discharged_ah': self.discharged_ah,
+            'charged_wh': self.charged_wh,
+            'discharged_wh': self.discharged_wh,
+            'samples': self.samples,
+            'gaps': self.gaps,
+        }
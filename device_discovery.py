@@ -0,0 +1,272 @@
+"""
+Modbus device discovery
+Finds which Victron unit IDs exist on the Cerbo GX (system, solar chargers,
+VE.Bus inverter, battery monitor) by pipelining short signature reads over
+one TCP connection, and caches the resulting device map in flash so normal
+boots only verify it
+"""
+
+import json
+import socket
+import time
+import config
+from modbus_frames import (
+    MBAP_SIZE, FC_READ_INPUT, ModbusError,
+    build_read_request, parse_mbap, parse_read_response,
+)
+
+DEVICE_MAP_VERSION = 1
+
+# Service -> a register every device of that service exposes
+SIGNATURES = (
+    ('system', 840),        # Battery voltage (com.victronenergy.system, unit 100 only)
+    ('solarcharger', 776),  # PV voltage
+    ('vebus', 31),          # VE.Bus state
+    ('battery', 259),       # Battery voltage (BMV/SmartShunt)
+)
+
+
+class ModbusProber:
+    """Pipelined single-register reads on one raw Modbus TCP connection"""
+
+    def __init__(self, host, port, timeout_ms=500, window=16):
+        """
+        Args:
+            host: Cerbo GX IP address
+            port: Modbus TCP port
+            timeout_ms: Max wait for the answers of one pipelined batch
+            window: Requests in flight per batch
+        """
+        self.host = host
+        self.port = port
+        self.timeout_ms = timeout_ms
+        self.window = window
+        self.sock = None
+        self.transaction_id = 0
+        self.requests = 0
+        self.timeouts = 0
+        self.reopens = 0
+
+    def open(self):
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        self.sock = socket.socket()
+        self.sock.settimeout(config.CONNECT_TIMEOUT)
+        self.sock.connect(addr)
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def _reopen(self):
+        """Start over on a new connection after the stream lost frame alignment"""
+        self.close()
+        self.open()
+        self.reopens += 1
+
+    def probe(self, reads):
+        """
+        Read each (unit_id, register) once, window requests at a time
+
+        Args:
+            reads: List of (unit_id, register)
+
+        Returns:
+            Dictionary (unit_id, register) -> True if answered with data,
+            False on an exception response, None on timeout
+        """
+        results = {}
+        for i in range(0, len(reads), self.window):
+            self._probe_batch(reads[i:i + self.window], results)
+        return results
+
+    def _probe_batch(self, batch, results):
+        pending = {}
+        out = bytearray()
+        for key in batch:
+            self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+            pending[self.transaction_id] = key
+            out += build_read_request(self.transaction_id, key[0], FC_READ_INPUT, key[1], 1)
+            results[key] = None
+        self.sock.sendall(out)
+        self.requests += len(batch)
+
+        deadline = time.ticks_add(time.ticks_ms(), self.timeout_ms)
+        while pending:
+            try:
+                frame = self._recv_frame(deadline)
+            except ValueError:
+                self._reopen()  # The stream lost frame alignment
+                break
+            if frame is None:
+                break
+            transaction_id, pdu = frame
+            key = pending.pop(transaction_id, None)
+            if key is None:
+                continue  # Late answer from an earlier batch
+            try:
+                parse_read_response(pdu, FC_READ_INPUT, 1)
+                results[key] = True
+            except ModbusError:
+                results[key] = False
+        self.timeouts += len(pending)
+
+    def _recv_frame(self, deadline):
+        """
+        Receive one response frame before the deadline
+
+        Returns:
+            (transaction_id, pdu), or None if no frame started in time
+
+        Raises:
+            ValueError: If the stream is misaligned: an invalid header, or a
+                        frame cut off by the deadline
+        """
+        header = self._recv_exact(MBAP_SIZE, deadline)
+        if header is None:
+            return None
+        transaction_id, pdu_length, _ = parse_mbap(header)
+        pdu = self._recv_exact(pdu_length, deadline)
+        if pdu is None:
+            raise ValueError("header without its PDU")
+        return transaction_id, pdu
+
+    def _recv_exact(self, size, deadline):
+        """
+        Receive exactly size bytes before the deadline, or None if none came
+
+        Raises:
+            ValueError: If the deadline passed after part of the bytes
+                        arrived; the rest would be read as the next frame
+        """
+        data = b""
+        while len(data) < size:
+            remaining = time.ticks_diff(deadline, time.ticks_ms())
+            if remaining <= 0:
+                break
+            self.sock.settimeout(remaining / 1000)
+            try:
+                chunk = self.sock.recv(size - len(data))
+            except OSError:
+                break  # Timed out
+            if not chunk:
+                raise OSError("connection closed")
+            data += chunk
+        if len(data) == size:
+            return data
+        if data:
+            raise ValueError(f"partial frame ({len(data)} of {size} bytes)")
+        return None
+
+
+def scan(prober, unit_ids):
+    """
+    Probe every candidate unit ID with every service signature
+
+    Args:
+        prober: Open ModbusProber
+        unit_ids: Candidate unit IDs
+
+    Returns:
+        Dictionary service -> sorted list of unit IDs
+    """
+    reads = []
+    for unit_id in unit_ids:
+        for service, register in SIGNATURES:
+            if (service == 'system') == (unit_id == 100):
+                reads.append((unit_id, register))
+    results = prober.probe(reads)
+
+    units = {}
+    for unit_id in unit_ids:
+        for service, register in SIGNATURES:
+            if results.get((unit_id, register)):
+                units.setdefault(service, []).append(unit_id)
+                break  # One service per unit ID
+    for found in units.values():
+        found.sort()
+    return units
+
+
+def verify(prober, units):
+    """
+    Check that every unit in a device map still answers its signature
+
+    Returns:
+        True if all cached units answered
+    """
+    registers = dict(SIGNATURES)
+    reads = [(unit_id, registers[service]) for service, found in units.items() for unit_id in found]
+    results = prober.probe(reads)
+    return all(results.get(key) for key in reads)
+
+
+def load_device_map(path):
+    """Load a cached device map, or None if missing or unreadable"""
+    try:
+        with open(path) as f:
+            device_map = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if device_map.get('version') != DEVICE_MAP_VERSION:
+        return None
+    return device_map
+
+
+def save_device_map(path, device_map):
+    with open(path, 'w') as f:
+        json.dump(device_map, f)
+
+
+def discover(host=None, port=None, path=None, unit_ids=None, force=False):
+    """
+    Get the device map: cached and verified, or freshly scanned
+
+    Args:
+        host: Cerbo GX IP address (default config.CERBO_IP)
+        port: Modbus TCP port (default config.CERBO_PORT)
+        path: Cache file (default config.DEVICE_MAP_FILE)
+        unit_ids: Candidate unit IDs (default config.DISCOVERY_UNIT_IDS)
+        force: Rescan even if the cache verifies
+
+    Returns:
+        Device map dictionary with 'units' (service -> unit IDs) and
+        'source' ('cache' or 'scan'), or None if the scan failed or found
+        no system unit
+    """
+    host = host or config.CERBO_IP
+    port = port or config.CERBO_PORT
+    path = path or config.DEVICE_MAP_FILE
+    unit_ids = unit_ids or config.DISCOVERY_UNIT_IDS
+
+    cached = None if force else load_device_map(path)
+    if cached and (cached.get('host'), cached.get('port')) != (host, port):
+        cached = None
+
+    prober = ModbusProber(host, port, config.DISCOVERY_TIMEOUT_MS, config.DISCOVERY_WINDOW)
+    try:
+        prober.open()
+        if cached and verify(prober, cached['units']):
+            cached['source'] = 'cache'
+            return cached
+
+        started = time.ticks_ms()
+        units = scan(prober, unit_ids)
+        elapsed = time.ticks_diff(time.ticks_ms(), started)
+        print(f"Discovery: {prober.requests} probes in {elapsed} ms, "
+              f"{prober.timeouts} timed out, {prober.reopens} reconnects, found {units}")
+    except (OSError, ValueError) as e:
+        print(f"Discovery failed: {e}")
+        return None
+    finally:
+        prober.close()
+
+    if not units.get('system'):
+        return None
+    device_map = {'version': DEVICE_MAP_VERSION, 'host': host, 'port': port, 'units': units}
+    try:
+        save_device_map(path, device_map)
+    except OSError as e:
+        print(f"Discovery: could not cache device map: {e}")
+    device_map['source'] = 'scan'
+    return device_map
@@ -0,0 +1,103 @@
+"""
+Display line protocol
+Formats the text messages understood by the display (BATTERY:75\\n etc.).
+UARTManager sends them one per slot; the text output sink sends a whole
+snapshot in one burst. Each formatter returns the complete line including
+the newline, or None when a value it needs is missing.
+"""
+
+
+def format_battery_soc(soc_percentage):
+    """BATTERY:<soc>, SOC clamped to 0-100"""
+    if soc_percentage is None:
+        return None
+    return f"BATTERY:{max(0, min(100, int(soc_percentage)))}\n"
+
+
+def format_battery_system(voltage, current, temperature):
+    """BATSYS:<voltage>,<current>,<temp>"""
+    if voltage is None or current is None or temperature is None:
+        return None
+    return f"BATSYS:{voltage:.1f},{current:.1f},{temperature:.1f}\n"
+
+
+def format_charging_state(state):
+    """CHARGING:<0|1>"""
+    if state is None:
+        return None
+    return f"CHARGING:{1 if state else 0}\n"
+
+
+def format_wifi_status(status):
+    """WIFI:<0|1|2> (disconnected, connected, skipped)"""
+    if status is None:
+        return None
+    return f"WIFI:{int(status)}\n"
+
+
+def format_demo_mode(is_demo):
+    """DEMO:<0|1>"""
+    if is_demo is None:
+        return None
+    return f"DEMO:{1 if is_demo else 0}\n"
+
+
+def format_solar(pv_power, pv_voltage, yield_today):
+    """SOLAR:<pv_power>,<pv_voltage>,<yield_today>"""
+    if pv_power is None or pv_voltage is None or yield_today is None:
+        return None
+    return f"SOLAR:{pv_power:.0f},{pv_voltage:.1f},{yield_today:.1f}\n"
+
+
+def format_inverter(ac_load, state):
+    """INVERTER:<ac_load>,<state>"""
+    if ac_load is None or state is None:
+        return None
+    return f"INVERTER:{ac_load:.0f},{int(state)}\n"
+
+
+def format_power(power, net_ah, time_to_go_min):
+    """POWER:<power>,<net_ah>,<time_to_go_min>, time to go -1 when unknown"""
+    if power is None or net_ah is None:
+        return None
+    ttg = -1 if time_to_go_min is None else int(time_to_go_min)
+    return f"POWER:{power:.0f},{net_ah:.1f},{ttg}\n"
+
+
+def format_alarm(name, active):
+    """ALARM:<name>,<0|1>"""
+    return f"ALARM:{name},{1 if active else 0}\n"
+
+
+def time_to_go(data):
+    """Minutes to full when charging, else to empty (None when idle/unknown)"""
+    minutes = data.get('time_to_full_min')
+    if minutes is None:
+        minutes = data.get('time_to_empty_min')
+    return minutes
+
+
+def format_snapshot(data, wifi_status, demo_mode):
+    """
+    Format every available message of a snapshot, in slot order
+
+    Args:
+        data: Data dictionary from read_all_data()
+        wifi_status: WIFI status code
+        demo_mode: True if demo mode is active
+
+    Returns:
+        List of lines
+    """
+    lines = (
+        format_battery_soc(data['battery_soc']),
+        format_battery_system(data['battery_voltage'], data['battery_current'],
+                              data['battery_temperature']),
+        format_charging_state(data['charging_state']),
+        format_wifi_status(wifi_status),
+        format_demo_mode(demo_mode),
+        format_solar(data.get('pv_power'), data.get('pv_voltage'), data.get('solar_yield_today')),
+        format_inverter(data.get('ac_load'), data.get('inverter_state')),
+        format_power(data.get('battery_power'), data.get('net_ah'), time_to_go(data)),
+    )
+    return [line for line in lines if line is not None]
@@ -0,0 +1,272 @@
+"""
+Dual-core operation for the RP2040
+Runs the WiFi/Modbus polling loop on core 1 and hands each decoded
+snapshot to core 0 through a lock-protected mailbox, so UART and console
+output keep a fixed cadence regardless of network latency
+
+NOTE: lwIP and the CYW43 driver are not designed for concurrent use from
+both cores. All network calls (WiFi and Modbus) therefore stay on core 1;
+core 0 must only read snapshots from the mailbox.
+"""
+
+import _thread
+import time
+import config
+from scheduler import FixedRateScheduler
+
+
+class SnapshotMailbox:
+    """
+    Single-slot mailbox holding the latest snapshot
+
+    The poller publishes a freshly built dict each cycle and the reader
+    only ever takes a reference, so swapping the reference under the lock
+    is a complete double buffer: neither side copies or mutates the
+    other's data, and the lock is held for a few bytecodes only.
+
+    The statistics served over HTTP travel the other way: core 0 builds
+    them from its own objects and publishes the dict here for core 1.
+    """
+
+    def __init__(self):
+        self._lock = _thread.allocate_lock()
+        self._data = None
+        self._wifi_connected = None
+        self._seq = 0
+        self._ticks = None
+        self._stats = None
+
+    def publish(self, data, wifi_connected):
+        """
+        Publish a new snapshot (core 1)
+
+        Args:
+            data: Data dictionary from read_all_data() (must not be mutated afterwards)
+            wifi_connected: True/False, or None when WiFi is not used
+        """
+        now = time.ticks_ms()
+        with self._lock:
+            self._data = data
+            self._wifi_connected = wifi_connected
+            self._seq += 1
+            self._ticks = now
+
+    def set_wifi_connected(self, wifi_connected):
+        """Update only the WiFi state, e.g. while reconnecting (core 1)"""
+        with self._lock:
+            self._wifi_connected = wifi_connected
+
+    def latest(self):
+        """
+        Take the latest snapshot (core 0)
+
+        Returns:
+            Tuple of (seq, data, wifi_connected, age_ms); data is None and
+            age_ms is None until the first publish
+        """
+        with self._lock:
+            seq = self._seq
+            data = self._data
+            wifi_connected = self._wifi_connected
+            ticks = self._ticks
+        age_ms = None if ticks is None else time.ticks_diff(time.ticks_ms(), ticks)
+        return seq, data, wifi_connected, age_ms
+
+    def publish_stats(self, stats):
+        """
+        Publish core 0's statistics (core 0)
+
+        Args:
+            stats: Freshly built dictionary (must not be mutated afterwards)
+        """
+        with self._lock:
+            self._stats = stats
+
+    def latest_stats(self):
+        """Take the latest statistics from core 0, or None before the first (core 1)"""
+        with self._lock:
+            return self._stats
+
+
+class NetworkPoller:
+    """Polling loop for core 1: keeps WiFi/Modbus up and publishes snapshots"""
+
+    # Stack for the core 1 thread (socket and Modbus calls need more than the default)
+    STACK_SIZE = 16 * 1024
+
+    def __init__(self, victron, wifi, mailbox, poll_ms=1000, metrics=None,
+                 history=None, status_server=None, supervisor=None):
+        """
+        Args:
+            victron: VictronClient (or demo/replay client), already connected
+            wifi: WiFiManager, or None in demo/replay mode
+            mailbox: SnapshotMailbox to publish to
+            poll_ms: Poll period (held with a FixedRateScheduler)
+            metrics: Optional DerivedMetrics, updated here before each publish
+            history: Optional History, updated here with each snapshot
+            status_server: Optional StatusServer; it is polled on this core
+                           because all network calls must stay on core 1,
+                           and serves the stats core 0 publishes to mailbox
+            supervisor: Optional Supervisor; this loop reports the "poller"
+                        heartbeat and its "wifi" and "modbus" stages
+        """
+        self.victron = victron
+        self.wifi = wifi
+        self.mailbox = mailbox
+        self.poll_ms = poll_ms
+        self.metrics = metrics
+        self.history = history
+        self.status_server = status_server
+        self.supervisor = supervisor
+
+        self.running = False
+        self._stop = False
+        self._reset_socket = False
+        self._reset_wifi = False
+        self.resets = 0
+        self.scheduler = None
+        self.poll_count = 0
+        self.error_count = 0
+        self.last_error = None
+
+    def start(self):
+        """Start the polling loop on the second core"""
+        try:
+            _thread.stack_size(self.STACK_SIZE)
+        except (AttributeError, ValueError):
+            pass  # Port without configurable thread stacks
+        self._stop = False
+        self.running = True
+        _thread.start_new_thread(self._run, ())
+
+    def stop(self, timeout_ms=None):
+        """
+        Ask the polling loop to exit and wait for it (core 0)
+
+        Args:
+            timeout_ms: Max wait (defaults to two poll periods plus the Modbus timeout)
+
+        Returns:
+            True if the loop exited in time
+        """
+        if timeout_ms is None:
+            timeout_ms = 2 * self.poll_ms + config.CONNECT_TIMEOUT * 1000
+        self._stop = True
+        start = time.ticks_ms()
+        while self.running:
+            if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                return False
+            time.sleep_ms(10)
+        return True
+
+    def request_socket_reset(self):
+        """
+        Queue a Modbus socket reset for core 1 (supervisor action; only sets
+        a flag, so it is safe from the core 0 Timer)
+        """
+        self._reset_socket = True
+        return 'queued'
+
+    def request_wifi_reset(self):
+        """Queue a WiFi link and socket reset for core 1 (supervisor action)"""
+        self._reset_wifi = True
+        return 'queued'
+
+    def _apply_resets(self):
+        """Run the queued supervisor resets (core 1 only)"""
+        if self._reset_wifi:
+            self._reset_wifi = False
+            self._reset_socket = False
+            self.resets += 1
+            if self.wifi:
+                self.wifi.reset_link()
+            self.victron.reset_socket()
+        elif self._reset_socket:
+            self._reset_socket = False
+            self.resets += 1
+            self.victron.reset_socket()
+
+    def _ensure_network(self):
+        """Reconnect WiFi and Modbus if the link dropped (core 1 only)"""
+        if self.wifi is None or self.wifi.is_connected():
+            return True
+        supervisor = self.supervisor
+        if supervisor:
+            supervisor.begin('wifi')
+        connected = self.wifi.connect(timeout=config.WIFI_TIMEOUT)
+        if supervisor:
+            supervisor.end('wifi')
+        if not connected:
+            return False
+        if supervisor:
+            supervisor.begin('modbus')
+        connected = self.victron.connect()
+        if supervisor:
+            supervisor.end('modbus')
+        return connected
+
+    def _collect_stats(self):
+        """Core 0's published statistics plus this core's (core 1 only)"""
+        stats = dict(self.mailbox.latest_stats() or {})
+        stats['poller'] = self.get_stats()
+        stats['http'] = self.status_server.get_stats()
+        return stats
+
+    def _run(self):
+        """Thread body"""
+        scheduler = FixedRateScheduler(self.poll_ms)
+        self.scheduler = scheduler
+        supervisor = self.supervisor
+        try:
+            while not self._stop:
+                if supervisor:
+                    supervisor.begin('poller')  # Heartbeat
+                try:
+                    self._apply_resets()
+                    if self._ensure_network():
+                        if supervisor:
+                            supervisor.begin('modbus')
+                        data = self.victron.read_all_data()
+                        if supervisor:
+                            supervisor.end('modbus')
+                        self.poll_count += 1
+                        if self.metrics:
+                            self.metrics.update(data, self.victron.sample_ms())
+                        wifi_connected = None if self.wifi is None else self.wifi.is_connected()
+                        self.mailbox.publish(data, wifi_connected)
+                        if self.history:
+                            self.history.add(data)
+                        if self.status_server:
+                            self.status_server.update(data, self._collect_stats, self.history)
+                    else:
+                        self.mailbox.set_wifi_connected(False)
+                    if self.status_server:
+                        self.status_server.poll()
+                except Exception as e:
+                    self.error_count += 1
+                    self.last_error = e
+                    if supervisor:
+                        supervisor.end('wifi')
+                        supervisor.end('modbus')
+
+                scheduler.wait()
+        finally:
+            if supervisor:
+                supervisor.end('poller')
+            self.running = False
+
+    def get_stats(self):
+        """
+        Get poller statistics
+
+        Returns:
+            Dictionary with poll_count, error_count, last_error, the
+            supervisor resets run and the core 1 scheduler timing
+        """
+        return {
+            'poll_count': self.poll_count,
+            'error_count': self.error_count,
+            'resets': self.resets,
+            'last_error': repr(self.last_error) if self.last_error else None,
+            'timing': self.scheduler.get_stats() if self.scheduler else None,
+        }
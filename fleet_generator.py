@@ -0,0 +1,365 @@
+"""
+Vectorized synthetic fleet generator (Linux host, needs NumPy)
+Produces Victron register images for thousands of simulated sites at once:
+the DemoVictronClient waveforms evaluated with NumPy over all sites per
+refresh, with a per-site phase and PV/load scale, optional Gaussian noise
+and injected faults. FleetRegisterSource has the same read() interface as
+DemoRegisterSource, so it can serve modbus_simulator.py and the gateway
+benchmark; a refresh costs a handful of array operations however many
+sites there are, and reads only index the latest image.
+
+Faults (started per site at --fault-rate per second, lasting on average
+--fault-s seconds):
+    offline  Every read fails (gateway target failed exception)
+    frozen   Registers stop updating
+    spike    Battery voltage reads 0 and the current 20x
+
+Examples:
+    python fleet_generator.py --sites 10000 --duration 5
+    python fleet_generator.py --sites 2000 --compare
+    python modbus_simulator.py --endpoints 300 --fleet --noise 0.02 --fault-rate 0.001
+    python gateway.py --bench 300 --fleet --fault-rate 0.01
+"""
+
+import math
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from victron_client import VictronClient
+
+FAULT_NONE = 0
+FAULT_OFFLINE = 1
+FAULT_FROZEN = 2
+FAULT_SPIKE = 3
+FAULT_NAMES = ('none', 'offline', 'frozen', 'spike')
+
+# Registers served per unit: (name, register, scale, signed), as decoded by VictronClient
+UNIT_FIELDS = {
+    VictronClient.UNIT_ID_SYSTEM: VictronClient.BATTERY_FIELDS + (
+        ('battery_temperature_k', VictronClient.TEMPERATURE_REGISTER, 0.01, False),
+    ),
+    VictronClient.UNIT_ID_SOLAR: VictronClient.SOLAR_FIELDS,
+    VictronClient.UNIT_ID_INVERTER: VictronClient.INVERTER_FIELDS,
+}
+
+
+def require_numpy():
+    """
+    Raises:
+        ImportError: With install instructions if NumPy is missing
+    """
+    if np is None:
+        raise ImportError("the fleet generator needs NumPy (pip install numpy)")
+
+
+def encode_columns(values, fields):
+    """
+    Vectorized encode_value() for one unit
+
+    Args:
+        values: Dictionary of field name -> float array (one entry per site)
+        fields: UNIT_FIELDS entry
+
+    Returns:
+        uint16 array of shape (sites, len(fields)), columns in field order
+    """
+    first = values[fields[0][0]]
+    image = np.empty((len(first), len(fields)), dtype=np.uint16)
+    for column, (name, _register, scale, signed) in enumerate(fields):
+        raw = np.rint(values[name] / scale).astype(np.int64)
+        if signed:
+            raw = np.where(raw < 0, raw + 65536, raw)
+        image[:, column] = np.clip(raw, 0, 65535)
+    return image
+
+
+class FleetRegisterSource:
+    """Register source for many simulated sites, refreshed as whole arrays"""
+
+    def __init__(self, sites, extended=True, seed=None, noise=0.0, fault_rate=0.0,
+                 fault_s=30.0, refresh_ms=100, clock=time.monotonic):
+        """
+        Args:
+            sites: Number of simulated sites (endpoints)
+            extended: Also serve the solar charger and inverter units
+            seed: Random seed for phases, scales, noise and faults
+            noise: Gaussian noise as a fraction of each waveform's amplitude
+            fault_rate: Probability per site and second that a fault starts
+            fault_s: Mean fault duration in seconds
+            refresh_ms: Reads reuse the register image for this long
+            clock: Time source in seconds
+
+        Raises:
+            ImportError: If NumPy is not installed
+        """
+        require_numpy()
+        self.sites = sites
+        self.noise = noise
+        self.fault_rate = fault_rate
+        self.fault_s = fault_s
+        self.refresh_s = refresh_ms / 1000
+        self.clock = clock
+
+        self._rng = np.random.default_rng(seed)
+        rng = self._rng
+        self.phase = rng.uniform(0.0, 3600.0, sites)   # Seconds into the waveforms
+        self.pv_scale = rng.uniform(0.5, 1.5, sites)    # Array size relative to the demo
+        self.load_scale = rng.uniform(0.5, 1.5, sites)  # AC load relative to the demo
+        self.fault = np.zeros(sites, dtype=np.int8)
+        self.fault_until = np.zeros(sites)
+
+        units = (VictronClient.UNIT_ID_SYSTEM,)
+        if extended:
+            units += (VictronClient.UNIT_ID_SOLAR, VictronClient.UNIT_ID_INVERTER)
+        self.units = units
+        self._columns = {
+            unit: {register: column for column, (_, register, _, _) in enumerate(UNIT_FIELDS[unit])}
+            for unit in units
+        }
+        self._images = {}
+        self._rows = {}  # (unit, site) -> register row as a list, per refresh
+
+        self._start = clock()
+        self._last_refresh = None
+        self.refreshes = 0
+        self.refresh_s_total = 0.0
+        self.faults_started = 0
+        self.refresh()
+
+    def _waveforms(self, t):
+        """All fields for all sites at per-site times t (seconds)"""
+        tau = 2 * math.pi
+        sin = np.sin
+        cycle = (t % 120.0) / 120.0
+        values = {
+            'battery_voltage': 50.0 + 2.0 * sin(tau * t / 60.0),
+            'battery_current': np.where(cycle < 0.5,
+                                        15.0 + 10.0 * sin(cycle * 2 * tau),
+                                        -10.0 - 5.0 * sin((cycle - 0.5) * 2 * tau)),
+            'battery_temperature': 27.5 + 2.5 * sin(tau * t / 180.0),
+            'battery_soc': np.floor(np.clip(57.5 + 37.5 * sin(tau * t / 300.0), 20, 95)),
+        }
+        if VictronClient.UNIT_ID_SOLAR in self._columns:
+            sun = np.maximum(0.0, sin(tau * t / 240.0))
+            daylight = np.minimum(t % 240.0, 120.0)
+            values['pv_power'] = 800.0 * sun * self.pv_scale
+            values['pv_voltage'] = np.where(sun > 0, 80.0 + 20.0 * sun, 0.0)
+            values['solar_yield_today'] = 2.5 * (1 - np.cos(daylight * math.pi / 120.0)) * self.pv_scale
+            values['ac_load'] = (400.0 + 200.0 * sin(tau * t / 90.0)) * self.load_scale
+            values['inverter_state'] = np.where(values['battery_current'] > 0, 3.0, 9.0)
+
+        if self.noise:
+            # One draw for every noisy field: (amplitude, name)
+            noisy = (
+                (2.0, 'battery_voltage'), (10.0, 'battery_current'), (2.5, 'battery_temperature'),
+            )
+            if 'pv_power' in values:
+                noisy += ((800.0, 'pv_power'), (200.0, 'ac_load'))
+            draws = self._rng.standard_normal((len(noisy), self.sites))
+            for row, (amplitude, name) in enumerate(noisy):
+                values[name] += draws[row] * (self.noise * amplitude)
+            if 'pv_power' in values:
+                np.maximum(values['pv_power'], 0.0, out=values['pv_power'])
+        return values
+
+    def _update_faults(self, now, dt):
+        """End expired faults and start new ones"""
+        expired = self.fault_until <= now
+        self.fault[expired] = FAULT_NONE
+        if not self.fault_rate or dt <= 0:
+            return
+        start = expired & (self._rng.random(self.sites) < self.fault_rate * dt)
+        count = int(np.count_nonzero(start))
+        if count:
+            self.fault[start] = self._rng.integers(FAULT_OFFLINE, FAULT_SPIKE + 1, count)
+            self.fault_until[start] = now + self._rng.exponential(self.fault_s, count)
+            self.faults_started += count
+
+    def refresh(self, now=None):
+        """
+        Recompute the register images of all sites
+
+        Args:
+            now: Time in seconds from clock (default: now)
+        """
+        started = time.perf_counter()
+        if now is None:
+            now = self.clock()
+        dt = 0.0 if self._last_refresh is None else now - self._last_refresh
+        self._last_refresh = now
+        self._update_faults(now, dt)
+
+        values = self._waveforms((now - self._start) + self.phase)
+        spike = self.fault == FAULT_SPIKE
+        if spike.any():
+            values['battery_voltage'][spike] = 0.0
+            values['battery_current'][spike] *= 20.0
+        values['battery_temperature_k'] = values['battery_temperature'] + 273.15
+
+        frozen = self.fault == FAULT_FROZEN
+        any_frozen = bool(self._images) and frozen.any()
+        images = {}
+        for unit in self.units:
+            image = encode_columns(values, UNIT_FIELDS[unit])
+            if any_frozen:
+                image[frozen] = self._images[unit][frozen]
+            images[unit] = image
+        self._images = images
+        self._rows = {}
+
+        self.refreshes += 1
+        self.refresh_s_total += time.perf_counter() - started
+
+    def read(self, endpoint, unit_id, start, count):
+        """
+        Read raw registers of a simulated site (same contract as DemoRegisterSource.read)
+
+        Args:
+            endpoint: Site index
+            unit_id: Modbus unit ID
+            start: Starting register address
+            count: Number of registers
+
+        Returns:
+            List of raw values (unmapped registers read as 0), an empty
+            list if no register in the range is mapped, or None if the unit
+            does not exist or the site is offline
+        """
+        if self.clock() - self._last_refresh >= self.refresh_s:
+            self.refresh()
+        columns = self._columns.get(unit_id)
+        if columns is None or self.fault[endpoint] == FAULT_OFFLINE:
+            return None
+
+        key = (unit_id, endpoint)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = self._images[unit_id][endpoint].tolist()
+
+        values = []
+        mapped = False
+        for register in range(start, start + count):
+            column = columns.get(register)
+            if column is None:
+                values.append(0)
+            else:
+                values.append(row[column])
+                mapped = True
+        return values if mapped else []
+
+    def get_stats(self):
+        """
+        Get generator statistics
+
+        Returns:
+            Dictionary with refreshes, mean refresh time (ms), faults
+            started and the sites currently in each fault state
+        """
+        stats = {
+            'sites': self.sites,
+            'refreshes': self.refreshes,
+            'refresh_mean_ms': 1000 * self.refresh_s_total / max(1, self.refreshes),
+            'faults_started': self.faults_started,
+        }
+        counts = np.bincount(self.fault, minlength=len(FAULT_NAMES))
+        for code in range(FAULT_OFFLINE, len(FAULT_NAMES)):
+            stats['faulted_' + FAULT_NAMES[code]] = int(counts[code])
+        return stats
+
+
+def add_arguments(parser):
+    """Add the fleet options to a simulator/benchmark argument parser"""
+    parser.add_argument("--fleet", action="store_true",
+                        help="Generate registers with the vectorized fleet generator (needs NumPy)")
+    parser.add_argument("--seed", type=int, help="Fleet random seed")
+    parser.add_argument("--noise", type=float, default=0.0,
+                        help="Fleet noise as a fraction of each waveform's amplitude")
+    parser.add_argument("--fault-rate", type=float, default=0.0,
+                        help="Fleet faults started per site per second")
+    parser.add_argument("--fault-s", type=float, default=30.0, help="Mean fleet fault duration")
+    parser.add_argument("--refresh-ms", type=float, default=100, help="Fleet register image lifetime")
+
+
+def source_from_args(args, sites, extended=True):
+    """FleetRegisterSource configured by the add_arguments() options"""
+    return FleetRegisterSource(sites, extended=extended, seed=args.seed, noise=args.noise,
+                               fault_rate=args.fault_rate, fault_s=args.fault_s,
+                               refresh_ms=args.refresh_ms)
+
+
+def bench(source, duration):
+    """
+    Time back-to-back refreshes, then reads of the battery block
+
+    Returns:
+        Tuple of (site samples per second, reads per second)
+    """
+    end = time.perf_counter() + duration / 2
+    refreshes = 0
+    started = time.perf_counter()
+    while time.perf_counter() < end:
+        source.refresh()
+        refreshes += 1
+    samples_per_s = refreshes * source.sites / (time.perf_counter() - started)
+
+    start, count = VictronClient.BATTERY_BLOCK
+    unit = VictronClient.UNIT_ID_SYSTEM
+    end = time.perf_counter() + duration / 2
+    reads = 0
+    started = time.perf_counter()
+    while time.perf_counter() < end:
+        for endpoint in range(0, source.sites, max(1, source.sites // 1000)):
+            source.read(endpoint, unit, start, count)
+            reads += 1
+    return samples_per_s, reads / (time.perf_counter() - started)
+
+
+def bench_scalar(sites, duration):
+    """Site samples per second of DemoRegisterSource (scalar math per site)"""
+    from modbus_simulator import DemoRegisterSource, install_host_runtime
+    install_host_runtime()
+    source = DemoRegisterSource(sites)
+    units = (VictronClient.UNIT_ID_SYSTEM, VictronClient.UNIT_ID_SOLAR, VictronClient.UNIT_ID_INVERTER)
+    end = time.perf_counter() + duration
+    samples = 0
+    started = time.perf_counter()
+    while time.perf_counter() < end:
+        for endpoint in range(sites):
+            for unit in units:
+                source._unit_registers(endpoint, unit)
+        samples += sites
+    return samples / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vectorized Victron fleet generator benchmark")
+    parser.add_argument("--sites", type=int, default=10000, help="Number of simulated sites")
+    parser.add_argument("--duration", type=float, default=4, help="Seconds to run")
+    parser.add_argument("--compare", action="store_true",
+                        help="Also time the scalar DemoRegisterSource on the same sites")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        require_numpy()
+    except ImportError as e:
+        parser.error(str(e))
+
+    fleet = source_from_args(args, args.sites)
+    samples_per_s, reads_per_s = bench(fleet, args.duration)
+    stats = fleet.get_stats()
+    print(f"Fleet: {args.sites} sites, refresh {stats['refresh_mean_ms']:.2f} ms mean, "
+          f"{samples_per_s:,.0f} site samples/s, {reads_per_s:,.0f} block reads/s")
+    if args.fault_rate:
+        print(f"Faults: {stats['faults_started']} started, now offline {stats['faulted_offline']}, "
+              f"frozen {stats['faulted_frozen']}, spike {stats['faulted_spike']}")
+    if args.compare:
+        scalar = bench_scalar(args.sites, args.duration / 2)
+        print(f"Scalar DemoRegisterSource: {scalar:,.0f} site samples/s "
+              f"(fleet generator {samples_per_s / scalar:.0f}x faster)")
@@ -0,0 +1,424 @@
+"""
+Multi-site gateway (Linux host)
+Polls many Cerbo GX devices concurrently with asyncio over a pool of
+persistent Modbus TCP connections, with a global concurrency limit and
+a deadline per site poll
+
+Examples:
+    python gateway.py sites.json
+    python gateway.py sites.json --interval 5 --print
+    python gateway.py --bench 300 --duration 20 --concurrency 100
+    python gateway.py --bench 20 --interval 0.5 --dead 3 --late 3
+    python gateway.py --bench 300 --fleet --noise 0.02 --fault-rate 0.01
+
+sites.json:
+    [{"name": "boat", "host": "10.0.0.12"},
+     {"name": "cabin", "host": "10.0.1.7", "port": 502, "extended": true}]
+"""
+
+import asyncio
+import json
+import time
+
+import config
+from modbus_frames import (
+    MBAP_SIZE, FC_READ_INPUT, ModbusError,
+    build_read_request, parse_mbap, parse_read_response,
+)
+from victron_client import VictronClient
+
+
+class Site:
+    """One Cerbo GX to poll"""
+
+    def __init__(self, name, host, port=502, extended=False):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.extended = extended
+
+    @classmethod
+    def from_dict(cls, entry):
+        return cls(entry.get('name') or entry['host'], entry['host'],
+                   entry.get('port', config.CERBO_PORT), entry.get('extended', False))
+
+
+def load_sites(path):
+    """
+    Load the site list from a JSON file
+
+    Args:
+        path: JSON file containing a list of site objects
+
+    Returns:
+        List of Site
+    """
+    with open(path) as f:
+        return [Site.from_dict(entry) for entry in json.load(f)]
+
+
+class AsyncModbusConnection:
+    """Persistent Modbus TCP connection to one site, one request at a time"""
+
+    def __init__(self, host, port, connect_timeout=config.CONNECT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.reader = None
+        self.writer = None
+        self.transaction_id = 0
+        self.connect_count = 0
+        self._lock = asyncio.Lock()
+
+    async def _ensure_connected(self):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.connect_timeout)
+            self.connect_count += 1
+
+    async def read_registers(self, unit_id, start, count, function_code=FC_READ_INPUT):
+        """
+        Read a block of registers
+
+        Args:
+            unit_id: Modbus unit ID
+            start: Starting register address
+            count: Number of registers
+            function_code: FC_READ_INPUT or FC_READ_HOLDING
+
+        Returns:
+            Tuple of raw register values
+
+        Raises:
+            ModbusError: On an exception response (connection stays usable)
+            OSError, asyncio.IncompleteReadError, ValueError: On connection or
+                framing errors (the connection is closed)
+        """
+        async with self._lock:
+            await self._ensure_connected()
+            self.transaction_id = (self.transaction_id + 1) & 0xFFFF
+            try:
+                self.writer.write(build_read_request(self.transaction_id, unit_id, function_code, start, count))
+                await self.writer.drain()
+                while True:
+                    transaction_id, pdu_length, _ = parse_mbap(await self.reader.readexactly(MBAP_SIZE))
+                    pdu = await self.reader.readexactly(pdu_length)
+                    if transaction_id == self.transaction_id:
+                        break  # Skip late answers to requests that hit their deadline
+                return parse_read_response(pdu, function_code, count)
+            except ModbusError:
+                raise
+            except BaseException:
+                self.close()
+                raise
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.reader = None
+
+
+class ConnectionPool:
+    """Keeps one persistent connection per (host, port)"""
+
+    def __init__(self):
+        self.connections = {}
+        self.discards = 0
+
+    def get(self, site):
+        key = (site.host, site.port)
+        connection = self.connections.get(key)
+        if connection is None:
+            connection = AsyncModbusConnection(site.host, site.port)
+            self.connections[key] = connection
+        return connection
+
+    def discard(self, site):
+        """Close a site's connection after a failure or missed deadline"""
+        connection = self.connections.get((site.host, site.port))
+        if connection:
+            connection.close()
+            self.discards += 1
+
+    def close_all(self):
+        for connection in self.connections.values():
+            connection.close()
+
+    def connect_count(self):
+        return sum(c.connect_count for c in self.connections.values())
+
+
+class Gateway:
+    """Concurrent poller for many sites"""
+
+    def __init__(self, sites, concurrency=None, deadline=None):
+        """
+        Args:
+            sites: List of Site
+            concurrency: Max site polls in flight (default config.GATEWAY_CONCURRENCY)
+            deadline: Seconds allowed per site poll (default config.GATEWAY_SITE_DEADLINE)
+        """
+        self.sites = sites
+        self.concurrency = concurrency or config.GATEWAY_CONCURRENCY
+        self.deadline = deadline or config.GATEWAY_SITE_DEADLINE
+        self.pool = ConnectionPool()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        self.samples = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.latencies = []
+        self.max_latency_samples = 100000
+        self.latest = [None] * len(sites)   # Last result per site (run())
+
+    async def _read_fields(self, connection, unit_id, block, fields, data):
+        """Read one block into data; exception responses leave its fields None"""
+        start, count = block
+        try:
+            values = await connection.read_registers(unit_id, start, count)
+        except ModbusError:
+            values = None
+        data.update(VictronClient.decode_fields(values, start, fields))
+
+    async def _read_site(self, site):
+        """Read one site's data set, mirroring VictronClient.read_all_data()"""
+        connection = self.pool.get(site)
+        data = {}
+        await self._read_fields(connection, VictronClient.UNIT_ID_SYSTEM,
+                                VictronClient.BATTERY_BLOCK, VictronClient.BATTERY_FIELDS, data)
+        try:
+            raw = await connection.read_registers(VictronClient.UNIT_ID_SYSTEM, VictronClient.TEMPERATURE_REGISTER, 1)
+            data['battery_temperature'] = VictronClient.decode_temperature(raw[0])
+        except ModbusError:
+            data['battery_temperature'] = None
+        data['charging_state'] = VictronClient.charging_state_from_current(data['battery_current'])
+
+        if site.extended:
+            await self._read_fields(connection, VictronClient.UNIT_ID_SOLAR,
+                                    VictronClient.SOLAR_BLOCK, VictronClient.SOLAR_FIELDS, data)
+            await self._read_fields(connection, VictronClient.UNIT_ID_INVERTER,
+                                    VictronClient.INVERTER_BLOCK, VictronClient.INVERTER_FIELDS, data)
+        return data
+
+    async def poll_site(self, site):
+        """
+        Poll one site under the concurrency limit and its deadline
+
+        Returns:
+            Data dictionary, or None if the poll failed or missed its deadline
+        """
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                data = await asyncio.wait_for(self._read_site(site), self.deadline)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.pool.discard(site)
+                return None
+            except Exception:
+                self.failures += 1
+                self.pool.discard(site)
+                return None
+
+            self.samples += 1
+            if len(self.latencies) < self.max_latency_samples:
+                self.latencies.append(time.monotonic() - started)
+            return data
+
+    async def poll_all(self):
+        """
+        Poll every site once, concurrently
+
+        Returns:
+            List of (site, data or None)
+        """
+        results = await asyncio.gather(*[self.poll_site(site) for site in self.sites])
+        return list(zip(self.sites, results))
+
+    async def _poll_loop(self, index, interval, start_at, stop_at):
+        """Poll one site every interval seconds, independent of the other sites"""
+        site = self.sites[index]
+        next_poll = start_at
+        while stop_at is None or time.monotonic() < stop_at:
+            delay = next_poll - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.latest[index] = await self.poll_site(site)
+            next_poll += interval
+            if next_poll < time.monotonic():
+                next_poll = time.monotonic()  # Missed slots are skipped, not bunched up
+
+    async def run(self, interval=None, duration=None, on_cycle=None):
+        """
+        Poll every site every interval seconds
+
+        Each site runs its own polling task, so a dead or slow site only
+        delays its own next poll; the start times are spread over the
+        first interval so the polls do not arrive as one burst.
+
+        Args:
+            interval: Seconds between one site's poll starts (0 = back to back)
+            duration: Stop after this many seconds (None = forever)
+            on_cycle: Optional callback(results) every interval (at least 1 s)
+                      with each site's latest (site, data or None)
+        """
+        interval = config.GATEWAY_POLL_INTERVAL if interval is None else interval
+        started = time.monotonic()
+        stop_at = None if duration is None else started + duration
+        count = len(self.sites)
+        self.latest = [None] * count
+        tasks = [asyncio.create_task(self._poll_loop(i, interval, started + interval * i / count, stop_at))
+                 for i in range(count)]
+        try:
+            if on_cycle:
+                period = max(interval, 1)
+                next_report = started + period
+                while stop_at is None or next_report <= stop_at:
+                    await asyncio.sleep(next_report - time.monotonic())
+                    on_cycle(list(zip(self.sites, self.latest)))
+                    next_report += period
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self, elapsed=None):
+        """
+        Get aggregate polling statistics
+
+        Args:
+            elapsed: Wall time in seconds, to compute samples per second
+
+        Returns:
+            Dictionary with sample, failure and latency figures
+        """
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+        stats = {
+            'sites': len(self.sites),
+            'samples': self.samples,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'connects': self.pool.connect_count(),
+            'reconnects': self.pool.discards,
+            'latency_p50_ms': percentile(0.50),
+            'latency_p95_ms': percentile(0.95),
+            'latency_max_ms': latencies[-1] * 1000 if latencies else None,
+        }
+        if elapsed:
+            stats['samples_per_second'] = self.samples / elapsed
+        return stats
+
+    def close(self):
+        self.pool.close_all()
+
+
+def format_stats(stats):
+    line = (f"{stats['samples']} samples, {stats['failures']} failed, {stats['timeouts']} timed out, "
+            f"{stats['connects']} connects ({stats['reconnects']} after errors)")
+    if stats.get('samples_per_second') is not None:
+        line += f", {stats['samples_per_second']:.0f} samples/s"
+    if stats['latency_p50_ms'] is not None:
+        line += (f", latency p50 {stats['latency_p50_ms']:.1f} ms"
+                 f" p95 {stats['latency_p95_ms']:.1f} ms max {stats['latency_max_ms']:.1f} ms")
+    return line
+
+
+async def run_gateway(args):
+    gateway = Gateway(load_sites(args.sites), args.concurrency, args.deadline)
+
+    def report(results):
+        ok = sum(1 for _, data in results if data is not None)
+        print(f"[{time.strftime('%H:%M:%S')}] {ok}/{len(results)} sites polled")
+        if args.print:
+            for site, data in results:
+                print(f"  {site.name}: {data}")
+
+    started = time.monotonic()
+    try:
+        await gateway.run(args.interval, args.duration, report)
+    finally:
+        gateway.close()
+        print(format_stats(gateway.get_stats(time.monotonic() - started)))
+
+
+async def run_bench(args):
+    """Load test against a local simulator with args.bench endpoints"""
+    from modbus_simulator import DemoRegisterSource, ModbusSimulator
+
+    if args.fleet:
+        from fleet_generator import source_from_args
+        source = source_from_args(args, args.bench)
+    else:
+        source = DemoRegisterSource(args.bench)
+    simulator = ModbusSimulator(source, args.bench, base_port=args.base_port, latency_ms=args.latency_ms,
+                                dead=args.dead, late=args.late, late_ms=args.late_ms)
+    await simulator.start()
+
+    sites = [Site(f"sim{i}", "127.0.0.1", args.base_port + i, extended=True) for i in range(args.bench)]
+    gateway = Gateway(sites, args.concurrency, args.deadline)
+    duration = args.duration or 10
+    interval = args.interval or 0
+    pace = f"every {interval}s" if interval else "back to back"
+    print(f"Benchmark: {len(sites)} sites, concurrency {gateway.concurrency}, "
+          f"deadline {gateway.deadline}s, {duration}s, each site polled {pace}")
+
+    started = time.monotonic()
+    try:
+        await gateway.run(interval=interval, duration=duration)
+    finally:
+        elapsed = time.monotonic() - started
+        gateway.close()
+        await simulator.close()
+    print(format_stats(gateway.get_stats(elapsed)))
+    print(f"Simulator answered {simulator.request_count} requests ({simulator.request_count / elapsed:.0f}/s)")
+    if args.fleet:
+        fleet = source.get_stats()
+        print(f"Fleet generator: {fleet['refreshes']} refreshes, {fleet['refresh_mean_ms']:.2f} ms mean, "
+              f"{fleet['faults_started']} faults injected")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Poll many Cerbo GX devices concurrently")
+    parser.add_argument("sites", nargs="?", help="JSON site list")
+    parser.add_argument("--interval", type=float, help="Seconds between one site's polls (bench: default 0)")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--concurrency", type=int, help="Max site polls in flight")
+    parser.add_argument("--deadline", type=float, help="Seconds allowed per site poll")
+    parser.add_argument("--print", action="store_true", help="Print every site's data")
+    parser.add_argument("--bench", type=int, metavar="N", help="Load test against N local simulator endpoints")
+    parser.add_argument("--base-port", type=int, default=5020, help="First simulator port (bench)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulator response delay (bench)")
+    parser.add_argument("--dead", type=int, default=0, help="Simulator endpoints that never answer (bench)")
+    parser.add_argument("--late", type=int, default=0, help="Simulator endpoints that answer late (bench)")
+    parser.add_argument("--late-ms", type=float, default=5000, help="Response delay of the late endpoints (bench)")
+    from fleet_generator import add_arguments, require_numpy
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.bench and args.fleet:
+        try:
+            require_numpy()
+        except ImportError as e:
+            parser.error(str(e))
+    if args.bench:
+        from modbus_simulator import install_host_runtime, raise_fd_limit
+        install_host_runtime()
+        raise_fd_limit()
+        asyncio.run(run_bench(args))
+    elif args.sites:
+        try:
+            asyncio.run(run_gateway(args))
+        except KeyboardInterrupt:
+            pass
+    else:
+        parser.error("give a site list or --bench N")
@@ -0,0 +1,156 @@
+"""
+In-RAM sample history
+Keeps the most recent samples in fixed-size array rings and folds every
+sample into min/max/average rollups over longer periods, with no
+allocation per sample
+"""
+
+import time
+from array import array
+import config
+
+# Fields recorded per sample
+FIELDS = ('battery_voltage', 'battery_current', 'battery_soc', 'battery_temperature', 'battery_power')
+
+NAN = float('nan')
+
+
+class History:
+    """Sample ring plus rollup ring over the FIELDS of each snapshot"""
+
+    def __init__(self, samples=None, rollup_s=None, rollups=None):
+        """
+        Args:
+            samples: Number of recent samples kept (default config.HISTORY_SAMPLES)
+            rollup_s: Rollup period in seconds (default config.HISTORY_ROLLUP_S)
+            rollups: Number of rollup periods kept (default config.HISTORY_ROLLUPS)
+        """
+        self.capacity = config.HISTORY_SAMPLES if samples is None else samples
+        self.rollup_ms = 1000 * (config.HISTORY_ROLLUP_S if rollup_s is None else rollup_s)
+        self.rollup_capacity = config.HISTORY_ROLLUPS if rollups is None else rollups
+
+        # Recent samples: one float column per field, NaN = missing
+        self.ticks = array('l', [0] * self.capacity)
+        self.columns = [array('f', [NAN] * self.capacity) for _ in FIELDS]
+        self.count = 0
+        self.head = 0  # Next write position
+
+        # Rollups: per field min, max and average columns
+        size = self.rollup_capacity
+        self.rollup_ticks = array('l', [0] * size)
+        self.rollup_min = [array('f', [NAN] * size) for _ in FIELDS]
+        self.rollup_max = [array('f', [NAN] * size) for _ in FIELDS]
+        self.rollup_avg = [array('f', [NAN] * size) for _ in FIELDS]
+        self.rollup_count = 0
+        self.rollup_head = 0
+
+        # Accumulators for the current rollup period
+        n = len(FIELDS)
+        self._period_start = None
+        self._acc_min = [NAN] * n
+        self._acc_max = [NAN] * n
+        self._acc_sum = [0.0] * n
+        self._acc_n = [0] * n
+
+        self.total_samples = 0
+
+    def add(self, data, now_ms=None):
+        """
+        Record one snapshot
+
+        Args:
+            data: Data dictionary from read_all_data()
+            now_ms: Sample time in ticks_ms (default: now)
+        """
+        now = time.ticks_ms() if now_ms is None else now_ms
+        i = self.head
+        self.ticks[i] = now
+
+        if self._period_start is None:
+            self._period_start = now
+        elif time.ticks_diff(now, self._period_start) >= self.rollup_ms:
+            self._close_period()
+            self._period_start = now
+
+        for f, name in enumerate(FIELDS):
+            value = data.get(name)
+            if value is None:
+                self.columns[f][i] = NAN
+                continue
+            self.columns[f][i] = value
+            if self._acc_n[f] == 0 or value < self._acc_min[f]:
+                self._acc_min[f] = value
+            if self._acc_n[f] == 0 or value > self._acc_max[f]:
+                self._acc_max[f] = value
+            self._acc_sum[f] += value
+            self._acc_n[f] += 1
+
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.total_samples += 1
+
+    def _close_period(self):
+        """Move the current period's accumulators into the rollup ring"""
+        j = self.rollup_head
+        self.rollup_ticks[j] = self._period_start
+        for f in range(len(FIELDS)):
+            n = self._acc_n[f]
+            self.rollup_min[f][j] = self._acc_min[f] if n else NAN
+            self.rollup_max[f][j] = self._acc_max[f] if n else NAN
+            self.rollup_avg[f][j] = self._acc_sum[f] / n if n else NAN
+            self._acc_sum[f] = 0.0
+            self._acc_n[f] = 0
+        self.rollup_head = (j + 1) % self.rollup_capacity
+        if self.rollup_count < self.rollup_capacity:
+            self.rollup_count += 1
+
+    def _indexes(self, count, head, capacity):
+        """Ring positions from oldest to newest"""
+        start = (head - count) % capacity
+        return [(start + k) % capacity for k in range(count)]
+
+    def samples(self, now_ms=None):
+        """
+        Get the recent samples, oldest first
+
+        Returns:
+            Dictionary with 'age_s' (list of seconds before now) and one
+            list per field (None where missing)
+        """
+        now = time.ticks_ms() if now_ms is None else now_ms
+        indexes = self._indexes(self.count, self.head, self.capacity)
+        result = {'age_s': [time.ticks_diff(now, self.ticks[i]) // 1000 for i in indexes]}
+        for f, name in enumerate(FIELDS):
+            column = self.columns[f]
+            result[name] = [_value(column[i]) for i in indexes]
+        return result
+
+    def rollup_summary(self, now_ms=None):
+        """
+        Get the completed rollup periods, oldest first
+
+        Returns:
+            Dictionary with 'period_s', 'age_s' (period start, seconds before
+            now) and per field {'min': [...], 'max': [...], 'avg': [...]}
+        """
+        now = time.ticks_ms() if now_ms is None else now_ms
+        indexes = self._indexes(self.rollup_count, self.rollup_head, self.rollup_capacity)
+        result = {
+            'period_s': self.rollup_ms // 1000,
+            'age_s': [time.ticks_diff(now, self.rollup_ticks[j]) // 1000 for j in indexes],
+        }
+        for f, name in enumerate(FIELDS):
+            result[name] = {
+                'min': [_value(self.rollup_min[f][j]) for j in indexes],
+                'max': [_value(self.rollup_max[f][j]) for j in indexes],
+                'avg': [_value(self.rollup_avg[f][j]) for j in indexes],
+            }
+        return result
+
+
+def _value(x):
+    """Float32 column value as a JSON-friendly number (None for NaN)"""
+    if x != x:
+        return None
+    return round(x, 3)
@@ -0,0 +1,320 @@
+"""
+Bulk history export over USB serial
+Answers an EXPORT command on stdin by streaming the flash sample log (or
+the in-RAM recent samples) to stdout as checksummed binary chunks, a time
+slice per loop slot so the display keeps its cadence. history_pull.py on
+the host reassembles them; a lost or corrupted chunk is re-requested
+from where it left off.
+
+Commands (one line on stdin):
+    EXPORT log|samples                      Start an export
+    EXPORT log <segment> <chunk>            Resume from a chunk (first segment >= <segment>)
+    EXPORT STOP                             Abort
+
+Chunk, little endian: 'VX', kind (u8), flags (u8), segment (u32), chunk (u16),
+payload length (u16), payload, CRC32 of everything before
+    'H'  Header, text payload "key=value ..." (record format, fields, device time,
+         boot counter, time epoch, totals)
+    'D'  Whole records (sample_log.RECORD_FORMAT) of one segment
+    'E'  End, text payload "records=N chunks=N"
+    '!'  Error, text payload
+Console log lines may appear between chunks; the host skips them.
+"""
+
+import sys
+import time
+import struct
+import select
+import binascii
+import config
+from history import FIELDS
+from sample_log import RECORD_FORMAT, RECORD_SIZE, BOOT_MASK
+
+MAGIC = b'VX'
+FRAME_HEADER = '<2sBBIHH'
+FRAME_HEADER_SIZE = struct.calcsize(FRAME_HEADER)
+
+KIND_HEADER = ord('H')
+KIND_DATA = ord('D')
+KIND_END = ord('E')
+KIND_ERROR = ord('!')
+
+FLAG_SEGMENT_END = 0x01    # Last chunk of its segment
+FLAG_RESUME_LOST = 0x02    # Resume segment no longer on flash, continued with the next one
+
+TEXT_MAX = 512  # Max payload of a header, end or error chunk, whatever the chunk size
+
+SOURCE_LOG = 'log'
+SOURCE_SAMPLES = 'samples'
+
+
+class HistoryExporter:
+    """EXPORT command handler streaming records as binary chunks"""
+
+    def __init__(self, sample_log=None, history=None, chunk_bytes=None, slice_ms=None,
+                 stdin=None, stdout=None):
+        """
+        Args:
+            sample_log: SampleLog for the "log" source (optional)
+            history: History for the "samples" source (optional)
+            chunk_bytes: Max payload per chunk, rounded down to whole records
+                         (default config.EXPORT_CHUNK_BYTES)
+            slice_ms: Time spent streaming per poll() (default config.EXPORT_SLICE_MS)
+            stdin: Command stream (default sys.stdin)
+            stdout: Binary output stream (default sys.stdout.buffer)
+        """
+        self.sample_log = sample_log
+        self.history = history
+        chunk_bytes = config.EXPORT_CHUNK_BYTES if chunk_bytes is None else chunk_bytes
+        self.chunk_bytes = max(1, chunk_bytes // RECORD_SIZE) * RECORD_SIZE
+        self.slice_ms = config.EXPORT_SLICE_MS if slice_ms is None else slice_ms
+        self.stdin = sys.stdin if stdin is None else stdin
+        self.stdout = getattr(sys.stdout, 'buffer', sys.stdout) if stdout is None else stdout
+
+        self._poller = select.poll()
+        self._poller.register(self.stdin, select.POLLIN)
+        self._line = ''
+
+        self._frame = bytearray(FRAME_HEADER_SIZE + max(self.chunk_bytes, TEXT_MAX) + 4)
+        self._view = memoryview(self._frame)
+
+        # Active export
+        self._source = None
+        self._segments = []      # Segment numbers still to send (log)
+        self._segment = 0
+        self._chunk = 0
+        self._file = None
+        self._remaining = 0      # Bytes left in the current segment snapshot
+        self._flags = 0
+        self._data = None        # Serialized records (samples)
+        self._started = 0
+        self._sent_records = 0
+        self._sent_chunks = 0
+
+        self.exports = 0
+        self.resumes = 0
+        self.chunks = 0
+        self.bytes = 0
+        self.bad_commands = 0
+        self.last_export_ms = 0
+        self.last_export_records = 0
+
+    @property
+    def active(self):
+        return self._source is not None
+
+    def _send(self, kind, flags, segment, chunk, length):
+        """Frame the payload already in the buffer and write it"""
+        frame = self._frame
+        struct.pack_into(FRAME_HEADER, frame, 0, MAGIC, kind, flags, segment, chunk, length)
+        end = FRAME_HEADER_SIZE + length
+        struct.pack_into('<I', frame, end, binascii.crc32(self._view[:end]) & 0xFFFFFFFF)
+        self.stdout.write(self._view[:end + 4])
+        self.chunks += 1
+        self.bytes += end + 4
+
+    def _send_text(self, kind, text, flags=0):
+        payload = text.encode()[:TEXT_MAX]
+        self._frame[FRAME_HEADER_SIZE:FRAME_HEADER_SIZE + len(payload)] = payload
+        self._send(kind, flags, self._segment, 0, len(payload))
+
+    def _read_commands(self):
+        """Collect stdin characters without blocking and run complete lines"""
+        while self._poller.poll(0):
+            ch = self.stdin.read(1)
+            if not ch:
+                self._poller.unregister(self.stdin)  # stdin closed (host mode)
+                self._poller = select.poll()
+                return
+            if ch in '\r\n':
+                line = self._line.strip()
+                self._line = ''
+                if line:
+                    self._command(line)
+            elif len(self._line) < 64:
+                self._line += ch
+
+    def _command(self, line):
+        parts = line.split()
+        if parts[0] != 'EXPORT' or len(parts) not in (2, 4):
+            self.bad_commands += 1
+            return
+        self._finish()
+        if parts[1] == 'STOP':
+            return
+        try:
+            segment, chunk = (int(parts[2]), int(parts[3])) if len(parts) == 4 else (0, 0)
+        except ValueError:
+            self.bad_commands += 1
+            return
+        if len(parts) == 4:
+            self.resumes += 1
+        else:
+            self.exports += 1
+        self._start(parts[1], segment, chunk, len(parts) == 4)
+        self._flush()
+
+    def _start(self, source, segment, chunk, resume=False):
+        """Send the header and position at (segment, chunk)"""
+        self._segment = segment
+        self._flags = 0
+        if source == SOURCE_LOG and self.sample_log:
+            self.sample_log.flush()
+            numbers = self.sample_log.segments()
+            self._segments = [n for n in numbers if n >= segment]
+            if self._segments and self._segments[0] != segment:
+                # Resume segment rotated out: start of the next one on flash
+                if resume:
+                    self._flags = FLAG_RESUME_LOST
+                chunk = 0
+            total = sum(self.sample_log.segment_size(n) for n in self._segments) // RECORD_SIZE
+            span = f"{numbers[0]}-{numbers[-1]}" if numbers else "-"
+        elif source == SOURCE_SAMPLES and self.history:
+            self._data = self._serialize_samples()
+            self._segments = [0]
+            total = len(self._data) // RECORD_SIZE
+            span = "0-0"
+        else:
+            self._send_text(KIND_ERROR, f"source {source} not available")
+            return
+
+        self._source = source
+        self._chunk = chunk
+        self._started = time.ticks_ms()
+        self._sent_records = 0
+        self._sent_chunks = 0
+        # Records tagged with this boot are mapped to host time through "now";
+        # "epoch" is the year time.time() counts from (1970 or 2000)
+        self._send_text(KIND_HEADER,
+                        f"version=2 source={source} format={RECORD_FORMAT} record={RECORD_SIZE} "
+                        f"fields={','.join(FIELDS)} now={int(time.time())} "
+                        f"boot={self._boot_tag() & BOOT_MASK} epoch={time.gmtime(0)[0]} "
+                        f"segments={span} records={total} chunk={self.chunk_bytes}", self._flags)
+        self._open_next(chunk)
+
+    def _boot_tag(self):
+        """Boot tag of the running boot (0 without a sample log)"""
+        return self.sample_log.boot_tag if self.sample_log else 0
+
+    def _serialize_samples(self):
+        """Recent samples from the History ring as log records of this boot"""
+        history = self.history
+        now_ms = time.ticks_ms()
+        now_s = int(time.time())
+        boot_tag = self._boot_tag()
+        start = (history.head - history.count) % history.capacity
+        data = bytearray(history.count * RECORD_SIZE)
+        values = [0.0] * len(FIELDS)
+        for k in range(history.count):
+            i = (start + k) % history.capacity
+            for f in range(len(FIELDS)):
+                values[f] = history.columns[f][i]
+            age_s = time.ticks_diff(now_ms, history.ticks[i]) // 1000
+            struct.pack_into(RECORD_FORMAT, data, k * RECORD_SIZE, now_s - age_s, boot_tag, *values)
+        return data
+
+    def _open_next(self, chunk=0):
+        """Move to the next segment with data, seeking to chunk"""
+        while self._segments:
+            self._segment = self._segments.pop(0)
+            offset = chunk * self.chunk_bytes
+            chunk = 0
+            if self._source == SOURCE_SAMPLES:
+                size = len(self._data)
+            else:
+                size = self.sample_log.segment_size(self._segment)
+                size -= size % RECORD_SIZE
+            if offset >= size:
+                continue
+            self._chunk = offset // self.chunk_bytes
+            self._remaining = size - offset
+            if self._source == SOURCE_LOG:
+                try:
+                    self._file = open(self.sample_log.segment_path(self._segment), 'rb')
+                    self._file.seek(offset)
+                except OSError:
+                    self._file = None
+                    continue
+            return True
+        self._send_text(KIND_END, f"records={self._sent_records} chunks={self._sent_chunks}")
+        self.last_export_ms = time.ticks_diff(time.ticks_ms(), self._started)
+        self.last_export_records = self._sent_records
+        self._finish()
+        return False
+
+    def _send_chunk(self):
+        """Send the next data chunk; returns False when the export is done"""
+        length = min(self.chunk_bytes, self._remaining)
+        payload = self._view[FRAME_HEADER_SIZE:FRAME_HEADER_SIZE + length]
+        if self._source == SOURCE_SAMPLES:
+            offset = self._chunk * self.chunk_bytes
+            payload[:] = self._data[offset:offset + length]
+            read = length
+        else:
+            read = self._file.readinto(payload) or 0
+            read -= read % RECORD_SIZE
+        self._remaining -= length
+        flags = self._flags
+        if read < length or not self._remaining:
+            flags |= FLAG_SEGMENT_END
+            self._remaining = 0
+        if read:
+            self._send(KIND_DATA, flags, self._segment, self._chunk, read)
+            self._sent_records += read // RECORD_SIZE
+            self._sent_chunks += 1
+        self._flags = 0
+        self._chunk += 1
+        if not self._remaining:
+            if self._file:
+                self._file.close()
+                self._file = None
+            return self._open_next()
+        return True
+
+    def _finish(self):
+        if self._file:
+            self._file.close()
+        self._file = None
+        self._source = None
+        self._segments = []
+        self._data = None
+
+    def _flush(self):
+        if hasattr(self.stdout, 'flush'):
+            self.stdout.flush()
+
+    def poll(self):
+        """
+        Handle commands and stream the active export for up to slice_ms
+        (call once per loop slot)
+
+        Returns:
+            True while an export is in progress
+        """
+        self._read_commands()
+        if self._source is None:
+            return False
+        deadline = time.ticks_add(time.ticks_ms(), self.slice_ms)
+        while self._source is not None and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+            self._send_chunk()
+        self._flush()
+        return self._source is not None
+
+    def get_stats(self):
+        """
+        Get export statistics
+
+        Returns:
+            Dictionary with exports, resumes, chunks and bytes sent, bad
+            commands and the duration/records of the last complete export
+        """
+        return {
+            'active': self.active,
+            'exports': self.exports,
+            'resumes': self.resumes,
+            'chunks': self.chunks,
+            'bytes': self.bytes,
+            'bad_commands': self.bad_commands,
+            'last_export_ms': self.last_export_ms,
+            'last_export_records': self.last_export_records,
+        }
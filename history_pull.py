@@ -0,0 +1,417 @@
+"""
+Pull the sample history from a Pico over USB serial (Linux host)
+Sends EXPORT to history_export.py on the device, reassembles the binary
+chunks (skipping console log text between them), re-requests from the
+last good chunk after a CRC error, gap, timeout or an END that arrives
+before the last segment is complete, and writes CSV or a
+columnar directory. Timestamps of the running boot are mapped to host
+time with the device clock sent in the export header, so they are right
+even if the Pico RTC was never set. Records of earlier boots carry real
+times only if the clock was set from NTP during that boot
+(SAMPLE_LOG_NTP_HOST);
+otherwise their time is left empty.
+
+Columnar output: one little-endian file per column (time.f8, float64 Unix
+seconds, NaN = unknown; boot.u2, boot counter; <field>.f4, float32 with
+NaN = missing) plus schema.json, e.g. for numpy.fromfile(path, dtype).
+
+Needs pyserial for a serial port (pip install pyserial); --spawn runs
+host_main.py (or anything else speaking the protocol on stdio) instead.
+
+Examples:
+    python history_pull.py /dev/ttyACM0 --out history.csv
+    python history_pull.py /dev/ttyACM0 --source samples --format columns --out recent/
+    python history_pull.py --spawn "python host_main.py --demo --uart null" --out demo.csv
+"""
+
+import argparse
+import binascii
+import json
+import math
+import os
+import random
+import select
+import shlex
+import struct
+import subprocess
+import sys
+import time
+from array import array
+
+from history_export import (MAGIC, FRAME_HEADER, FRAME_HEADER_SIZE, KIND_HEADER, KIND_DATA,
+                            KIND_END, KIND_ERROR, FLAG_SEGMENT_END, FLAG_RESUME_LOST,
+                            SOURCE_LOG, SOURCE_SAMPLES)
+from sample_log import BOOT_MASK, BOOT_SYNCED
+
+MAX_PAYLOAD = 16384  # Longer length fields are a false magic match
+UNIX_2000 = 946684800  # Unix time of 2000-01-01, the epoch of older MicroPython ports
+
+
+class PullError(Exception):
+    """Export failed or the device stopped answering"""
+
+
+class SerialTransport:
+    """USB CDC serial port via pyserial"""
+
+    def __init__(self, port, baudrate=115200):
+        try:
+            import serial
+        except ImportError:
+            raise PullError("reading a serial port needs pyserial (pip install pyserial)")
+        self.port = serial.Serial(port, baudrate, timeout=0)
+        self.port.reset_input_buffer()
+
+    def write(self, data):
+        self.port.write(data)
+        self.port.flush()
+
+    def read(self, timeout):
+        if not self.port.in_waiting:
+            time.sleep(min(timeout, 0.01))
+        return self.port.read(self.port.in_waiting or 1)
+
+    def close(self):
+        self.port.close()
+
+
+class ProcessTransport:
+    """A local process speaking the protocol on stdin/stdout (e.g. host_main.py)"""
+
+    def __init__(self, command):
+        self.process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, bufsize=0)
+
+    def write(self, data):
+        self.process.stdin.write(data)
+
+    def read(self, timeout):
+        fd = self.process.stdout.fileno()
+        if not select.select([fd], [], [], timeout)[0]:
+            return b''
+        data = os.read(fd, 65536)
+        if not data:
+            raise PullError(f"process exited with status {self.process.wait()}")
+        return data
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class FrameReader:
+    """Finds CRC-checked chunks in a byte stream mixed with console text"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.skipped = 0   # Console bytes between chunks
+        self.bad_crc = 0
+
+    def feed(self, data):
+        """
+        Add received bytes
+
+        Returns:
+            List of complete (kind, flags, segment, chunk, payload) frames
+        """
+        buffer = self.buffer
+        buffer += data
+        frames = []
+        while True:
+            i = buffer.find(MAGIC)
+            if i < 0:
+                keep = 1 if buffer.endswith(MAGIC[:1]) else 0
+                self.skipped += len(buffer) - keep
+                del buffer[:len(buffer) - keep]
+                return frames
+            if i:
+                self.skipped += i
+                del buffer[:i]
+            if len(buffer) < FRAME_HEADER_SIZE:
+                return frames
+            _, kind, flags, segment, chunk, length = struct.unpack_from(FRAME_HEADER, buffer)
+            if length > MAX_PAYLOAD:
+                self.skipped += 1
+                del buffer[:1]
+                continue
+            end = FRAME_HEADER_SIZE + length
+            if len(buffer) < end + 4:
+                return frames
+            if binascii.crc32(buffer[:end]) != struct.unpack_from('<I', buffer, end)[0]:
+                self.bad_crc += 1
+                del buffer[:1]
+                continue
+            frames.append((kind, flags, segment, chunk, bytes(buffer[FRAME_HEADER_SIZE:end])))
+            del buffer[:end + 4]
+
+
+def parse_header(payload):
+    header = dict(item.split('=', 1) for item in payload.decode().split())
+    header['record'] = int(header['record'])
+    header['now'] = int(header['now'])
+    header['records'] = int(header['records'])
+    header['fields'] = header['fields'].split(',')
+    header['boot'] = int(header['boot'])
+    header['epoch'] = int(header['epoch'])
+    first, _, final = header['segments'].partition('-')
+    header['first_segment'] = int(first) if first else None
+    header['last_segment'] = int(final) if final else None
+    return header
+
+
+def pull(transport, source=SOURCE_LOG, timeout_s=2.0, retries=5, drop_rate=0.0, progress=None):
+    """
+    Run one export to completion
+
+    Args:
+        transport: SerialTransport or ProcessTransport
+        source: "log" (flash segments) or "samples" (RAM ring)
+        timeout_s: Silence before re-requesting from the last good chunk
+        retries: Consecutive timeouts before giving up
+        drop_rate: Discard this fraction of data chunks (exercises resume)
+        progress: Optional callable(records_received, records_expected)
+
+    Returns:
+        (header dict, record bytes, stats dict); header['offset_s'] is
+        host time minus device time when the export started
+
+    Raises:
+        PullError: On a device error or when retries run out
+    """
+    reader = FrameReader()
+    header = None
+    data = bytearray()
+    last = None          # (segment, chunk, flags) of the last accepted chunk
+    resyncing = True     # Waiting for the header answering the last command
+    lost_segments = False
+    final_segment = None  # Last segment on the device, from the latest header
+    incomplete = 0        # END frames answered with a resume since the last accepted chunk
+    stats = {'resumes': 0, 'timeouts': 0, 'dropped': 0, 'rejected': 0, 'incomplete': 0}
+    start = time.time()
+
+    def request(position=None):
+        nonlocal resyncing, last
+        if position is None or source == SOURCE_SAMPLES:
+            # The RAM ring shifts with every poll, so it is only pulled whole
+            command = f"EXPORT {source}\n"
+            data.clear()
+            last = None
+        else:
+            command = f"EXPORT {source} {position[0]} {position[1]}\n"
+        if header is not None:
+            stats['resumes'] += 1
+        resyncing = True
+        transport.write(command.encode())
+
+    def resume_position():
+        if last is None:
+            return None
+        segment, chunk, flags = last
+        return (segment + 1, 0) if flags & FLAG_SEGMENT_END else (segment, chunk + 1)
+
+    def complete():
+        # Chunks lost just before END leave the last segment unfinished
+        if last is None:
+            return header['records'] == 0
+        segment, _, flags = last
+        if not flags & FLAG_SEGMENT_END or segment < final_segment:
+            return False
+        return lost_segments or len(data) // header['record'] >= header['records']
+
+    request()
+    last_rx = time.time()
+    failures = 0
+    while True:
+        received = transport.read(0.1)
+        now = time.time()
+        if not received:
+            if now - last_rx > timeout_s:
+                failures += 1
+                stats['timeouts'] += 1
+                if failures > retries:
+                    raise PullError(f"no answer after {retries} retries")
+                request(resume_position())
+                last_rx = now
+            continue
+        last_rx = now
+
+        for kind, flags, segment, chunk, payload in reader.feed(received):
+            if kind == KIND_ERROR:
+                raise PullError(f"device: {payload.decode()}")
+
+            if kind == KIND_HEADER:
+                parsed = parse_header(payload)
+                if header is None or last is None:
+                    header = parsed
+                    header['offset_s'] = now - header['now']
+                final_segment = parsed['last_segment']
+                if flags & FLAG_RESUME_LOST:
+                    lost_segments = True
+                resyncing = False
+                failures = 0
+                continue
+            if resyncing:
+                continue  # Chunks sent before the device saw the last command
+
+            if kind == KIND_END:
+                if not complete():
+                    stats['incomplete'] += 1
+                    incomplete += 1
+                    if incomplete > retries:
+                        raise PullError(f"export still incomplete after {retries} resumes")
+                    request(resume_position())
+                    continue
+                stats.update(duration_s=time.time() - start, bad_crc=reader.bad_crc,
+                             skipped_bytes=reader.skipped, lost_segments=lost_segments)
+                return header, data, stats
+
+            if kind != KIND_DATA:
+                continue
+            if drop_rate and random.random() < drop_rate:
+                stats['dropped'] += 1
+                continue
+            if flags & FLAG_RESUME_LOST:
+                # Resume point rotated out: the device continued with the next segment
+                expected = chunk == 0 and (last is None or segment > last[0])
+            elif last is None:
+                expected = segment == header['first_segment'] and chunk == 0
+            else:
+                l_segment, l_chunk, l_flags = last
+                if l_flags & FLAG_SEGMENT_END:
+                    expected = segment == l_segment + 1 and chunk == 0
+                else:
+                    expected = segment == l_segment and chunk == l_chunk + 1
+            if not expected:
+                stats['rejected'] += 1
+                request(resume_position())
+                continue
+            data += payload
+            last = (segment, chunk, flags)
+            incomplete = 0
+            if progress:
+                progress(len(data) // header['record'], header['records'])
+
+
+def records(header, data):
+    """
+    Decode the records with host times
+
+    Records of the running boot are mapped with the clock offset measured
+    at the start of the pull. Records of earlier boots keep their device
+    time only if it was set from NTP (BOOT_SYNCED); otherwise their RTC
+    started over at its default date, and their time is NaN.
+
+    Returns:
+        (times, boots, columns): host Unix times (NaN = unknown), boot
+        counters and one list per header field
+    """
+    fields = header['fields']
+    times = []
+    boots = []
+    columns = [[] for _ in fields]
+    offset = header['offset_s']
+    boot = header['boot']
+    epoch_s = UNIX_2000 if header['epoch'] == 2000 else 0
+    for record in struct.iter_unpack(header['format'], data):
+        tag = record[1]
+        if tag & BOOT_MASK == boot:
+            times.append(record[0] + offset)
+        elif tag & BOOT_SYNCED:
+            times.append(record[0] + epoch_s)
+        else:
+            times.append(math.nan)
+        boots.append(tag & BOOT_MASK)
+        for f in range(len(fields)):
+            columns[f].append(record[f + 2])
+    return times, boots, columns
+
+
+def write_csv(path, header, times, boots, columns):
+    with open(path, 'w') as f:
+        f.write('time,boot,' + ','.join(header['fields']) + '\n')
+        for i, t in enumerate(times):
+            stamp = '' if math.isnan(t) else time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(t))
+            values = ('' if math.isnan(column[i]) else f"{column[i]:.6g}" for column in columns)
+            f.write(f"{stamp},{boots[i]}," + ','.join(values) + '\n')
+    return len(times)
+
+
+def write_columns(directory, header, times, boots, columns):
+    os.makedirs(directory, exist_ok=True)
+    schema = {'rows': len(times), 'source': header['source'], 'columns': []}
+    for name, typecode, dtype, values in [('time', 'd', '<f8', times), ('boot', 'H', '<u2', boots)] + [
+            (field, 'f', '<f4', column) for field, column in zip(header['fields'], columns)]:
+        values = array(typecode, values)
+        if sys.byteorder != 'little':
+            values.byteswap()
+        filename = f"{name}.{dtype[1:]}"
+        with open(os.path.join(directory, filename), 'wb') as f:
+            values.tofile(f)
+        schema['columns'].append({'name': name, 'dtype': dtype, 'file': filename})
+    with open(os.path.join(directory, 'schema.json'), 'w') as f:
+        json.dump(schema, f, indent=2)
+    return len(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pull the sample history from a Pico over USB")
+    parser.add_argument("port", nargs="?", help="Serial port of the Pico (e.g. /dev/ttyACM0)")
+    parser.add_argument("--spawn", metavar="COMMAND",
+                        help="Run COMMAND and talk to it on stdin/stdout instead of a port")
+    parser.add_argument("--baud", type=int, default=115200,
+                        help="Baud rate (ignored by USB CDC)")
+    parser.add_argument("--source", choices=(SOURCE_LOG, SOURCE_SAMPLES), default=SOURCE_LOG,
+                        help="Flash sample log (default) or the recent samples in RAM")
+    parser.add_argument("--out", required=True, help="Output CSV file or column directory")
+    parser.add_argument("--format", choices=("csv", "columns"),
+                        help="Output format (default: csv if --out ends in .csv, else columns)")
+    parser.add_argument("--timeout", type=float, default=2.0,
+                        help="Seconds of silence before resuming (default 2)")
+    parser.add_argument("--retries", type=int, default=5, help="Timeouts before giving up")
+    parser.add_argument("--drop-rate", type=float, default=0.0, metavar="P",
+                        help="Discard this fraction of chunks to exercise resume")
+    args = parser.parse_args(argv)
+    if bool(args.port) == bool(args.spawn):
+        parser.error("give either a serial port or --spawn")
+    out_format = args.format or ('csv' if args.out.endswith('.csv') else 'columns')
+
+    shown = [0]
+
+    def progress(received, expected):
+        now = time.time()
+        if now - shown[0] >= 0.5:
+            shown[0] = now
+            print(f"\r{received}/{expected} records", end='', file=sys.stderr)
+
+    try:
+        transport = ProcessTransport(args.spawn) if args.spawn else SerialTransport(args.port, args.baud)
+        try:
+            header, data, stats = pull(transport, args.source, args.timeout, args.retries,
+                                       args.drop_rate, progress)
+        finally:
+            transport.close()
+    except PullError as e:
+        print(f"\nhistory_pull: {e}", file=sys.stderr)
+        return 1
+    print(file=sys.stderr)
+
+    write = write_csv if out_format == 'csv' else write_columns
+    times, boots, columns = records(header, data)
+    rows = write(args.out, header, times, boots, columns)
+    unmapped = sum(1 for t in times if math.isnan(t))
+    rate = len(data) / stats['duration_s'] / 1024 if stats['duration_s'] else 0
+    print(f"{rows} records ({len(data)} bytes) from {args.source} in {stats['duration_s']:.1f} s "
+          f"({rate:.1f} KiB/s) -> {args.out}")
+    print(f"Resumes {stats['resumes']}, timeouts {stats['timeouts']}, CRC errors {stats['bad_crc']}, "
+          f"chunks dropped {stats['dropped']}, console bytes skipped {stats['skipped_bytes']}, "
+          f"device clock offset {header['offset_s']:+.0f} s")
+    if unmapped:
+        print(f"WARNING: {unmapped} records from earlier boots have no time: the Pico clock was not "
+              f"set from NTP then (see SAMPLE_LOG_NTP_HOST)")
+    if stats['lost_segments']:
+        print("WARNING: segments were rotated out during the pull; the oldest data is missing")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
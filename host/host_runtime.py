@@ -0,0 +1,101 @@
+"""
+Host runtime for running the Pico application under CPython
+Adds the MicroPython-only parts of the standard modules (time.ticks_*,
+time.sleep_ms, sys.print_exception) so application modules run unmodified
+"""
+
+import os
+import sys
+import time
+import traceback
+
+# MicroPython ticks wrap at 2**30 on the RP2040 port
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+_ticks_offset_ms = 0
+
+
+def ticks_ms():
+    return (int(time.monotonic() * 1000) + _ticks_offset_ms) & TICKS_MAX
+
+
+def ticks_us():
+    return (int(time.monotonic() * 1000000) + _ticks_offset_ms * 1000) & TICKS_MAX
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+
+def sleep_ms(ms):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    if us > 0:
+        time.sleep(us / 1000000)
+
+
+def print_exception(exc, file=None):
+    traceback.print_exception(type(exc), exc, exc.__traceback__, file=file or sys.stdout)
+
+
+class RawStdin:
+    """
+    Unbuffered stdin like MicroPython's: read(n) returns only what is
+    there, so select.poll() on it stays accurate (history_export.py)
+    """
+
+    def fileno(self):
+        return 0
+
+    def read(self, n=1):
+        return os.read(0, n).decode('utf-8', 'replace')
+
+    def readline(self):
+        line = ''
+        while not line.endswith('\n'):
+            ch = self.read(1)
+            if not ch:
+                break
+            line += ch
+        return line
+
+
+def install(ticks_offset_ms=0):
+    """
+    Patch the CPython time and sys modules with the MicroPython extras
+
+    Args:
+        ticks_offset_ms: Start the tick counter this far in, e.g. just
+                         below TICKS_PERIOD to exercise wraparound handling
+    """
+    global _ticks_offset_ms
+    _ticks_offset_ms = ticks_offset_ms
+
+    time.ticks_ms = ticks_ms
+    time.ticks_us = ticks_us
+    time.ticks_cpu = ticks_cpu
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep_ms = sleep_ms
+    time.sleep_us = sleep_us
+    sys.print_exception = print_exception
+
+    # print() and writes to sys.stdout.buffer (console_logger) must not reorder
+    if hasattr(sys.stdout, 'reconfigure'):
+        sys.stdout.reconfigure(write_through=True)
+
+    # A buffered TextIOWrapper would swallow whole command lines on the first read
+    sys.stdin = RawStdin()
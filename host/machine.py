@@ -0,0 +1,238 @@
+"""
+Host shim for the MicroPython machine module
+Pins are simulated in memory and UARTs are backed by a pty, a pipe/file
+or nothing, selected per UART id with configure_uart(). Timer callbacks
+run on a background thread and an unfed WDT ends the process.
+"""
+
+import os
+import sys
+import threading
+import time
+
+CPU_FREQ = 125000000
+
+PWRON_RESET = 1
+WDT_RESET = 3
+
+# UART id -> backend spec ("pty", "null" or a file/FIFO path)
+_uart_backends = {}
+
+
+def configure_uart(uart_id, backend):
+    """
+    Select the backend for a UART id before the application opens it
+
+    Args:
+        uart_id: UART peripheral ID
+        backend: "pty" (default) creates a pseudo terminal and prints its
+                 device path; "null" discards output; anything else is a
+                 path written to (a FIFO, a file or an existing tty)
+    """
+    _uart_backends[uart_id] = backend
+
+
+def freq(hz=None):
+    return CPU_FREQ
+
+
+def unique_id():
+    return b'HOSTPICO'
+
+
+def idle():
+    pass
+
+
+def lightsleep(time_ms=None):
+    """Stand-in for lightsleep: the host process just sleeps"""
+    if time_ms is None:
+        raise RuntimeError("lightsleep() without a timeout would never wake on the host")
+    time.sleep(time_ms / 1000)
+
+
+def deepsleep(time_ms=None):
+    lightsleep(time_ms)
+    reset()
+
+
+def reset_cause():
+    return PWRON_RESET
+
+
+def reset():
+    print("machine.reset() called - exiting host run")
+    if threading.current_thread() is not threading.main_thread():
+        sys.stdout.flush()
+        os._exit(1)  # From a Timer callback: sys.exit would only end the thread
+    sys.exit(1)
+
+
+def soft_reset():
+    reset()
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    # Externally driven pin levels (pin id -> 0/1), see set_level()
+    _levels = {}
+
+    @classmethod
+    def set_level(cls, pin_id, level):
+        """Simulate an external signal on an input pin (e.g. GP2 grounded)"""
+        cls._levels[pin_id] = 1 if level else 0
+
+    def __init__(self, pin_id, mode=-1, pull=-1, value=None):
+        self.pin_id = pin_id
+        self.mode = mode
+        self.pull = pull
+        if value is not None:
+            self.value(value)
+
+    def value(self, level=None):
+        if level is None:
+            if self.pin_id in Pin._levels:
+                return Pin._levels[self.pin_id]
+            return 0 if self.pull == Pin.PULL_DOWN else 1
+        Pin._levels[self.pin_id] = 1 if level else 0
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def __call__(self, level=None):
+        return self.value(level)
+
+    def __repr__(self):
+        return f"Pin({self.pin_id})"
+
+
+class UART:
+    def __init__(self, uart_id, baudrate=115200, bits=8, parity=None, stop=1, tx=None, rx=None, **kwargs):
+        self.uart_id = uart_id
+        self.baudrate = baudrate
+        self._fd = None
+        self._rx = bytearray()
+
+        backend = _uart_backends.get(uart_id, "pty")
+        if backend == "null":
+            return
+        if backend == "pty":
+            import tty
+            master, slave = os.openpty()
+            tty.setraw(slave)
+            self._fd = master
+            self._slave = slave
+            print(f"[host] UART{uart_id} -> {os.ttyname(slave)}")
+        else:
+            self._fd = os.open(backend, os.O_RDWR | os.O_CREAT | os.O_NONBLOCK)
+            print(f"[host] UART{uart_id} -> {backend}")
+        os.set_blocking(self._fd, False)
+
+    def write(self, buf):
+        if self._fd is None:
+            return len(buf)
+        try:
+            return os.write(self._fd, buf)
+        except BlockingIOError:
+            return None  # TX buffer full (no reader), like a UART write timeout
+
+    def _fill(self):
+        if self._fd is None:
+            return
+        try:
+            data = os.read(self._fd, 4096)
+        except (BlockingIOError, OSError):
+            return
+        if data:
+            self._rx += data
+
+    def any(self):
+        self._fill()
+        return len(self._rx)
+
+    def read(self, nbytes=None):
+        self._fill()
+        if not self._rx:
+            return None
+        if nbytes is None:
+            nbytes = len(self._rx)
+        data = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return data
+
+    def readline(self):
+        self._fill()
+        end = self._rx.find(b'\n')
+        if end < 0:
+            return None
+        return self.read(end + 1)
+
+    def txdone(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def deinit(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class Timer:
+    """Periodic/one-shot virtual timer; the callback runs on its own thread"""
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, timer_id=-1, **kwargs):
+        self._stop = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, freq=None, callback=None):
+        self.deinit()
+        if freq:
+            period = 1000 / freq
+        stop = threading.Event()
+        self._stop = stop
+
+        def run():
+            while not stop.wait(period / 1000):
+                callback(self)
+                if mode == Timer.ONE_SHOT:
+                    break
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def deinit(self):
+        if self._stop:
+            self._stop.set()
+            self._stop = None
+
+
+class WDT:
+    """Watchdog: the process exits if feed() is not called within the timeout"""
+
+    def __init__(self, id=0, timeout=5000):
+        self.timeout = timeout
+        self._fed = time.monotonic()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def feed(self):
+        self._fed = time.monotonic()
+
+    def _watch(self):
+        while True:
+            time.sleep(0.1)
+            if time.monotonic() - self._fed > self.timeout / 1000:
+                print(f"[host] WDT not fed for {self.timeout} ms - resetting")
+                sys.stdout.flush()
+                os._exit(1)
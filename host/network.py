@@ -0,0 +1,97 @@
+"""
+Host shim for the MicroPython network module
+Simulates the Pico W WLAN interface; the link can be dropped and restored
+from the host to exercise the application's reconnect paths
+"""
+
+import time
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 3
+
+# Simulated association delay (seconds)
+ASSOCIATE_DELAY = 0.2
+
+# Set to False (see simulate_link) to make the access point unreachable
+_link_available = True
+_interfaces = []
+
+
+def simulate_link(available):
+    """
+    Make the simulated access point reachable or not
+
+    Dropping the link disconnects every active interface.
+
+    Args:
+        available: True to allow connections, False to drop them
+    """
+    global _link_available
+    _link_available = available
+    if not available:
+        for wlan in _interfaces:
+            wlan.disconnect()
+
+
+class WLAN:
+    PM_NONE = 0x10
+    PM_PERFORMANCE = 0xa11142
+    PM_POWERSAVE = 0x111022
+
+    def __init__(self, interface_id=STA_IF):
+        self.interface_id = interface_id
+        self._active = False
+        self._ssid = None
+        self._connect_started = None
+        self._config = {'pm': self.PM_PERFORMANCE}
+        _interfaces.append(self)
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+        if not self._active:
+            self.disconnect()
+
+    def connect(self, ssid=None, key=None):
+        self._ssid = ssid
+        self._connect_started = time.monotonic()
+
+    def disconnect(self):
+        self._connect_started = None
+
+    def isconnected(self):
+        return (self._active and _link_available and self._connect_started is not None
+                and time.monotonic() - self._connect_started >= ASSOCIATE_DELAY)
+
+    def status(self, param=None):
+        if param == 'rssi':
+            return -50
+        if self.isconnected():
+            return STAT_GOT_IP
+        if self._connect_started is not None:
+            return STAT_CONNECTING
+        return STAT_IDLE
+
+    def ifconfig(self, config=None):
+        if self.isconnected():
+            return ('127.0.0.1', '255.0.0.0', '127.0.0.1', '127.0.0.1')
+        return ('0.0.0.0', '0.0.0.0', '0.0.0.0', '0.0.0.0')
+
+    def config(self, *args, **kwargs):
+        if kwargs:
+            self._config.update(kwargs)
+            return None
+        if args:
+            if args[0] == 'essid':
+                return self._ssid
+            return self._config.get(args[0])
+        return None
+
+    def scan(self):
+        import config
+        return [(config.WIFI_SSID.encode('utf-8'), b'\x02\x00\x00\x00\x00\x01', 6, -50, 3, 0)]
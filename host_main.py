@@ -0,0 +1,131 @@
+"""
+Host entry point - runs the unmodified main() on Linux under CPython
+Uses the machine/network shims in host/ so the full pipeline can be
+profiled with cProfile, tracemalloc and other host tools
+
+Examples:
+    python host_main.py --demo
+    python host_main.py --demo --duration 30 --profile cprofile
+    python host_main.py --cerbo 127.0.0.1:5020 --uart /tmp/display.fifo
+    python host_main.py --replay trace.bin --uart null --profile tracemalloc
+    python host_main.py --demo --output-file /tmp/victron.bin --output-protocol binary
+"""
+
+import argparse
+import os
+import signal
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Victron reader on a Linux host")
+    parser.add_argument("--demo", action="store_true",
+                        help="Simulate GP2 grounded (demo mode)")
+    parser.add_argument("--cerbo", metavar="HOST[:PORT]",
+                        help="Override config.CERBO_IP/CERBO_PORT (e.g. a local Modbus simulator)")
+    parser.add_argument("--replay", metavar="TRACE",
+                        help="Replay a recorded Modbus trace (sets config.TRACE_REPLAY_FILE)")
+    parser.add_argument("--replay-speed", type=float, metavar="N",
+                        help="Replay speed multiplier (sets config.TRACE_REPLAY_SPEED)")
+    parser.add_argument("--http", type=int, metavar="PORT",
+                        help="Serve the HTTP status endpoint on PORT (sets config.HTTP_ENABLED)")
+    parser.add_argument("--uart", default="pty", metavar="BACKEND",
+                        help="UART backend: pty (default), null, or a file/FIFO path")
+    parser.add_argument("--output-file", metavar="PATH",
+                        help="Add a file output sink (appends to config.OUTPUT_SINKS)")
+    parser.add_argument("--output-protocol", choices=("text", "binary"), default="text",
+                        help="Protocol for --output-file (default text)")
+    parser.add_argument("--duration", type=float, metavar="SECONDS",
+                        help="Stop (as if Ctrl+C) after this many seconds")
+    parser.add_argument("--ticks-offset", type=int, default=0, metavar="MS",
+                        help="Start ticks_ms at this value (use ~1073700000 to test wraparound)")
+    parser.add_argument("--profile", choices=("cprofile", "tracemalloc"),
+                        help="Run main() under a profiler")
+    parser.add_argument("--profile-out", metavar="FILE",
+                        help="Write cProfile stats to FILE instead of printing them")
+    parser.add_argument("--top", type=int, default=25,
+                        help="Number of profile entries to print")
+    return parser.parse_args(argv)
+
+
+def setup(args):
+    """Install the host shims and apply command line overrides to config"""
+    sys.path.insert(0, os.path.join(ROOT, "host"))
+    if ROOT not in sys.path:
+        sys.path.insert(1, ROOT)
+
+    import host_runtime
+    host_runtime.install(ticks_offset_ms=args.ticks_offset)
+
+    import config
+    import machine
+
+    if args.cerbo:
+        host, _, port = args.cerbo.partition(":")
+        config.CERBO_IP = host
+        if port:
+            config.CERBO_PORT = int(port)
+    if args.replay:
+        config.TRACE_REPLAY_FILE = args.replay
+    if args.replay_speed is not None:
+        config.TRACE_REPLAY_SPEED = args.replay_speed
+    if args.http:
+        config.HTTP_ENABLED = True
+        config.HTTP_PORT = args.http
+
+    if args.output_file:
+        config.OUTPUT_SINKS = list(config.OUTPUT_SINKS) + [
+            {"type": "file", "path": args.output_file, "protocol": args.output_protocol}]
+
+    machine.configure_uart(config.UART_ID, args.uart)
+    if args.demo:
+        machine.Pin.set_level(config.DEMO_PIN, 0)
+
+
+def stop_after(seconds):
+    """Deliver a KeyboardInterrupt after a delay so main() shuts down cleanly"""
+    def _interrupt(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGALRM, _interrupt)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+
+
+def run(args):
+    import main
+
+    if args.duration:
+        stop_after(args.duration)
+
+    if args.profile == "cprofile":
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.runcall(main.main)
+        if args.profile_out:
+            profiler.dump_stats(args.profile_out)
+            print(f"[host] cProfile stats written to {args.profile_out}")
+        else:
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.top)
+
+    elif args.profile == "tracemalloc":
+        import tracemalloc
+        tracemalloc.start(10)
+        main.main()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"[host] tracemalloc: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB")
+        for stat in snapshot.statistics("lineno")[:args.top]:
+            print(f"  {stat}")
+
+    else:
+        main.main()
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    setup(arguments)
+    run(arguments)
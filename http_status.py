@@ -0,0 +1,205 @@
+"""
+HTTP/JSON status endpoint
+Small non-blocking HTTP server polled from the main loop. Responses are
+serialized to complete HTTP bytes at most once per update (once per Modbus
+poll), so serving a request never touches Modbus or re-encodes JSON. The
+snapshot is serialized with each update; /stats and /history only on the
+first request after one, so unread statistics and history cost nothing.
+
+Endpoints:
+    GET /           latest snapshot (same as /status)
+    GET /status     latest snapshot
+    GET /stats      client, scheduler and UART statistics
+    GET /history    recent samples and rollups
+"""
+
+import errno
+import json
+import socket
+import time
+
+_AGAIN = (errno.EAGAIN, getattr(errno, 'EWOULDBLOCK', errno.EAGAIN))
+
+_NOT_FOUND = b"HTTP/1.0 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+_NOT_READY = b"HTTP/1.0 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+def _response(body):
+    """Complete HTTP response bytes for a JSON body"""
+    header = ("HTTP/1.0 200 OK\r\nContent-Type: application/json\r\n"
+              "Access-Control-Allow-Origin: *\r\nConnection: close\r\n"
+              "Content-Length: %d\r\n\r\n" % len(body))
+    return header.encode() + body
+
+
+class _Connection:
+    """One client: request bytes received so far, response bytes still to send"""
+
+    def __init__(self, sock, now):
+        self.sock = sock
+        self.inbuf = b""
+        self.outbuf = None
+        self.sent = 0
+        self.started = now
+
+
+class StatusServer:
+    """Non-blocking HTTP server serving pre-serialized JSON"""
+
+    def __init__(self, port=80, max_clients=4, timeout_ms=2000):
+        """
+        Args:
+            port: TCP port to listen on
+            max_clients: Connections served at once; more wait in the backlog
+            timeout_ms: Drop clients that have not finished after this long
+        """
+        self.port = port
+        self.max_clients = max_clients
+        self.timeout_ms = timeout_ms
+        self.listener = None
+        self.connections = []
+        self.responses = {}
+        self._stats = None
+        self._history = None
+        self.requests = 0
+        self.updates = 0
+        self.serializations = 0
+        self.dropped = 0
+
+    def start(self):
+        """Open the listening socket"""
+        addr = socket.getaddrinfo("0.0.0.0", self.port)[0][-1]
+        listener = socket.socket()
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(addr)
+        listener.listen(self.max_clients)
+        listener.setblocking(False)
+        self.listener = listener
+        print(f"HTTP status server on port {self.port}")
+
+    def update(self, data, stats=None, history=None):
+        """
+        Serialize the snapshot response and drop the other cached responses
+
+        Args:
+            data: Data dictionary from read_all_data()
+            stats: Optional dictionary of statistics dictionaries, or a
+                   callable returning one (called on the first /stats request)
+            history: Optional history.History
+        """
+        status = _response(json.dumps(data).encode())
+        self.responses = {
+            b"/": status,
+            b"/status": status,
+        }
+        self._stats = stats
+        self._history = history
+        self.updates += 1
+
+    def _serialize(self, path):
+        """Serialize and cache /stats or /history for the current update"""
+        if path == b"/stats":
+            stats = self._stats
+            body = (stats() if callable(stats) else stats) or {}
+        elif path == b"/history" and self._history is not None:
+            body = {
+                'samples': self._history.samples(),
+                'rollups': self._history.rollup_summary(),
+            }
+        else:
+            return _NOT_FOUND
+        response = _response(json.dumps(body).encode())
+        self.responses[path] = response
+        self.serializations += 1
+        return response
+
+    def poll(self):
+        """Accept, read and answer whatever is ready without blocking"""
+        if self.listener is None:
+            return
+        now = time.ticks_ms()
+
+        while len(self.connections) < self.max_clients:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError as e:
+                if e.args[0] not in _AGAIN:
+                    print(f"HTTP accept error: {e}")
+                break
+            sock.setblocking(False)
+            self.connections.append(_Connection(sock, now))
+
+        for conn in list(self.connections):
+            try:
+                done = self._service(conn)
+            except OSError as e:
+                if e.args[0] in _AGAIN:
+                    done = False
+                else:
+                    done = True
+            if not done and time.ticks_diff(now, conn.started) > self.timeout_ms:
+                self.dropped += 1
+                done = True
+            if done:
+                self._close(conn)
+
+    def _service(self, conn):
+        """Advance one connection; returns True when it is finished"""
+        if conn.outbuf is None:
+            chunk = conn.sock.recv(512)
+            if not chunk:
+                return True
+            conn.inbuf += chunk
+            if b"\r\n" not in conn.inbuf:
+                return len(conn.inbuf) > 1024  # Request line too long
+            conn.outbuf = self._route(conn.inbuf)
+            self.requests += 1
+
+        sent = conn.sock.send(memoryview(conn.outbuf)[conn.sent:])
+        if sent:
+            conn.sent += sent
+        return conn.sent >= len(conn.outbuf)
+
+    def _route(self, request):
+        """Pick the cached response for the request line, serializing it if needed"""
+        parts = request.split(b"\r\n", 1)[0].split(b" ")
+        if len(parts) < 2 or parts[0] != b"GET":
+            return _NOT_FOUND
+        if not self.responses:
+            return _NOT_READY
+        path = parts[1].split(b"?", 1)[0]
+        response = self.responses.get(path)
+        if response is None:
+            response = self._serialize(path)
+        return response
+
+    def _close(self, conn):
+        try:
+            conn.sock.close()
+        except OSError:
+            pass
+        self.connections.remove(conn)
+
+    def get_stats(self):
+        """
+        Get server statistics
+
+        Returns:
+            Dictionary with requests served, snapshot updates, lazy
+            /stats and /history serializations, dropped (timed out)
+            clients and open connections
+        """
+        return {
+            'requests': self.requests,
+            'updates': self.updates,
+            'serializations': self.serializations,
+            'dropped': self.dropped,
+            'open': len(self.connections),
+        }
+
+    def close(self):
+        for conn in list(self.connections):
+            self._close(conn)
+        if self.listener:
+            self.listener.close()
+            self.listener = None
@@ -0,0 +1,230 @@
+"""
+Flash Image Source for the Battery Monitor Display
+Streams a raw RGB565 background image from a flash file in row chunks
+straight into the LCD framebuffer, instead of holding the whole image in RAM
+
+NOTE: This file is intended for the Waveshare RP2350B display, not the Pico W.
+Copy this file to your HA-Waveshare-Display repository together with
+battery_monitor.py.
+"""
+
+import os
+
+# Bytes per pixel for RGB565
+BYTES_PER_PIXEL = 2
+
+
+def export_image(image_data, path, chunk_size=4096):
+    """
+    Write an in-RAM image (e.g. from image_data.get_image()) to a flash file
+
+    Only needed once per image; afterwards the image is streamed from the
+    file and image_data never has to be imported again. The image is
+    written to path + ".tmp" and renamed when complete, so a reset during
+    the export never leaves a truncated file at path.
+
+    Args:
+        image_data: Raw RGB565 image bytes in LCD byte order
+        path: Destination file path
+        chunk_size: Bytes written per call (bounds temporary allocations)
+
+    Returns:
+        Number of bytes written
+    """
+    mv = memoryview(image_data)
+    written = 0
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        while written < len(mv):
+            written += f.write(mv[written:written + chunk_size])
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Filesystem that does not rename over an existing file (FAT)
+        os.remove(path)
+        os.rename(tmp_path, path)
+    return written
+
+
+class FlashImageSource:
+    """
+    Raw RGB565 image stored in flash, blitted into a framebuffer on demand
+
+    Rows are read with readinto() directly into the destination buffer,
+    so no intermediate copy of the image is ever allocated. An optional
+    band of rows (e.g. the rows under the gauge) can be cached in RAM to
+    make frequent partial redraws cheap.
+    """
+
+    def __init__(self, path, width=240, height=240, chunk_rows=16, cache_rows=None):
+        """
+        Open a flash image
+
+        Args:
+            path: Path of the raw RGB565 file (width * height * 2 bytes)
+            width: Image width in pixels
+            height: Image height in pixels
+            chunk_rows: Rows read per readinto() call when streaming
+            cache_rows: Optional (start_row, end_row) band to keep in RAM
+
+        Raises:
+            OSError: If the file does not exist
+            ValueError: If the file size does not match width x height
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.row_bytes = width * BYTES_PER_PIXEL
+        self.chunk_rows = max(1, chunk_rows)
+
+        size = os.stat(path)[6]
+        expected = self.row_bytes * height
+        if size != expected:
+            raise ValueError(f"{path}: {size} bytes, expected {expected} for {width}x{height}")
+
+        self._file = None
+        self._cache = None
+        self._cache_start = 0
+        self._cache_end = 0
+
+        self.bytes_streamed = 0
+        self.bytes_from_cache = 0
+
+        if cache_rows:
+            self.cache_rows(cache_rows[0], cache_rows[1])
+
+    def _open(self):
+        """Open the image file once and keep the handle for later blits"""
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        return self._file
+
+    def _clip_rows(self, y0, y1):
+        """Clamp a row range to the image height"""
+        if y1 is None:
+            y1 = self.height
+        return max(0, y0), min(self.height, y1)
+
+    def cache_rows(self, y0, y1):
+        """
+        Keep a band of rows in RAM
+
+        Args:
+            y0: First cached row (inclusive)
+            y1: Last cached row (exclusive)
+
+        Returns:
+            Number of bytes cached
+        """
+        y0, y1 = self._clip_rows(y0, y1)
+        self._cache = None
+        if y1 <= y0:
+            return 0
+
+        cache = bytearray((y1 - y0) * self.row_bytes)
+        f = self._open()
+        f.seek(y0 * self.row_bytes)
+        f.readinto(cache)
+
+        self._cache = cache
+        self._cache_start = y0
+        self._cache_end = y1
+        return len(cache)
+
+    def blit_rows(self, framebuffer, y0=0, y1=None):
+        """
+        Copy full-width rows [y0, y1) of the image into a framebuffer
+
+        The framebuffer must use the same geometry and byte order as the
+        image (e.g. LCD_1inch28.buffer). Cached rows are copied from RAM,
+        the rest is streamed from flash in chunk_rows sized reads.
+
+        Args:
+            framebuffer: Destination bytearray
+            y0: First row (inclusive)
+            y1: Last row (exclusive, defaults to image height)
+        """
+        y0, y1 = self._clip_rows(y0, y1)
+        dest = memoryview(framebuffer)
+        row_bytes = self.row_bytes
+        y = y0
+
+        while y < y1:
+            if self._cache is not None and self._cache_start <= y < self._cache_end:
+                end = min(y1, self._cache_end)
+                src = (y - self._cache_start) * row_bytes
+                count = (end - y) * row_bytes
+                dest[y * row_bytes:y * row_bytes + count] = memoryview(self._cache)[src:src + count]
+                self.bytes_from_cache += count
+                y = end
+                continue
+
+            # Stream up to the next cached band (or the end) from flash
+            end = min(y1, y + self.chunk_rows)
+            if self._cache is not None and y < self._cache_start < end:
+                end = self._cache_start
+
+            f = self._open()
+            f.seek(y * row_bytes)
+            f.readinto(dest[y * row_bytes:end * row_bytes])
+            self.bytes_streamed += (end - y) * row_bytes
+            y = end
+
+    def blit_rect(self, framebuffer, x, y, w, h):
+        """
+        Copy a rectangular dirty region of the image into a framebuffer
+
+        Args:
+            framebuffer: Destination bytearray
+            x: Left column
+            y: Top row
+            w: Width in pixels
+            h: Height in pixels
+        """
+        x0 = max(0, x)
+        x1 = min(self.width, x + w)
+        y0, y1 = self._clip_rows(y, y + h)
+        if x1 <= x0:
+            return
+
+        # Full-width regions can use the contiguous path
+        if x0 == 0 and x1 == self.width:
+            self.blit_rows(framebuffer, y0, y1)
+            return
+
+        dest = memoryview(framebuffer)
+        row_bytes = self.row_bytes
+        start = x0 * BYTES_PER_PIXEL
+        span = (x1 - x0) * BYTES_PER_PIXEL
+
+        for row in range(y0, y1):
+            offset = row * row_bytes + start
+            if self._cache is not None and self._cache_start <= row < self._cache_end:
+                src = (row - self._cache_start) * row_bytes + start
+                dest[offset:offset + span] = memoryview(self._cache)[src:src + span]
+                self.bytes_from_cache += span
+            else:
+                f = self._open()
+                f.seek(offset)
+                f.readinto(dest[offset:offset + span])
+                self.bytes_streamed += span
+
+    def get_stats(self):
+        """
+        Get streaming statistics
+
+        Returns:
+            Dictionary with cache size and bytes copied from flash/cache
+        """
+        return {
+            'cache_bytes': len(self._cache) if self._cache is not None else 0,
+            'bytes_streamed': self.bytes_streamed,
+            'bytes_from_cache': self.bytes_from_cache,
+        }
+
+    def close(self):
+        """Close the image file and drop the row cache"""
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._cache = None
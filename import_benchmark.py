@@ -0,0 +1,100 @@
+"""
+Import time and heap benchmark
+On the Pico, imports every application module in manifest order and
+prints how long each import took and how much heap it kept. Run it once
+with .py sources and once with .mpy bytecode deployed, then compare the
+two outputs on the host.
+
+Examples:
+    mpremote run import_benchmark.py > import_py.txt     # after ./deploy.sh
+    mpremote run import_benchmark.py > import_mpy.txt    # after ./deploy.sh --mpy
+    python import_benchmark.py import_py.txt import_mpy.txt
+"""
+
+import sys
+
+# Manifest order without main (importing it is harmless but it pulls in
+# everything at once); keep in step with manifest.py
+MODULES = (
+    'config', 'modbus_frames', 'circuit_breaker', 'victron_trace', 'victron_client',
+    'replay_victron_client', 'demo_victron_client', 'wifi_manager', 'display_protocol',
+    'uart_manager', 'uart_feedback', 'output_fanout', 'scheduler', 'console_logger',
+    'derived_metrics', 'alarms', 'history', 'sample_log', 'history_export', 'http_status',
+    'device_discovery', 'power_manager', 'dual_core', 'supervisor',
+)
+
+
+def _source_kind(name):
+    """'mpy', 'py' or 'frozen' depending on what the import will load"""
+    import os
+    for ext in ('py', 'mpy'):
+        try:
+            os.stat(f"{name}.{ext}")
+            return ext
+        except OSError:
+            pass
+    return 'frozen'
+
+
+def run_device():
+    """Measure each import and print one line per module"""
+    import gc
+    import time
+
+    gc.collect()
+    start_free = gc.mem_free()
+    print("# module kind import_ms heap_bytes free_after")
+    total_ms = 0
+    for name in MODULES:
+        kind = _source_kind(name)
+        gc.collect()
+        free_before = gc.mem_free()
+        t0 = time.ticks_us()
+        try:
+            __import__(name)
+        except ImportError as e:
+            print(f"# {name}: {e}")
+            continue
+        elapsed_ms = time.ticks_diff(time.ticks_us(), t0) / 1000
+        gc.collect()
+        free_after = gc.mem_free()
+        total_ms += elapsed_ms
+        print(f"{name} {kind} {elapsed_ms:.1f} {free_before - free_after} {free_after}")
+    gc.collect()
+    print(f"TOTAL - {total_ms:.1f} {start_free - gc.mem_free()} {gc.mem_free()}")
+
+
+def _load(path):
+    results = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 5 and not line.startswith('#'):
+                results[parts[0]] = (parts[1], float(parts[2]), int(parts[3]), int(parts[4]))
+    return results
+
+
+def compare(before_path, after_path):
+    """Print a side-by-side comparison of two device runs"""
+    before = _load(before_path)
+    after = _load(after_path)
+    print(f"{'module':36} {'before ms':>10} {'after ms':>10} {'before B':>10} {'after B':>10}")
+    for name in list(MODULES) + ['TOTAL']:
+        if name not in before or name not in after:
+            continue
+        b, a = before[name], after[name]
+        label = name if name == 'TOTAL' else f"{name} ({b[0]}->{a[0]})"
+        print(f"{label:36} {b[1]:10.1f} {a[1]:10.1f} {b[2]:10d} {a[2]:10d}")
+    if 'TOTAL' in before and 'TOTAL' in after:
+        b, a = before['TOTAL'], after['TOTAL']
+        print(f"\nImport time {b[1]:.0f} -> {a[1]:.0f} ms, heap kept {b[2]} -> {a[2]} bytes, "
+              f"free heap after imports {b[3]} -> {a[3]} bytes")
+
+
+if sys.implementation.name == 'micropython':
+    run_device()
+elif __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(2)
+    compare(sys.argv[1], sys.argv[2])
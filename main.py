@@ -9,6 +9,9 @@ import config
 from machine import Pin
 from wifi_manager import WiFiManager
 from uart_manager import UARTManager
+from display_protocol import time_to_go
+from scheduler import FixedRateScheduler
+from console_logger import ConsoleLogger, INFO
 
 def detect_demo_mode():
     """
@@ -32,11 +35,168 @@ def detect_demo_mode():
 
     return is_demo
 
+def wifi_status_code(wifi_connected):
+    """
+    Map a WiFi state to the UART WIFI status code
+
+    Args:
+        wifi_connected: True/False, or None when WiFi is not used (demo/replay)
+
+    Returns:
+        0=disconnected, 1=connected, 2=skipped
+    """
+    if wifi_connected is None:
+        return 2  # Skipped (demo or replay mode)
+    return 1 if wifi_connected else 0
+
+def log_data(log, data, mode_indicator, full=True):
+    """
+    Log one snapshot to the console
+
+    Args:
+        log: ConsoleLogger (timestamp taken by log.begin_cycle())
+        data: Data dictionary from read_all_data()
+        mode_indicator: Prefix such as "[DEMO] "
+        full: Print the full table; otherwise a single summary line
+    """
+    if not log.is_enabled(INFO):
+        return
+
+    if not full:
+        log.info("%sV=%s I=%s T=%s SOC=%s P=%s%s", mode_indicator,
+                 _fmt(data['battery_voltage'], "%.1f"), _fmt(data['battery_current'], "%.1f"),
+                 _fmt(data['battery_temperature'], "%.1f"), _fmt(data['battery_soc'], "%d"),
+                 _fmt(data.get('battery_power'), "%.0f"),
+                 " (stale)" if data.get('stale_fields') else "")
+        return
+
+    log.detail("")
+    log.info("%sVictron Data:", mode_indicator)
+    if data['battery_voltage'] is not None:
+        log.detail("  Battery Voltage: %.1f V", data['battery_voltage'])
+    if data['battery_current'] is not None:
+        current = data['battery_current']
+        direction = "Charging" if current > 0 else "Discharging"
+        log.detail("  Battery Current: %.1f A (%s)", abs(current), direction)
+    if data['battery_temperature'] is not None:
+        log.detail("  Battery Temp:    %.1f °C", data['battery_temperature'])
+    if data['battery_soc'] is not None:
+        log.detail("  Battery SOC:     %d%%", data['battery_soc'])
+    if data['charging_state'] is not None:
+        state_text = "Charging" if data['charging_state'] == 1 else "Not Charging"
+        log.detail("  Charging State:  %s", state_text)
+    if data.get('pv_power') is not None:
+        log.detail("  PV Power:        %.0f W (%.1f V)", data['pv_power'], data['pv_voltage'])
+    if data.get('solar_yield_today') is not None:
+        log.detail("  Yield Today:     %.1f kWh", data['solar_yield_today'])
+    if data.get('ac_load') is not None:
+        log.detail("  AC Load:         %.0f W (state %d)", data['ac_load'], data['inverter_state'])
+    if data.get('stale_fields'):
+        log.detail("  Stale (last-known values): %s", ", ".join(data['stale_fields']))
+    if data.get('battery_power') is not None:
+        log.detail("  Battery Power:   %.0f W (avg %.0f W, net %+.2f Ah)",
+                   data['battery_power'], data['load_power_avg'], data['net_ah'])
+    if data.get('time_to_full_min') is not None:
+        minutes = data['time_to_full_min']
+        log.detail("  Time to Full:    %dh %02dm", minutes // 60, minutes % 60)
+    elif data.get('time_to_empty_min') is not None:
+        minutes = data['time_to_empty_min']
+        log.detail("  Time to Empty:   %dh %02dm", minutes // 60, minutes % 60)
+
+def _fmt(value, spec):
+    """Format a value for the summary line, '-' when missing"""
+    return "-" if value is None else spec % value
+
+def uart_message_slots():
+    """
+    Build the UART message cycle from the configuration
+
+    Returns:
+        Tuple of message names, one sent per slot
+    """
+    slots = ('BATTERY', 'BATSYS', 'CHARGING', 'WIFI', 'DEMO')
+    if config.EXTENDED_DATA_ENABLED and config.UART_SEND_EXTENDED:
+        slots += ('SOLAR', 'INVERTER')
+    if config.DERIVED_METRICS_ENABLED and config.UART_SEND_POWER:
+        slots += ('POWER',)
+    return slots
+
+def send_uart_message(log, uart_mgr, slot, data, wifi_status, demo_mode):
+    """
+    Send the UART message for one slot of the message cycle
+
+    Args:
+        log: ConsoleLogger for send failures
+        uart_mgr: UARTManager
+        slot: Message name from uart_message_slots()
+        data: Data dictionary from read_all_data()
+        wifi_status: UART WIFI status code (see wifi_status_code)
+        demo_mode: True if demo mode is active
+    """
+    if slot == 'BATTERY':
+        # Message 1: Battery SOC
+        if data['battery_soc'] is not None:
+            if not uart_mgr.send_battery_soc(data['battery_soc']):
+                log.warning("Failed to send SOC via UART")
+
+    elif slot == 'BATSYS':
+        # Message 2: Battery system data
+        if (data['battery_voltage'] is not None and
+            data['battery_current'] is not None and
+            data['battery_temperature'] is not None):
+            if not uart_mgr.send_battery_system(
+                data['battery_voltage'],
+                data['battery_current'],
+                data['battery_temperature']
+            ):
+                log.warning("Failed to send BATSYS via UART")
+
+    elif slot == 'CHARGING':
+        # Message 3: Charging state
+        if data['charging_state'] is not None:
+            if not uart_mgr.send_charging_state(data['charging_state']):
+                log.warning("Failed to send CHARGING via UART")
+
+    elif slot == 'WIFI':
+        # Message 4: WiFi status
+        if not uart_mgr.send_wifi_status(wifi_status):
+            log.warning("Failed to send WIFI status via UART")
+
+    elif slot == 'DEMO':
+        # Message 5: Demo mode status
+        if not uart_mgr.send_demo_mode(demo_mode):
+            log.warning("Failed to send DEMO mode via UART")
+
+    elif slot == 'SOLAR':
+        # Message 6: Solar charger data
+        if data.get('pv_power') is not None:
+            if not uart_mgr.send_solar(
+                data['pv_power'],
+                data['pv_voltage'],
+                data['solar_yield_today']
+            ):
+                log.warning("Failed to send SOLAR via UART")
+
+    elif slot == 'INVERTER':
+        # Message 7: Inverter data
+        if data.get('ac_load') is not None:
+            if not uart_mgr.send_inverter(data['ac_load'], data['inverter_state']):
+                log.warning("Failed to send INVERTER via UART")
+
+    elif slot == 'POWER':
+        # Message 8: Derived power data
+        if data.get('battery_power') is not None:
+            if not uart_mgr.send_power(data['battery_power'], data['net_ah'], time_to_go(data)):
+                log.warning("Failed to send POWER via UART")
+
 def main():
     """Main application loop"""
     # Detect demo mode first
     demo_mode = detect_demo_mode()
 
+    # Demo and trace replay both run without the Cerbo GX
+    offline = demo_mode or bool(config.TRACE_REPLAY_FILE)
+
     if not demo_mode:
         print("=" * 50)
         print("Victron Cerbo GX Reader")
@@ -44,9 +204,9 @@ def main():
     else:
         print("")  # Extra spacing after demo banner
 
-    # Initialize WiFi (skip in demo mode)
+    # Initialize WiFi (skip in demo and replay mode)
     wifi = None
-    if not demo_mode:
+    if not offline:
         wifi = WiFiManager()
 
         # Disconnect from any existing WiFi connection first
@@ -61,8 +221,10 @@ def main():
             print("  - Password is correct")
             print("  - Cerbo GX hotspot is enabled")
             return
-    else:
+    elif demo_mode:
         print("[WiFi] Skipped - demo mode enabled\n")
+    else:
+        print("[WiFi] Skipped - replaying trace\n")
 
     # Initialize Victron client (real or demo)
     if demo_mode:
@@ -70,11 +232,31 @@ def main():
         step_label = "[1/2]"
         print(f"{step_label} Initializing demo Victron client...")
         victron = DemoVictronClient()
+    elif config.TRACE_REPLAY_FILE:
+        from replay_victron_client import ReplayVictronClient
+        step_label = "[1/2]"
+        print(f"{step_label} Replaying Modbus trace {config.TRACE_REPLAY_FILE}...")
+        victron = ReplayVictronClient()
     else:
         from victron_client import VictronClient
         step_label = "[2/2]"
         print(f"\n{step_label} Connecting to Cerbo GX at {config.CERBO_IP}:{config.CERBO_PORT}")
-        victron = VictronClient()
+        recorder = None
+        if config.TRACE_RECORD_FILE:
+            from victron_trace import TraceRecorder
+            recorder = TraceRecorder(config.TRACE_RECORD_FILE)
+            print(f"Recording Modbus trace to {config.TRACE_RECORD_FILE}")
+        victron = VictronClient(recorder=recorder)
+
+        # Find the installation's unit IDs (cached in flash, verified on boot)
+        if config.DISCOVERY_ENABLED:
+            from device_discovery import discover
+            device_map = discover()
+            if device_map:
+                victron.apply_device_map(device_map)
+                print(f"Devices ({device_map['source']}): {device_map['units']}")
+            else:
+                print("Discovery found no system unit - using default unit IDs")
 
     if not victron.connect():
         print("ERROR: Failed to connect to Cerbo GX via Modbus TCP")
@@ -88,7 +270,7 @@ def main():
     # Initialize UART for display communication
     uart_mgr = None
     if config.UART_ENABLED:
-        step_label = "[2/2]" if demo_mode else "[3/3]"
+        step_label = "[2/2]" if offline else "[3/3]"
         print(f"\n{step_label} Initializing UART on GP{config.UART_TX_PIN} (TX)")
         try:
             uart_mgr = UARTManager(
@@ -103,112 +285,380 @@ def main():
             print("Continuing without UART output...")
             uart_mgr = None
 
-    # Main polling loop
+    # Extra outputs (second display, USB or file logger) fed with every new snapshot
+    fanout = None
+    if config.OUTPUT_SINKS:
+        from output_fanout import OutputFanout, make_sink
+        sinks = []
+        for spec in config.OUTPUT_SINKS:
+            if spec['type'] == 'uart' and uart_mgr and spec['id'] == config.UART_ID:
+                print(f"WARNING: Output sink on UART{spec['id']} skipped (used by the display)")
+                continue
+            try:
+                sinks.append(make_sink(spec))
+            except Exception as e:
+                print(f"WARNING: Output sink {spec} failed: {e}")
+        if sinks:
+            fanout = OutputFanout(sinks)
+            print("Outputs: " + ", ".join(f"{sink.name} ({sink.protocol})" for sink in sinks))
+
+    # Main polling loop: fixed-rate message slots, Modbus polled every POLL_INTERVAL
+    slot_ms = config.UART_MESSAGE_INTERVAL_MS
+    poll_every = max(1, config.POLL_INTERVAL * 1000 // slot_ms)
+    uart_slots = uart_message_slots()
+
+    # Low-power mode: one slot per period, polling Modbus and sending every UART
+    # message in a burst, then sleeping until the next period
+    power = None
+    if config.LOW_POWER_ENABLED and config.DUAL_CORE_ENABLED:
+        print("WARNING: Low-power mode is not available in dual-core mode")
+    elif config.LOW_POWER_ENABLED:
+        from power_manager import PowerManager
+        slot_ms = config.LOW_POWER_PERIOD_MS
+        if slot_ms >= config.DISPLAY_STALENESS_MS:
+            slot_ms = config.DISPLAY_STALENESS_MS * 2 // 3
+            print(f"WARNING: LOW_POWER_PERIOD_MS too long for the display, using {slot_ms} ms")
+        poll_every = 1
+        power = PowerManager(config.LOW_POWER_SLEEP)
+        if wifi:
+            power.configure_wlan(wifi.wlan)
+
+    # Display feedback: acks from the display set the message rate and message set
+    feedback = None
+    if uart_mgr and config.UART_FEEDBACK_ENABLED and power:
+        print("WARNING: Display feedback is not available in low-power mode")
+    elif uart_mgr and config.UART_FEEDBACK_ENABLED:
+        from uart_feedback import DisplayFeedback
+        feedback = DisplayFeedback(uart_mgr.uart, slot_ms)
+        uart_mgr.feedback = feedback
+        reduced_slots = tuple(slot for slot in uart_slots
+                              if slot in config.UART_FEEDBACK_REDUCED_SLOTS) or uart_slots
+        print(f"UART: Display feedback on GP{config.UART_RX_PIN}, "
+              f"{feedback.min_period_ms}-{feedback.max_period_ms} ms per message")
+
+    # Stall supervisor: per-stage latency budgets, recovery steps and the hardware watchdog
+    supervisor = None
+    if config.SUPERVISOR_ENABLED:
+        from supervisor import Supervisor, ACTION_SOCKET, ACTION_WIFI
+        actions = {}
+        if hasattr(victron, 'reset_socket'):
+            actions[ACTION_SOCKET] = victron.reset_socket
+        if wifi:
+            def reset_wifi():
+                wifi.reset_link()
+                victron.reset_socket()
+            actions[ACTION_WIFI] = reset_wifi
+        wdt_ms = config.SUPERVISOR_WDT_MS
+        if power and power.sleep_mode == 'lightsleep' and wdt_ms:
+            print("WARNING: Hardware watchdog disabled (lightsleep would outlast it)")
+            wdt_ms = 0
+        supervisor = Supervisor(actions=actions, wdt_ms=wdt_ms)
+        print(f"Supervisor: budgets {config.SUPERVISOR_BUDGETS_MS}, "
+              f"watchdog {f'{wdt_ms} ms' if wdt_ms else 'off'}")
+        for entry in supervisor.log[-3:]:
+            print(f"Supervisor log: {entry}")
+
     mode_text = "DEMO MODE" if demo_mode else f"interval: {config.POLL_INTERVAL}s"
+    if power:
+        mode_text = f"low-power, {power.sleep_mode} between polls every {slot_ms} ms"
     print(f"\nStarting data polling ({mode_text})")
-    print("UART: Cycling through 5 messages, 1 message per second")
+    if power:
+        print(f"UART: Sending all {len(uart_slots)} messages after each poll")
+    else:
+        print(f"UART: Cycling through {len(uart_slots)} messages, 1 message every {slot_ms} ms")
     print("Press Ctrl+C to stop\n")
     print("-" * 60)
 
-    # UART message cycle counter (0-4 for 5 messages)
+    # Console output for the loop: levelled, rate limited, full table every LOG_TABLE_EVERY polls
+    log = ConsoleLogger(config.LOG_LEVEL, config.LOG_RATE_LIMIT)
+    snapshots = 0
+
+    # UART message cycle counter (index into uart_slots)
     uart_message_cycle = 0
+    mode_indicator = "[DEMO] " if demo_mode else ""
+
+    # Derived metrics (power, Ah/Wh counters, time-to-go) from each poll
+    metrics = None
+    if config.DERIVED_METRICS_ENABLED:
+        from derived_metrics import DerivedMetrics
+        metrics = DerivedMetrics()
+
+    # Local alarm rules, evaluated once per slot
+    alarms = None
+    if config.ALARMS_ENABLED:
+        from alarms import AlarmEngine
+        alarms = AlarmEngine()
+
+    # Recent sample history and the HTTP status endpoint
+    history = None
+    if config.HISTORY_ENABLED:
+        from history import History
+        history = History()
+
+    # Flash sample log and the USB bulk export (EXPORT commands on stdin)
+    sample_log = None
+    if config.SAMPLE_LOG_ENABLED:
+        from sample_log import SampleLog, sync_clock
+        # The RTC restarts at its default date on every boot; without NTP only
+        # this boot's records can be mapped to real time when exported
+        clock_synced = bool(wifi and config.SAMPLE_LOG_NTP_HOST and sync_clock(config.SAMPLE_LOG_NTP_HOST))
+        try:
+            sample_log = SampleLog(clock_synced=clock_synced)
+            stats = sample_log.get_stats()
+            print(f"Sample log: {config.SAMPLE_LOG_DIR}/, {stats['segments']} segments on flash, "
+                  f"boot {stats['boot']}, clock {'synced' if clock_synced else 'not synced'}")
+        except OSError as e:
+            print(f"WARNING: Sample log unavailable: {e}")
+
+    exporter = None
+    if config.EXPORT_ENABLED and (sample_log or history):
+        from history_export import HistoryExporter
+        exporter = HistoryExporter(sample_log, history)
+        print("Export: send 'EXPORT log' or 'EXPORT samples' over USB (history_pull.py)")
+
+    server = None
+    if config.HTTP_ENABLED:
+        from http_status import StatusServer
+        server = StatusServer(config.HTTP_PORT)
+        try:
+            server.start()
+        except OSError as e:
+            print(f"WARNING: HTTP status server failed to start: {e}")
+            server = None
+
+    scheduler = FixedRateScheduler(slot_ms, config.SCHEDULER_POLICY,
+                                   sleep_ms=power.sleep_ms if power else None)
+
+    def collect_stats():
+        stats = {'scheduler': scheduler.get_stats()}
+        if hasattr(victron, 'get_cache_stats'):
+            stats['cache'] = victron.get_cache_stats()
+            stats['breakers'] = victron.get_breaker_stats()
+        if uart_mgr:
+            stats['uart'] = uart_mgr.get_stats()
+        if feedback:
+            stats['feedback'] = feedback.get_stats()
+        if fanout:
+            stats['outputs'] = fanout.get_stats()
+        if alarms:
+            stats['alarms'] = alarms.get_stats()
+        if metrics:
+            stats['metrics'] = metrics.get_stats()
+        if power:
+            stats['power'] = power.get_stats()
+        if sample_log:
+            stats['sample_log'] = sample_log.get_stats()
+        if exporter:
+            stats['export'] = exporter.get_stats()
+        if supervisor:
+            stats['supervisor'] = supervisor.get_stats()
+        if server and not poller:
+            stats['http'] = server.get_stats()  # Core 1 adds its own in dual-core mode
+        stats['log'] = log.get_stats()
+        return stats
+
+    # Optional dual-core mode: WiFi/Modbus polling moves to core 1
+    poller = None
+    if config.DUAL_CORE_ENABLED:
+        from dual_core import SnapshotMailbox, NetworkPoller
+        mailbox = SnapshotMailbox()
+        poller = NetworkPoller(victron, wifi, mailbox, poll_ms=config.DUAL_CORE_POLL_MS,
+                               metrics=metrics, history=history, status_server=server,
+                               supervisor=supervisor)
+        if supervisor:
+            # The supervisor Timer runs on core 0: its resets only raise flags for core 1
+            if ACTION_SOCKET in supervisor.actions:
+                supervisor.actions[ACTION_SOCKET] = poller.request_socket_reset
+            if ACTION_WIFI in supervisor.actions:
+                supervisor.actions[ACTION_WIFI] = poller.request_wifi_reset
+        poller.start()
+        print("Dual-core mode: network polling on core 1, output on core 0")
+        last_seq = 0
+
+    scheduler.start()
+    if supervisor:
+        supervisor.start()
+    loop_cycle = 0
+    data = None
+    last_poll = time.ticks_ms()
 
     while True:
         try:
-            # Check WiFi connection (skip in demo mode)
-            if not demo_mode:
-                if not wifi.is_connected():
-                    print("WiFi disconnected! Reconnecting...")
-                    if not wifi.connect(timeout=config.WIFI_TIMEOUT):
-                        print("Failed to reconnect. Retrying in 10s...")
-                        time.sleep(10)
-                        continue
-                    # Reconnect to Modbus after WiFi reconnection
-                    if not victron.connect():
-                        print("Failed to reconnect to Cerbo GX. Retrying in 10s...")
-                        time.sleep(10)
-                        continue
-
-            # Read all Victron data
-            data = victron.read_all_data()
-
-            # Display results
-            mode_indicator = "[DEMO] " if demo_mode else ""
-            print(f"\n{mode_indicator}[{time.localtime()[3]:02d}:{time.localtime()[4]:02d}:{time.localtime()[5]:02d}] Victron Data:")
-            if data['battery_voltage'] is not None:
-                print(f"  Battery Voltage: {data['battery_voltage']:.1f} V")
-            if data['battery_current'] is not None:
-                current = data['battery_current']
-                direction = "Charging" if current > 0 else "Discharging"
-                print(f"  Battery Current: {abs(current):.1f} A ({direction})")
-            if data['battery_temperature'] is not None:
-                print(f"  Battery Temp:    {data['battery_temperature']:.1f} °C")
-            if data['battery_soc'] is not None:
-                print(f"  Battery SOC:     {data['battery_soc']}%")
-            if data['charging_state'] is not None:
-                state_text = "Charging" if data['charging_state'] == 1 else "Not Charging"
-                print(f"  Charging State:  {state_text}")
-
-            # Send one UART message per cycle (cycling through 5 messages)
-            if uart_mgr:
-                if uart_message_cycle == 0:
-                    # Message 1: Battery SOC
-                    if data['battery_soc'] is not None:
-                        if not uart_mgr.send_battery_soc(data['battery_soc']):
-                            print("  WARNING: Failed to send SOC via UART")
-
-                elif uart_message_cycle == 1:
-                    # Message 2: Battery system data
-                    if (data['battery_voltage'] is not None and
-                        data['battery_current'] is not None and
-                        data['battery_temperature'] is not None):
-                        if not uart_mgr.send_battery_system(
-                            data['battery_voltage'],
-                            data['battery_current'],
-                            data['battery_temperature']
-                        ):
-                            print("  WARNING: Failed to send BATSYS via UART")
-
-                elif uart_message_cycle == 2:
-                    # Message 3: Charging state
-                    if data['charging_state'] is not None:
-                        if not uart_mgr.send_charging_state(data['charging_state']):
-                            print("  WARNING: Failed to send CHARGING via UART")
-
-                elif uart_message_cycle == 3:
-                    # Message 4: WiFi status
-                    if demo_mode:
-                        wifi_status = 2  # Skipped (demo mode)
-                    elif wifi and wifi.is_connected():
-                        wifi_status = 1  # Connected
+            log.begin_cycle()
+            if supervisor:
+                supervisor.begin('loop')  # Heartbeat
+            fresh = False  # New snapshot this slot
+            if poller:
+                # Core 0: take the latest snapshot without waiting on the network
+                seq, data, wifi_connected, age_ms = mailbox.latest()
+                if data is None:
+                    scheduler.wait()  # No snapshot yet
+                    continue
+                wifi_status = wifi_status_code(wifi_connected)
+                if seq != last_seq:
+                    last_seq = seq
+                    fresh = True
+                    log_data(log, data, mode_indicator, snapshots % config.LOG_TABLE_EVERY == 0)
+                    snapshots += 1
+                    if server:
+                        # Core 1 serves them; it must not read core 0's objects itself
+                        mailbox.publish_stats(collect_stats())
+                elif age_ms > config.DUAL_CORE_POLL_MS * 3:
+                    log.warning("No new data from core 1 for %ds", age_ms // 1000)
+
+            elif data is None or loop_cycle % poll_every == 0:
+                # Check WiFi connection (skip in demo and replay mode)
+                if not offline:
+                    if not wifi.is_connected():
+                        log.warning("WiFi disconnected! Reconnecting...")
+                        if supervisor:
+                            supervisor.begin('wifi')
+                        connected = wifi.connect(timeout=config.WIFI_TIMEOUT)
+                        if supervisor:
+                            supervisor.end('wifi')
+                        if not connected:
+                            log.error("Failed to reconnect. Retrying in 10s...")
+                            time.sleep(10)
+                            continue
+                        # Reconnect to Modbus after WiFi reconnection
+                        if supervisor:
+                            supervisor.begin('modbus')
+                        connected = victron.connect()
+                        if supervisor:
+                            supervisor.end('modbus')
+                        if not connected:
+                            log.error("Failed to reconnect to Cerbo GX. Retrying in 10s...")
+                            time.sleep(10)
+                            continue
+
+                # Read all Victron data
+                if supervisor:
+                    supervisor.begin('modbus')
+                data = victron.read_all_data()
+                if supervisor:
+                    supervisor.end('modbus')
+                last_poll = time.ticks_ms()
+                fresh = True
+                if metrics:
+                    metrics.update(data, victron.sample_ms())
+                if history:
+                    history.add(data)
+                if server:
+                    server.update(data, collect_stats, history)
+
+                # Display results
+                log_data(log, data, mode_indicator, snapshots % config.LOG_TABLE_EVERY == 0)
+                snapshots += 1
+
+            if not poller:
+                wifi_status = wifi_status_code(wifi.is_connected() if wifi else None)
+                age_ms = time.ticks_diff(time.ticks_ms(), last_poll)
+
+            if sample_log and fresh:
+                sample_log.add(data)
+
+            # Stream a running USB export for one time slice
+            if exporter:
+                exporter.poll()
+
+            # Fan the new snapshot out to the extra outputs
+            if fanout:
+                if fresh:
+                    fanout.publish(data, wifi_status, demo_mode)
+                else:
+                    fanout.poll()
+
+            # Answer HTTP clients (core 1 does this in dual-core mode)
+            if server and not poller:
+                server.poll()
+
+            # Alarm state changes go out immediately, ahead of the slot message
+            if alarms:
+                for name, active in alarms.evaluate(data, age_ms):
+                    if active:
+                        log.warning("ALARM %s raised", name)
                     else:
-                        wifi_status = 0  # Disconnected
+                        log.info("ALARM %s cleared", name)
+                    if uart_mgr and not uart_mgr.send_alarm(name, active):
+                        log.warning("Failed to send ALARM via UART")
 
-                    if not uart_mgr.send_wifi_status(wifi_status):
-                        print("  WARNING: Failed to send WIFI status via UART")
+            # Send one UART message per cycle (cycling through uart_slots)
+            if supervisor:
+                supervisor.begin('uart')
+            if uart_mgr:
+                uart_mgr.poll()  # Finish anything still queued from the last slot
+            slots = uart_slots
+            if feedback:
+                period = feedback.poll()
+                if period:
+                    scheduler.set_period(period)
+                    poll_every = max(1, config.POLL_INTERVAL * 1000 // period)
+                    log.info("UART: display feedback, %d ms per message%s", period,
+                             " (reduced set)" if feedback.reduced else "")
+                if feedback.reduced:
+                    slots = reduced_slots
+            if uart_mgr and power:
+                # Low-power: the whole message set in one burst, drained before sleeping
+                for slot in uart_slots:
+                    send_uart_message(log, uart_mgr, slot, data, wifi_status, demo_mode)
+                uart_mgr.flush()
+                if fanout:
+                    fanout.flush()
+            elif uart_mgr:
+                uart_message_cycle %= len(slots)  # The message set may have changed
+                send_uart_message(log, uart_mgr, slots[uart_message_cycle], data, wifi_status, demo_mode)
 
-                elif uart_message_cycle == 4:
-                    # Message 5: Demo mode status
-                    if not uart_mgr.send_demo_mode(demo_mode):
-                        print("  WARNING: Failed to send DEMO mode via UART")
+                # Increment cycle counter (wrap at the end of the message cycle)
+                uart_message_cycle = (uart_message_cycle + 1) % len(slots)
+            if supervisor:
+                supervisor.end('uart')
 
-                # Increment cycle counter (wrap at 5)
-                uart_message_cycle = (uart_message_cycle + 1) % 5
+            loop_cycle += 1
+            if config.SCHEDULER_STATS_EVERY and loop_cycle % config.SCHEDULER_STATS_EVERY == 0:
+                stats = scheduler.get_stats()
+                log.info("Loop timing: jitter last %d ms, max %d ms, mean %.1f ms, %d overruns, %d skipped",
+                         stats['jitter_last_ms'], stats['jitter_max_ms'], stats['jitter_mean_ms'],
+                         stats['overruns'], stats['skipped'])
+                if feedback:
+                    stats = feedback.get_stats()
+                    log.info("Display: %d ms per message, %d acked, %d lost, %d late, rtt max %d ms, render max %d ms",
+                             stats['period_ms'], stats['acked'], stats['lost'], stats['late'],
+                             stats['rtt_max_ms'], stats['render_max_ms'])
+                if fanout:
+                    stats = fanout.get_stats()
+                    log.info("Outputs: %d snapshots, %d text + %d binary encodes, %d us encoding",
+                             stats['snapshots'], stats['encodes']['text'], stats['encodes']['binary'],
+                             stats['encode_us'])
+                if power:
+                    stats = power.get_stats()
+                    log.info("Power: active %d ms / idle %d ms last cycle, duty cycle %.2f%%",
+                             stats['last_active_ms'], stats['last_idle_ms'], stats['duty_cycle'] * 100)
 
-            time.sleep(1)  # 1 second between messages
+            scheduler.wait()  # Sleep until the next message slot
 
         except KeyboardInterrupt:
             print("\n\nShutting down...")
+            if supervisor:
+                supervisor.stop()
+            if poller and not poller.stop():
+                print("WARNING: Core 1 poller did not stop in time")
             victron.close()
+            if sample_log:
+                sample_log.flush()
+            if server:
+                server.close()
+            if fanout:
+                fanout.close()
             if uart_mgr:
                 uart_mgr.close()
             if wifi:
                 wifi.disconnect()
             break
         except Exception as e:
-            print(f"Error: {e}")
-            import sys
+            log.error("%s", e)
             sys.print_exception(e)
+            if supervisor:
+                supervisor.end_all()
             time.sleep(5)
 
 if __name__ == "__main__":
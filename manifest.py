@@ -0,0 +1,42 @@
+# Firmware manifest for the Pico W application modules
+#
+# Source of truth for which modules go on the device: deploy.sh copies (or
+# cross-compiles) exactly these, and check_manifest.py verifies that every
+# local module imported from main.py is listed here.
+#
+# To freeze the modules into a firmware image (no compile at boot, bytecode
+# runs from flash instead of RAM):
+#   make -C micropython/ports/rp2 BOARD=RPI_PICO_W FROZEN_MANIFEST=$(pwd)/manifest.py
+# and then deploy only boot.py, main.py and config.py (./deploy.sh --frozen).
+#
+# micropython-modbus (umodbus) is installed separately with mip; to freeze it
+# too, add: package("umodbus", base_path="<path to micropython-modbus>")
+
+include("$(BOARD_DIR)/manifest.py")
+
+# Listed dependencies first, so import_benchmark.py measures each module on its own
+module("config.py")
+module("modbus_frames.py")
+module("circuit_breaker.py")
+module("victron_trace.py")
+module("victron_client.py")
+module("replay_victron_client.py")
+module("demo_victron_client.py")
+module("wifi_manager.py")
+module("display_protocol.py")
+module("uart_manager.py")
+module("uart_feedback.py")
+module("output_fanout.py")
+module("scheduler.py")
+module("console_logger.py")
+module("derived_metrics.py")
+module("alarms.py")
+module("history.py")
+module("sample_log.py")
+module("history_export.py")
+module("http_status.py")
+module("device_discovery.py")
+module("power_manager.py")
+module("dual_core.py")
+module("supervisor.py")
+module("main.py")
@@ -0,0 +1,139 @@
+"""
+Modbus TCP frame encoding and decoding
+Plain struct-based helpers shared by the asyncio gateway, the local
+simulator and on-device probing; works on MicroPython and CPython
+"""
+
+import struct
+
+FC_READ_HOLDING = 3
+FC_READ_INPUT = 4
+
+# Exception codes
+EXC_ILLEGAL_FUNCTION = 0x01
+EXC_ILLEGAL_ADDRESS = 0x02
+EXC_GATEWAY_TARGET_FAILED = 0x0B
+
+# MBAP header: transaction ID, protocol ID (0), length, unit ID
+MBAP_FORMAT = ">HHHB"
+MBAP_SIZE = 7
+
+MAX_READ_COUNT = 125
+
+
+class ModbusError(Exception):
+    """Modbus exception response from the device"""
+
+    def __init__(self, function_code, exception_code):
+        super().__init__(f"Modbus exception {exception_code} for function {function_code}")
+        self.function_code = function_code
+        self.exception_code = exception_code
+
+
+def build_read_request(transaction_id, unit_id, function_code, start, count):
+    """
+    Build a read holding/input registers request ADU
+
+    Args:
+        transaction_id: Transaction ID echoed by the device (0-65535)
+        unit_id: Modbus unit ID
+        function_code: FC_READ_HOLDING or FC_READ_INPUT
+        start: Starting register address
+        count: Number of registers (1-125)
+
+    Returns:
+        Request bytes
+    """
+    return struct.pack(">HHHBBHH", transaction_id & 0xFFFF, 0, 6, unit_id, function_code, start, count)
+
+
+def parse_mbap(header):
+    """
+    Parse an MBAP header
+
+    Args:
+        header: First MBAP_SIZE bytes of an ADU
+
+    Returns:
+        Tuple of (transaction_id, pdu_length, unit_id)
+
+    Raises:
+        ValueError: If the protocol ID or length is invalid
+    """
+    transaction_id, protocol_id, length, unit_id = struct.unpack(MBAP_FORMAT, header)
+    if protocol_id != 0 or length < 2 or length > 254:
+        raise ValueError(f"invalid MBAP header (protocol {protocol_id}, length {length})")
+    return transaction_id, length - 1, unit_id
+
+
+def parse_read_response(pdu, function_code, count):
+    """
+    Decode the PDU of a read registers response
+
+    Args:
+        pdu: Response PDU (function code onwards)
+        function_code: Function code of the request
+        count: Number of registers requested
+
+    Returns:
+        Tuple of raw unsigned register values
+
+    Raises:
+        ModbusError: If the device returned an exception response
+        ValueError: If the response does not match the request
+    """
+    response_code = pdu[0]
+    if response_code == function_code | 0x80:
+        raise ModbusError(function_code, pdu[1] if len(pdu) > 1 else 0)
+    if response_code != function_code:
+        raise ValueError(f"function code {response_code} in response to {function_code}")
+    byte_count = pdu[1]
+    if byte_count != count * 2 or len(pdu) < 2 + byte_count:
+        raise ValueError(f"{byte_count} data bytes for {count} registers")
+    return struct.unpack(f">{count}H", pdu[2:2 + byte_count])
+
+
+def parse_read_request(pdu):
+    """
+    Decode the PDU of a read registers request (server side)
+
+    Args:
+        pdu: Request PDU (function code onwards)
+
+    Returns:
+        Tuple of (function_code, start, count)
+
+    Raises:
+        ValueError: If the PDU is too short
+    """
+    if len(pdu) < 5:
+        raise ValueError("short read request")
+    return struct.unpack(">BHH", pdu[:5])
+
+
+def build_read_response(transaction_id, unit_id, function_code, values):
+    """
+    Build a read registers response ADU (server side)
+
+    Args:
+        transaction_id: Transaction ID of the request
+        unit_id: Modbus unit ID
+        function_code: Function code of the request
+        values: Raw register values (0-65535)
+
+    Returns:
+        Response bytes
+    """
+    count = len(values)
+    return (struct.pack(">HHHBBB", transaction_id, 0, 3 + count * 2, unit_id, function_code, count * 2)
+            + struct.pack(f">{count}H", *values))
+
+
+def build_exception_response(transaction_id, unit_id, function_code, exception_code):
+    """
+    Build an exception response ADU (server side)
+
+    Returns:
+        Response bytes
+    """
+    return struct.pack(">HHHBBB", transaction_id, 0, 3, unit_id, function_code | 0x80, exception_code)
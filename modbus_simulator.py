@@ -0,0 +1,268 @@
+"""
+Local Victron Modbus TCP simulator (Linux host)
+Serves Victron-style registers on one or many TCP ports, one simulated
+Cerbo GX per port, for gateway load tests and host-mode runs
+
+Examples:
+    python modbus_simulator.py --endpoints 1 --base-port 5020
+    python modbus_simulator.py --endpoints 300 --latency-ms 5 --dead 10
+    python modbus_simulator.py --endpoints 20 --late 3 --late-ms 5000
+    python modbus_simulator.py --endpoints 1000 --fleet --noise 0.02 --fault-rate 0.001
+"""
+
+import asyncio
+import os
+import sys
+
+from modbus_frames import (
+    MBAP_SIZE, FC_READ_HOLDING, FC_READ_INPUT, MAX_READ_COUNT,
+    EXC_ILLEGAL_FUNCTION, EXC_ILLEGAL_ADDRESS, EXC_GATEWAY_TARGET_FAILED,
+    parse_mbap, parse_read_request, build_read_response, build_exception_response,
+)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def encode_value(value, scale, signed):
+    """Inverse of VictronClient.decode_fields for one value"""
+    raw = int(round(value / scale))
+    if signed and raw < 0:
+        raw += 65536
+    return max(0, min(65535, raw))
+
+
+class DemoRegisterSource:
+    """
+    Register source driven by the DemoVictronClient waveforms
+
+    Each endpoint is one simulated site with its own phase offset.
+    Requires time.ticks_* (MicroPython or host_runtime.install()).
+    """
+
+    def __init__(self, endpoints, extended=True):
+        """
+        Args:
+            endpoints: Number of simulated sites
+            extended: Also serve the solar charger and inverter units
+        """
+        import time
+        from demo_victron_client import DemoVictronClient
+        from victron_client import VictronClient
+
+        self.victron = VictronClient
+        self.extended = extended
+        self.clients = []
+        now = time.ticks_ms()
+        for endpoint in range(endpoints):
+            client = DemoVictronClient()
+            client.start_time = time.ticks_add(now, -endpoint * 7919)  # Spread phases
+            client.connected = True
+            self.clients.append(client)
+
+    def _unit_registers(self, endpoint, unit_id):
+        """Current raw register image of one unit, or None if it does not exist"""
+        client = self.clients[endpoint]
+        victron = self.victron
+
+        if unit_id == victron.UNIT_ID_SYSTEM:
+            data = {
+                'battery_voltage': client.read_battery_voltage(),
+                'battery_current': client.read_battery_current(),
+                'battery_soc': client.read_battery_soc(),
+            }
+            registers = self._encode(data, victron.BATTERY_FIELDS)
+            kelvin = client.read_battery_temperature() + 273.15
+            registers[victron.TEMPERATURE_REGISTER] = int(round(kelvin / 0.01))
+            return registers
+        if not self.extended:
+            return None
+        if unit_id == victron.UNIT_ID_SOLAR:
+            return self._encode(client.read_solar_data(), victron.SOLAR_FIELDS)
+        if unit_id == victron.UNIT_ID_INVERTER:
+            return self._encode(client.read_inverter_data(), victron.INVERTER_FIELDS)
+        return None
+
+    @staticmethod
+    def _encode(data, fields):
+        return {register: encode_value(data[name], scale, signed) for name, register, scale, signed in fields}
+
+    def read(self, endpoint, unit_id, start, count):
+        """
+        Read raw registers of a simulated site
+
+        Args:
+            endpoint: Site index
+            unit_id: Modbus unit ID
+            start: Starting register address
+            count: Number of registers
+
+        Returns:
+            List of raw values (unmapped registers read as 0), an empty
+            list if no register in the range is mapped, or None if the unit
+            does not exist
+        """
+        registers = self._unit_registers(endpoint, unit_id)
+        if registers is None:
+            return None
+        values = [registers.get(register) for register in range(start, start + count)]
+        if all(value is None for value in values):
+            return []  # Nothing mapped in range, like the Cerbo GX (illegal address)
+        return [0 if value is None else value for value in values]
+
+
+class ModbusSimulator:
+    """asyncio Modbus TCP server exposing a register source on consecutive ports"""
+
+    def __init__(self, source, endpoints, host="127.0.0.1", base_port=5020, latency_ms=0, dead=0,
+                 late=0, late_ms=0, late_units=None):
+        """
+        Args:
+            source: Object with read(endpoint, unit_id, start, count)
+            endpoints: Number of ports (sites) to serve
+            host: Listen address
+            base_port: Port of endpoint 0; endpoint i listens on base_port + i
+            latency_ms: Artificial delay before each response
+            dead: Number of trailing endpoints that accept but never answer
+            late: Number of endpoints before the dead ones that answer after late_ms
+            late_ms: Response delay of the late endpoints (e.g. beyond a client deadline)
+            late_units: Unit IDs answered late on those endpoints (None = all)
+        """
+        self.source = source
+        self.endpoints = endpoints
+        self.host = host
+        self.base_port = base_port
+        self.latency = latency_ms / 1000
+        self.dead_from = endpoints - dead
+        self.late_from = self.dead_from - late
+        self.late_delay = late_ms / 1000
+        self.late_units = late_units
+        self.servers = []
+        self.handlers = set()
+        self.request_count = 0
+
+    async def start(self):
+        """Start listening on all endpoints"""
+        for endpoint in range(self.endpoints):
+            server = await asyncio.start_server(
+                lambda r, w, e=endpoint: self._serve(r, w, e),
+                self.host, self.base_port + endpoint)
+            self.servers.append(server)
+        print(f"Simulator: {self.endpoints} endpoints on {self.host}:{self.base_port}-{self.base_port + self.endpoints - 1}")
+
+    async def _serve(self, reader, writer, endpoint):
+        """Answer requests on one client connection until it closes"""
+        handler = (asyncio.current_task(), writer)
+        self.handlers.add(handler)
+        try:
+            while True:
+                header = await reader.readexactly(MBAP_SIZE)
+                transaction_id, pdu_length, unit_id = parse_mbap(header)
+                pdu = await reader.readexactly(pdu_length)
+                self.request_count += 1
+
+                if endpoint >= self.dead_from:
+                    continue  # Simulate a hung device
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if endpoint >= self.late_from and (self.late_units is None or unit_id in self.late_units):
+                    await asyncio.sleep(self.late_delay)  # Answers after the client gave up
+
+                writer.write(self._respond(endpoint, transaction_id, unit_id, pdu))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.handlers.discard(handler)
+            writer.close()
+
+    def _respond(self, endpoint, transaction_id, unit_id, pdu):
+        """Build the response ADU for one request PDU"""
+        function_code = pdu[0]
+        if function_code not in (FC_READ_HOLDING, FC_READ_INPUT):
+            return build_exception_response(transaction_id, unit_id, function_code, EXC_ILLEGAL_FUNCTION)
+
+        function_code, start, count = parse_read_request(pdu)
+        if not 1 <= count <= MAX_READ_COUNT:
+            return build_exception_response(transaction_id, unit_id, function_code, EXC_ILLEGAL_ADDRESS)
+
+        values = self.source.read(endpoint, unit_id, start, count)
+        if values is None:
+            return build_exception_response(transaction_id, unit_id, function_code, EXC_GATEWAY_TARGET_FAILED)
+        if not values:
+            return build_exception_response(transaction_id, unit_id, function_code, EXC_ILLEGAL_ADDRESS)
+        return build_read_response(transaction_id, unit_id, function_code, values)
+
+    async def close(self):
+        """Stop all endpoints"""
+        for server in self.servers:
+            server.close()
+        # Closing the transports ends each handler's read with EOF
+        handlers = list(self.handlers)
+        for _, writer in handlers:
+            writer.close()
+        await asyncio.gather(*[task for task, _ in handlers], return_exceptions=True)
+        for server in self.servers:
+            await server.wait_closed()
+        self.servers = []
+
+
+def raise_fd_limit():
+    """Raise the open file limit to the hard limit (hundreds of sockets per side)"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def install_host_runtime():
+    """Make time.ticks_* available for the demo waveforms under CPython"""
+    sys.path.insert(0, os.path.join(ROOT, "host"))
+    import host_runtime
+    host_runtime.install()
+
+
+async def _main(args):
+    if args.fleet:
+        from fleet_generator import source_from_args
+        source = source_from_args(args, args.endpoints, extended=not args.no_extended)
+    else:
+        source = DemoRegisterSource(args.endpoints, extended=not args.no_extended)
+    simulator = ModbusSimulator(source, args.endpoints, args.host, args.base_port, args.latency_ms, args.dead,
+                                args.late, args.late_ms)
+    await simulator.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Victron Modbus TCP simulator")
+    parser.add_argument("--endpoints", type=int, default=1, help="Number of simulated sites (ports)")
+    parser.add_argument("--host", default="127.0.0.1", help="Listen address")
+    parser.add_argument("--base-port", type=int, default=5020, help="Port of the first site")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay before each response")
+    parser.add_argument("--dead", type=int, default=0, help="Trailing sites that never answer")
+    parser.add_argument("--late", type=int, default=0, help="Sites before the dead ones that answer late")
+    parser.add_argument("--late-ms", type=float, default=5000, help="Response delay of the late sites")
+    parser.add_argument("--no-extended", action="store_true", help="Only serve the system unit")
+    from fleet_generator import add_arguments, require_numpy
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.fleet:
+        try:
+            require_numpy()
+        except ImportError as e:
+            parser.error(str(e))
+
+    install_host_runtime()
+    raise_fd_limit()
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,437 @@
+"""
+Snapshot fan-out to several outputs
+Encodes each read_all_data() snapshot at most once per protocol and hands
+the same bytes to every sink that uses it: UART0/UART1, USB serial or (in
+host mode) a file. Sinks have their own protocol, rate limit and counters;
+a sink still busy with the previous frame skips the snapshot instead of
+blocking the loop.
+
+Protocols:
+    text    The display line protocol (BATTERY:75\\n BATSYS:... etc.), all
+            messages of the snapshot in one burst
+    binary  A fixed FRAME_SIZE-byte frame, little endian:
+            'VB', version, payload length, seq (u16) |
+            soc 0.1 % (u16), voltage 0.01 V (u16), current 0.1 A (i16),
+            temperature 0.1 C (i16), charging (u8), status (u8: bits 0-1
+            WiFi code, bit 2 demo, bit 3 stale fields), pv power W (u16),
+            ac load W (u16), battery power W (i32) | CRC32 of everything before
+            Missing values are 0xFFFF (unsigned) or -0x8000 (signed)
+"""
+
+import struct
+import sys
+import time
+import binascii
+import config
+from display_protocol import format_snapshot
+
+PROTOCOL_TEXT = 'text'
+PROTOCOL_BINARY = 'binary'
+
+FRAME_MAGIC = b'VB'
+FRAME_VERSION = 1
+_HEADER = '<2sBBH'
+_PAYLOAD = '<HHhhBBHHi'
+_HEADER_SIZE = struct.calcsize(_HEADER)
+_PAYLOAD_SIZE = struct.calcsize(_PAYLOAD)
+FRAME_SIZE = _HEADER_SIZE + _PAYLOAD_SIZE + 4
+
+_MISSING_U16 = 0xFFFF
+_MISSING_I16 = -0x8000
+
+
+def _u16(value, scale=1):
+    if value is None:
+        return _MISSING_U16
+    return max(0, min(0xFFFE, int(round(value * scale))))
+
+
+def _i16(value, scale=1):
+    if value is None:
+        return _MISSING_I16
+    return max(-0x7FFF, min(0x7FFF, int(round(value * scale))))
+
+
+def encode_text(data, wifi_status, demo_mode):
+    """
+    Encode a snapshot as display protocol lines (display_protocol, as UARTManager sends them)
+
+    Returns:
+        bytes with one line per available message
+    """
+    return ''.join(format_snapshot(data, wifi_status, demo_mode)).encode('utf-8')
+
+
+class BinaryEncoder:
+    """Packs snapshots into one preallocated binary frame"""
+
+    def __init__(self):
+        self._frame = bytearray(FRAME_SIZE)
+        self._view = memoryview(self._frame)
+        self.seq = 0
+
+    def encode(self, data, wifi_status, demo_mode):
+        """
+        Pack a snapshot into the frame buffer
+
+        Returns:
+            memoryview of the frame, valid until the next encode()
+        """
+        status = int(wifi_status) & 0x03
+        if demo_mode:
+            status |= 0x04
+        if data.get('stale_fields'):
+            status |= 0x08
+        charging = data['charging_state']
+        power = data.get('battery_power')
+        struct.pack_into(_HEADER, self._frame, 0, FRAME_MAGIC, FRAME_VERSION, _PAYLOAD_SIZE, self.seq)
+        struct.pack_into(
+            _PAYLOAD, self._frame, _HEADER_SIZE,
+            _u16(data['battery_soc'], 10),
+            _u16(data['battery_voltage'], 100),
+            _i16(data['battery_current'], 10),
+            _i16(data['battery_temperature'], 10),
+            0xFF if charging is None else (1 if charging else 0),
+            status,
+            _u16(data.get('pv_power')),
+            _u16(data.get('ac_load')),
+            -0x80000000 if power is None else int(power),
+        )
+        crc_at = FRAME_SIZE - 4
+        struct.pack_into('<I', self._frame, crc_at, binascii.crc32(self._view[:crc_at]) & 0xFFFFFFFF)
+        self.seq = (self.seq + 1) & 0xFFFF
+        return self._view
+
+
+def decode_binary(frame):
+    """
+    Unpack a binary frame (host side, for receivers and tests)
+
+    Returns:
+        Dictionary of field values (None where missing)
+
+    Raises:
+        ValueError: On a bad magic, version, length or CRC
+    """
+    if len(frame) != FRAME_SIZE:
+        raise ValueError(f"frame is {len(frame)} bytes, expected {FRAME_SIZE}")
+    magic, version, length, seq = struct.unpack_from(_HEADER, frame, 0)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION or length != _PAYLOAD_SIZE:
+        raise ValueError("not a version 1 frame")
+    crc_at = FRAME_SIZE - 4
+    if struct.unpack_from('<I', frame, crc_at)[0] != binascii.crc32(bytes(frame[:crc_at])) & 0xFFFFFFFF:
+        raise ValueError("CRC mismatch")
+    soc, voltage, current, temp, charging, status, pv, load, power = struct.unpack_from(
+        _PAYLOAD, frame, _HEADER_SIZE)
+    return {
+        'seq': seq,
+        'battery_soc': None if soc == _MISSING_U16 else soc / 10,
+        'battery_voltage': None if voltage == _MISSING_U16 else voltage / 100,
+        'battery_current': None if current == _MISSING_I16 else current / 10,
+        'battery_temperature': None if temp == _MISSING_I16 else temp / 10,
+        'charging_state': None if charging == 0xFF else charging,
+        'wifi_status': status & 0x03,
+        'demo_mode': bool(status & 0x04),
+        'stale': bool(status & 0x08),
+        'pv_power': None if pv == _MISSING_U16 else pv,
+        'ac_load': None if load == _MISSING_U16 else load,
+        'battery_power': None if power == -0x80000000 else power,
+    }
+
+
+class Sink:
+    """One output: a writer plus protocol, rate limit and counters"""
+
+    def __init__(self, name, protocol=PROTOCOL_TEXT, min_interval_ms=0):
+        """
+        Args:
+            name: Label for statistics (e.g. "uart1")
+            protocol: PROTOCOL_TEXT or PROTOCOL_BINARY
+            min_interval_ms: Minimum time between frames (0 = every snapshot)
+
+        Raises:
+            ValueError: On an unknown protocol
+        """
+        if protocol not in (PROTOCOL_TEXT, PROTOCOL_BINARY):
+            raise ValueError(f"unknown output protocol: {protocol}")
+        self.name = name
+        self.protocol = protocol
+        self.min_interval_ms = min_interval_ms
+        self._last_frame_ms = None
+        self._pending = None  # Unwritten tail of the last frame
+
+        self.frames = 0
+        self.bytes = 0
+        self.rate_limited = 0
+        self.busy = 0
+        self.short_writes = 0
+        self.errors = 0
+
+    def _write(self, buf):
+        """Write what fits without blocking; returns the byte count"""
+        raise NotImplementedError
+
+    def due(self, now):
+        """True if the rate limit allows a frame at now"""
+        if self._last_frame_ms is None or not self.min_interval_ms:
+            return True
+        if time.ticks_diff(now, self._last_frame_ms) >= self.min_interval_ms:
+            return True
+        self.rate_limited += 1
+        return False
+
+    def drain(self):
+        """
+        Continue writing the previous frame
+
+        Returns:
+            True when nothing is left to write
+        """
+        pending = self._pending
+        if pending is None:
+            return True
+        try:
+            written = self._write(pending) or 0
+        except Exception as e:
+            print(f"Output {self.name}: write error: {e}")
+            self.errors += 1
+            self._pending = None
+            return True
+        self.bytes += written
+        if written < len(pending):
+            self._pending = pending[written:]
+            return False
+        self._pending = None
+        return True
+
+    def send(self, frame, now):
+        """
+        Start writing a frame (bytes or memoryview)
+
+        Returns:
+            True if the frame was accepted, False if the sink was still busy
+        """
+        if not self.drain():
+            self.busy += 1
+            return False
+        self._last_frame_ms = now
+        self.frames += 1
+        try:
+            written = self._write(frame) or 0
+        except Exception as e:
+            print(f"Output {self.name}: write error: {e}")
+            self.errors += 1
+            return True
+        self.bytes += written
+        if written < len(frame):
+            # Keep our own copy: the encoder reuses its buffer
+            self._pending = bytes(frame[written:])
+            self.short_writes += 1
+        return True
+
+    def flush(self):
+        """Push out anything buffered (before sleeping or closing)"""
+
+    def close(self):
+        """Release the underlying device or file"""
+
+    def get_stats(self):
+        """
+        Get sink statistics
+
+        Returns:
+            Dictionary with frames, bytes, rate-limited and busy snapshots,
+            short writes and errors
+        """
+        return {
+            'protocol': self.protocol,
+            'frames': self.frames,
+            'bytes': self.bytes,
+            'rate_limited': self.rate_limited,
+            'busy': self.busy,
+            'short_writes': self.short_writes,
+            'errors': self.errors,
+        }
+
+
+class UartSink(Sink):
+    """Sink on a UART peripheral (TX only)"""
+
+    def __init__(self, uart_id, baudrate=115200, tx_pin=None, rx_pin=None, txbuf=512, **kwargs):
+        """
+        Args:
+            uart_id: UART peripheral ID (0 or 1)
+            baudrate: Communication speed
+            tx_pin: GPIO pin for TX (default: the board default for uart_id)
+            rx_pin: GPIO pin for RX
+            txbuf: Driver TX ring buffer; at least one frame so writes never wait
+            **kwargs: Sink options (protocol, min_interval_ms)
+        """
+        from machine import UART, Pin
+        super().__init__(kwargs.pop('name', f"uart{uart_id}"), **kwargs)
+        pins = {}
+        if tx_pin is not None:
+            pins['tx'] = Pin(tx_pin)
+        if rx_pin is not None:
+            pins['rx'] = Pin(rx_pin)
+        self.uart = UART(uart_id, baudrate=baudrate, bits=8, parity=None, stop=1,
+                         txbuf=txbuf, **pins)
+
+    def _write(self, buf):
+        return self.uart.write(buf)
+
+    def flush(self):
+        start = time.ticks_ms()
+        while self._pending is not None and time.ticks_diff(time.ticks_ms(), start) < 100:
+            self.drain()
+        while not self.uart.txdone() and time.ticks_diff(time.ticks_ms(), start) < 100:
+            time.sleep_ms(1)
+
+    def close(self):
+        self.uart.deinit()
+
+
+class StreamSink(Sink):
+    """Sink on a byte stream, e.g. USB serial (sys.stdout.buffer) or a file"""
+
+    def __init__(self, stream, name="usb", owns_stream=False, **kwargs):
+        """
+        Args:
+            stream: Object with write() (and optionally flush()) taking bytes
+            name: Label for statistics
+            owns_stream: Close the stream in close()
+            **kwargs: Sink options (protocol, min_interval_ms)
+        """
+        super().__init__(name, **kwargs)
+        self.stream = stream
+        self.owns_stream = owns_stream
+
+    def _write(self, buf):
+        written = self.stream.write(buf)
+        return len(buf) if written is None else written
+
+    def flush(self):
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+    def close(self):
+        self.flush()
+        if self.owns_stream:
+            self.stream.close()
+
+
+def make_sink(spec):
+    """
+    Create a sink from one config.OUTPUT_SINKS entry
+
+    Args:
+        spec: Dictionary with 'type' ("uart", "usb" or "file"), the type's
+              settings ('id', 'baudrate', 'tx', 'rx' / 'path') and optional
+              'protocol' and 'min_interval_ms'
+
+    Returns:
+        Sink instance
+
+    Raises:
+        ValueError: On an unknown sink type
+    """
+    options = {
+        'protocol': spec.get('protocol', PROTOCOL_TEXT),
+        'min_interval_ms': spec.get('min_interval_ms', 0),
+    }
+    kind = spec['type']
+    if kind == 'uart':
+        return UartSink(spec['id'], spec.get('baudrate', config.UART_BAUDRATE),
+                        spec.get('tx'), spec.get('rx'), **options)
+    if kind == 'usb':
+        return StreamSink(getattr(sys.stdout, 'buffer', sys.stdout), name="usb", **options)
+    if kind == 'file':
+        return StreamSink(open(spec['path'], 'ab'), name=spec['path'], owns_stream=True, **options)
+    raise ValueError(f"unknown output sink type: {kind}")
+
+
+class OutputFanout:
+    """Encodes each snapshot once per protocol and writes it to every sink"""
+
+    def __init__(self, sinks):
+        """
+        Args:
+            sinks: List of Sink instances
+        """
+        self.sinks = sinks
+        self._binary = BinaryEncoder()
+        self.snapshots = 0
+        self.encodes = {PROTOCOL_TEXT: 0, PROTOCOL_BINARY: 0}
+        self.encode_us = 0
+
+    def publish(self, data, wifi_status, demo_mode):
+        """
+        Offer a new snapshot to every sink whose rate limit allows it
+
+        Args:
+            data: Data dictionary from read_all_data()
+            wifi_status: UART WIFI status code
+            demo_mode: True if demo mode is active
+
+        Returns:
+            Number of sinks that took the frame
+        """
+        now = time.ticks_ms()
+        self.snapshots += 1
+        text = None
+        binary = None
+        sent = 0
+        for sink in self.sinks:
+            if not sink.due(now):
+                continue
+            if sink.protocol == PROTOCOL_TEXT:
+                if text is None:
+                    t0 = time.ticks_us()
+                    text = encode_text(data, wifi_status, demo_mode)
+                    self.encode_us += time.ticks_diff(time.ticks_us(), t0)
+                    self.encodes[PROTOCOL_TEXT] += 1
+                frame = text
+            else:
+                if binary is None:
+                    t0 = time.ticks_us()
+                    binary = self._binary.encode(data, wifi_status, demo_mode)
+                    self.encode_us += time.ticks_diff(time.ticks_us(), t0)
+                    self.encodes[PROTOCOL_BINARY] += 1
+                frame = binary
+            if sink.send(frame, now):
+                sent += 1
+        return sent
+
+    def poll(self):
+        """Continue partly written frames (call once per loop slot)"""
+        for sink in self.sinks:
+            sink.drain()
+
+    def flush(self):
+        """Push out everything before sleeping"""
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                print(f"Output {sink.name}: close failed: {e}")
+
+    def get_stats(self):
+        """
+        Get fan-out statistics
+
+        Returns:
+            Dictionary with snapshots, encodes per protocol, total encode
+            time (us) and a statistics dictionary per sink name
+        """
+        stats = {
+            'snapshots': self.snapshots,
+            'encodes': dict(self.encodes),
+            'encode_us': self.encode_us,
+        }
+        for sink in self.sinks:
+            stats[sink.name] = sink.get_stats()
+        return stats
@@ -0,0 +1,106 @@
+"""
+Low-power duty cycling
+Puts the WiFi radio in power-save mode and sleeps between the short
+active windows of the low-power loop (one Modbus poll plus a burst of all
+UART messages), measuring active and idle time per cycle
+"""
+
+import time
+import machine
+import network
+
+SLEEP_LIGHTSLEEP = 'lightsleep'  # machine.lightsleep(): clocks stopped, USB serial drops out
+SLEEP_IDLE = 'idle'              # time.sleep_ms(): CPU idles in WFI, USB stays up
+
+
+class PowerManager:
+    """Sleep provider for FixedRateScheduler with active/idle accounting"""
+
+    def __init__(self, sleep_mode=SLEEP_LIGHTSLEEP, min_lightsleep_ms=20):
+        """
+        Args:
+            sleep_mode: SLEEP_LIGHTSLEEP or SLEEP_IDLE
+            min_lightsleep_ms: Shorter sleeps use time.sleep_ms (entering and
+                               leaving lightsleep is not free)
+
+        Raises:
+            ValueError: On an unknown sleep mode
+        """
+        if sleep_mode not in (SLEEP_LIGHTSLEEP, SLEEP_IDLE):
+            raise ValueError(f"unknown sleep mode: {sleep_mode}")
+        self.sleep_mode = sleep_mode
+        self.min_lightsleep_ms = min_lightsleep_ms
+
+        self._last_wake = time.ticks_ms()
+        self.cycles = 0
+        self.active_ms = 0
+        self.idle_ms = 0
+        self.last_active_ms = 0
+        self.last_idle_ms = 0
+        self.max_active_ms = 0
+
+    def configure_wlan(self, wlan):
+        """
+        Let the radio sleep between DTIM beacons while associated
+
+        Args:
+            wlan: network.WLAN station interface
+
+        Returns:
+            True if power-save mode was set
+        """
+        pm = getattr(network.WLAN, 'PM_POWERSAVE', None)
+        if pm is None:
+            return False  # Firmware without WLAN power management constants
+        try:
+            wlan.config(pm=pm)
+            return True
+        except (ValueError, OSError):
+            return False
+
+    def sleep_ms(self, ms):
+        """
+        Sleep for ms milliseconds, recording the time since the last wakeup
+        as active time (pass as FixedRateScheduler's sleep function)
+
+        Args:
+            ms: Sleep duration in milliseconds
+        """
+        start = time.ticks_ms()
+        active = time.ticks_diff(start, self._last_wake)
+
+        if self.sleep_mode == SLEEP_LIGHTSLEEP and ms >= self.min_lightsleep_ms:
+            machine.lightsleep(ms)
+        else:
+            time.sleep_ms(ms)
+
+        self._last_wake = time.ticks_ms()
+        idle = time.ticks_diff(self._last_wake, start)
+
+        self.cycles += 1
+        self.active_ms += active
+        self.idle_ms += idle
+        self.last_active_ms = active
+        self.last_idle_ms = idle
+        if active > self.max_active_ms:
+            self.max_active_ms = active
+
+    def get_stats(self):
+        """
+        Get duty cycle statistics
+
+        Returns:
+            Dictionary with cycles, total/last/max active time, total/last
+            idle time (ms) and the active fraction
+        """
+        total = self.active_ms + self.idle_ms
+        return {
+            'sleep_mode': self.sleep_mode,
+            'cycles': self.cycles,
+            'active_ms': self.active_ms,
+            'idle_ms': self.idle_ms,
+            'last_active_ms': self.last_active_ms,
+            'last_idle_ms': self.last_idle_ms,
+            'max_active_ms': self.max_active_ms,
+            'duty_cycle': self.active_ms / total if total else 0.0,
+        }
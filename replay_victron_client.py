@@ -0,0 +1,200 @@
+"""
+Replay Victron Client - Plays back a recorded Modbus trace
+Serves raw register responses captured by TraceRecorder through the normal
+VictronClient decoding path, in real time, at N x speed or cycle by cycle
+"""
+
+import config
+from victron_client import VictronClient
+from victron_trace import read_trace, ticks_ms, ticks_diff, FC_CYCLE_MARK
+
+
+class ReplayVictronClient(VictronClient):
+    """
+    Client with the VictronClient interface that reads from a trace file
+
+    Only the network layer (_request) is replaced, so every decoding step
+    of VictronClient runs exactly as it would against a live Cerbo GX.
+    """
+
+    def __init__(self, path=None, speed=None, loop=False, host=None, port=None, unit_id=None):
+        """
+        Initialize replay client
+
+        Args:
+            path: Trace file (defaults to config.TRACE_REPLAY_FILE)
+            speed: Playback speed multiplier (defaults to config.TRACE_REPLAY_SPEED).
+                   0 steps one recorded cycle per read_all_data() call.
+            loop: Restart from the beginning when the trace ends
+            host: Ignored (for interface compatibility)
+            port: Ignored (for interface compatibility)
+            unit_id: Modbus unit ID (defaults to UNIT_ID_SYSTEM)
+        """
+        super().__init__(host, port, unit_id)
+        self.path = path or config.TRACE_REPLAY_FILE
+        self.speed = config.TRACE_REPLAY_SPEED if speed is None else speed
+        self.loop = loop
+
+        self._records = None
+        self._pending = None
+        self._registers = {}  # (unit_id, register) -> last recorded value
+        self._start_ticks = 0
+        self._start_trace_ms = 0
+        self._last_applied_ms = 0
+
+        self.cycles = 0
+        self.finished = False
+
+    def connect(self):
+        """
+        Open the trace file
+
+        Returns:
+            True if the trace could be opened
+        """
+        try:
+            self._rewind()
+        except Exception as e:
+            print(f"Failed to open trace {self.path}: {e}")
+            return False
+
+        if self.speed > 0:
+            print(f"REPLAY MODE: Playing {self.path} at {self.speed}x")
+        else:
+            print(f"REPLAY MODE: Stepping through {self.path} one cycle per read")
+        return True
+
+    def _rewind(self):
+        """Restart playback from the first record"""
+        self._records = read_trace(self.path)
+        self._pending = self._next_record()
+        self._registers = {}
+        self._last_applied_ms = 0
+        self.finished = False
+
+        if self.speed > 0:
+            # Start the clock with the first recorded cycle already applied
+            self._advance_cycle()
+            self._start_trace_ms = self._last_applied_ms
+            self._start_ticks = ticks_ms()
+
+    def _next_record(self):
+        """Fetch the next record from the trace (None at the end)"""
+        try:
+            return next(self._records)
+        except StopIteration:
+            return None
+
+    def _apply_pending(self):
+        """Apply the pending record to the register image and fetch the next"""
+        time_ms, function_code, unit_id, register_addr, count, values = self._pending
+        if function_code != FC_CYCLE_MARK:
+            registers = self._registers
+            if values is None:
+                for i in range(count):
+                    registers[(unit_id, register_addr + i)] = None
+            else:
+                for i in range(len(values)):
+                    registers[(unit_id, register_addr + i)] = values[i]
+        self._last_applied_ms = time_ms
+        self._pending = self._next_record()
+
+    def _advance_cycle(self):
+        """Apply the records of one recorded read_all_data() cycle"""
+        if self._pending and self._pending[1] == FC_CYCLE_MARK:
+            self._apply_pending()
+        while self._pending and self._pending[1] != FC_CYCLE_MARK:
+            self._apply_pending()
+
+    def _advance(self):
+        """Move playback forward for the next read_all_data() call"""
+        if self._pending is None:
+            if not self.loop:
+                self.finished = True
+                return
+            self._rewind()
+
+        if self.speed > 0:
+            elapsed = ticks_diff(ticks_ms(), self._start_ticks)
+            trace_ms = self._start_trace_ms + int(elapsed * self.speed)
+            while self._pending and self._pending[0] <= trace_ms:
+                self._apply_pending()
+        else:
+            self._advance_cycle()
+
+        self.cycles += 1
+
+    def _now_ms(self):
+        """Cache ages follow the trace clock, so replay is deterministic at any speed"""
+        return self._last_applied_ms & 0x3FFFFFFF
+
+    def _request(self, function_code, register_addr, count, unit_id):
+        """
+        Serve a register read from the recorded register image
+
+        Raises:
+            OSError: If a register was never recorded or its read had failed
+        """
+        values = []
+        for i in range(count):
+            value = self._registers.get((unit_id, register_addr + i))
+            if value is None:
+                raise OSError(f"no recorded value for unit {unit_id} register {register_addr + i}")
+            values.append(value)
+        return values
+
+    def read_all_data(self):
+        """
+        Advance playback and decode the recorded registers
+
+        Returns:
+            Dictionary with all data, as VictronClient.read_all_data()
+        """
+        self._advance()
+        return super().read_all_data()
+
+    def close(self):
+        """Stop playback"""
+        if self._records is not None:
+            self._records = None
+            self._pending = None
+            print(f"REPLAY MODE: Stopped after {self.cycles} cycles")
+
+
+if __name__ == "__main__":
+    # Host-side benchmark: decode a whole trace as fast as possible
+    import argparse
+    import os
+    import sys
+    import time
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "host"))
+    import host_runtime
+    host_runtime.install()
+
+    parser = argparse.ArgumentParser(description="Replay a Victron Modbus trace")
+    parser.add_argument("trace", help="Trace file recorded with TRACE_RECORD_FILE")
+    parser.add_argument("--print", action="store_true", help="Print every decoded cycle")
+    args = parser.parse_args()
+
+    client = ReplayVictronClient(args.trace, speed=0)
+    if not client.connect():
+        raise SystemExit(1)
+
+    timings = []
+    while True:
+        start = time.perf_counter()
+        data = client.read_all_data()
+        elapsed = time.perf_counter() - start
+        if client.finished:
+            break
+        timings.append(elapsed)
+        if args.print:
+            print(data)
+    client.close()
+
+    if timings:
+        total = sum(timings)
+        print(f"{len(timings)} cycles in {total * 1000:.1f} ms: "
+              f"mean {total / len(timings) * 1e6:.1f} us, max {max(timings) * 1e6:.1f} us, "
+              f"{len(timings) / total:.0f} cycles/s")
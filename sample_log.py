@@ -0,0 +1,198 @@
+"""
+Flash sample log
+Appends every poll to fixed-size binary segment files in flash, buffering
+records in RAM so flash is written once per SAMPLE_LOG_BUFFER_RECORDS
+polls, and deletes the oldest segment once SAMPLE_LOG_SEGMENTS are full.
+Segments are read back over USB with history_export.py.
+
+Record: RECORD_FORMAT, little endian: device time.time() (u32), boot tag
+(u16) and the history.FIELDS as float32 (NaN = missing). The boot tag is
+a counter kept in flash, incremented on every boot, plus BOOT_SYNCED if
+the clock was set from NTP; without it the RTC restarts at its default
+date on every boot, and only records of the running boot can be mapped
+to real time.
+"""
+
+import os
+import struct
+import time
+import config
+from history import FIELDS
+
+RECORD_FORMAT = '<IH' + 'f' * len(FIELDS)
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+BOOT_MASK = 0x7FFF
+BOOT_SYNCED = 0x8000  # Boot tag flag: device time is real (UTC) time
+
+NAN = float('nan')
+
+
+class SampleLog:
+    """Segmented append-only log of snapshots in flash"""
+
+    def __init__(self, directory=None, segment_records=None, segments=None, buffer_records=None,
+                 clock_synced=False):
+        """
+        Args:
+            directory: Flash directory for the segment files (default config.SAMPLE_LOG_DIR)
+            segment_records: Records per segment file (default config.SAMPLE_LOG_SEGMENT_RECORDS)
+            segments: Segments kept (default config.SAMPLE_LOG_SEGMENTS)
+            buffer_records: Records held in RAM between flash writes
+                            (default config.SAMPLE_LOG_BUFFER_RECORDS)
+            clock_synced: The RTC was set from NTP (see sync_clock())
+        """
+        self.directory = config.SAMPLE_LOG_DIR if directory is None else directory
+        self.segment_records = config.SAMPLE_LOG_SEGMENT_RECORDS if segment_records is None else segment_records
+        self.max_segments = config.SAMPLE_LOG_SEGMENTS if segments is None else segments
+        buffer_records = config.SAMPLE_LOG_BUFFER_RECORDS if buffer_records is None else buffer_records
+
+        self._buffer = bytearray(buffer_records * RECORD_SIZE)
+        self._buffered = 0
+        self._values = [NAN] * len(FIELDS)
+
+        try:
+            os.mkdir(self.directory)
+        except OSError:
+            pass  # Already exists
+        numbers = self.segments()
+        self._segment = numbers[-1] if numbers else 0
+        self._segment_fill = self.segment_size(self._segment) // RECORD_SIZE
+
+        self.boot = self._next_boot()
+        self.clock_synced = clock_synced
+
+        self.records = 0
+        self.flushes = 0
+        self.errors = 0
+
+    def _next_boot(self):
+        """Increment the boot counter in flash"""
+        path = f"{self.directory}/boot"
+        try:
+            with open(path) as f:
+                boot = (int(f.read()) + 1) & BOOT_MASK
+        except (OSError, ValueError):
+            boot = 0
+        try:
+            with open(path, 'w') as f:
+                f.write(str(boot))
+        except OSError as e:
+            print(f"Sample log: could not save boot counter: {e}")
+        return boot
+
+    @property
+    def boot_tag(self):
+        """Boot tag stored with this boot's records"""
+        return self.boot | BOOT_SYNCED if self.clock_synced else self.boot
+
+    def segment_path(self, number):
+        return f"{self.directory}/seg{number:06d}.bin"
+
+    def segments(self):
+        """Segment numbers on flash, oldest first"""
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith('seg') and name.endswith('.bin'):
+                try:
+                    numbers.append(int(name[3:-4]))
+                except ValueError:
+                    pass
+        numbers.sort()
+        return numbers
+
+    def segment_size(self, number):
+        try:
+            return os.stat(self.segment_path(number))[6]
+        except OSError:
+            return 0
+
+    def add(self, data):
+        """
+        Buffer one snapshot, writing to flash when the buffer is full
+
+        Args:
+            data: Data dictionary from read_all_data()
+        """
+        values = self._values
+        for f, name in enumerate(FIELDS):
+            value = data.get(name)
+            values[f] = NAN if value is None else value
+        struct.pack_into(RECORD_FORMAT, self._buffer, self._buffered * RECORD_SIZE,
+                         int(time.time()), self.boot_tag, *values)
+        self._buffered += 1
+        self.records += 1
+        if self._buffered * RECORD_SIZE >= len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """Write buffered records to flash (e.g. before an export)"""
+        if not self._buffered:
+            return
+        view = memoryview(self._buffer)
+        written = 0
+        try:
+            while written < self._buffered:
+                if self._segment_fill >= self.segment_records:
+                    self._rotate()
+                count = min(self._buffered - written, self.segment_records - self._segment_fill)
+                with open(self.segment_path(self._segment), 'ab') as f:
+                    f.write(view[written * RECORD_SIZE:(written + count) * RECORD_SIZE])
+                written += count
+                self._segment_fill += count
+            self.flushes += 1
+        except OSError as e:
+            print(f"Sample log: write failed: {e}")
+            self.errors += 1
+        self._buffered = 0
+
+    def _rotate(self):
+        """Start the next segment and drop the oldest beyond max_segments"""
+        self._segment += 1
+        self._segment_fill = 0
+        numbers = self.segments()
+        while len(numbers) >= self.max_segments:
+            os.remove(self.segment_path(numbers.pop(0)))
+
+    def get_stats(self):
+        """
+        Get log statistics
+
+        Returns:
+            Dictionary with records logged since boot, records buffered in
+            RAM, flash writes, errors and the segments on flash
+        """
+        numbers = self.segments()
+        return {
+            'boot': self.boot,
+            'clock_synced': self.clock_synced,
+            'records': self.records,
+            'buffered': self._buffered,
+            'flushes': self.flushes,
+            'errors': self.errors,
+            'segments': len(numbers),
+            'first_segment': numbers[0] if numbers else None,
+            'last_segment': numbers[-1] if numbers else None,
+        }
+
+
+def sync_clock(host=None):
+    """
+    Set the RTC from NTP (needs WiFi), so this boot's log records carry
+    real times that can still be placed after later reboots
+
+    Args:
+        host: NTP server (default: ntptime's own)
+
+    Returns:
+        True if the clock was set
+    """
+    try:
+        import ntptime
+        if host:
+            ntptime.host = host
+        ntptime.settime()
+        return True
+    except (ImportError, OSError) as e:
+        print(f"Clock sync failed: {e}")
+        return False
@@ -0,0 +1,129 @@
+"""
+Fixed-rate scheduler for the main loop
+Holds a configured period exactly by sleeping until absolute ticks_ms
+deadlines instead of sleeping a fixed time after the work, so the period
+does not drift with Modbus, print and UART time
+"""
+
+import time
+
+POLICY_SKIP = 'skip'          # After an overrun, realign to the next slot on the grid
+POLICY_CATCH_UP = 'catch_up'  # After an overrun, run missed cycles back to back
+
+
+class FixedRateScheduler:
+    """Deadline-based periodic scheduler with overrun and jitter accounting"""
+
+    def __init__(self, period_ms, policy=POLICY_SKIP, max_catch_up=3, sleep_ms=None):
+        """
+        Args:
+            period_ms: Cycle period in milliseconds
+            policy: POLICY_SKIP or POLICY_CATCH_UP
+            max_catch_up: Max missed cycles replayed under POLICY_CATCH_UP;
+                          any further backlog is skipped
+            sleep_ms: Sleep function taking milliseconds (default
+                      time.sleep_ms), e.g. PowerManager.sleep_ms
+
+        Raises:
+            ValueError: On an unknown policy or non-positive period
+        """
+        if policy not in (POLICY_SKIP, POLICY_CATCH_UP):
+            raise ValueError(f"unknown scheduler policy: {policy}")
+        if period_ms <= 0:
+            raise ValueError("period_ms must be positive")
+
+        self.period_ms = period_ms
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self._sleep_ms = sleep_ms or time.sleep_ms
+        self._deadline = None
+        self._backlog = 0    # Past deadlines still to run under POLICY_CATCH_UP
+
+        self.cycles = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.jitter_last_ms = 0
+        self.jitter_max_ms = 0
+        self._jitter_total_ms = 0
+        self._jitter_count = 0
+
+    def start(self):
+        """Start the schedule now; the first wait() returns one period later"""
+        self._deadline = time.ticks_add(time.ticks_ms(), self.period_ms)
+        self._backlog = 0
+
+    def set_period(self, period_ms):
+        """Change the period, taking effect from the next deadline"""
+        if period_ms <= 0:
+            raise ValueError("period_ms must be positive")
+        self.period_ms = period_ms
+
+    def wait(self):
+        """
+        Sleep until the next deadline
+
+        Returns:
+            Number of whole periods by which this cycle was late (0 when on
+            time or when replaying a missed slot)
+        """
+        if self._deadline is None:
+            self.start()
+
+        period = self.period_ms
+        late = time.ticks_diff(time.ticks_ms(), self._deadline)
+        missed = 0
+
+        if late <= 0:
+            if late < 0:
+                self._sleep_ms(-late)
+                # Jitter: how late the wakeup was against the deadline
+                late = time.ticks_diff(time.ticks_ms(), self._deadline)
+            self._record_jitter(late)
+            self._deadline = time.ticks_add(self._deadline, period)
+        elif self._backlog:
+            # A missed slot replayed under POLICY_CATCH_UP: its deadline was
+            # left in the past on purpose, so it is neither an overrun nor jitter
+            self._backlog -= 1
+            self._deadline = time.ticks_add(self._deadline, period)
+        else:
+            # Overrun: the work took longer than the remaining period
+            self.overruns += 1
+            self._record_jitter(late)
+            missed = late // period
+            if self.policy == POLICY_SKIP:
+                self.skipped += missed
+                self._deadline = time.ticks_add(self._deadline, (missed + 1) * period)
+            else:
+                backlog = min(missed, self.max_catch_up)
+                self.skipped += missed - backlog
+                self._backlog = backlog
+                # Leave `backlog` deadlines in the past so they run back to back
+                self._deadline = time.ticks_add(self._deadline, (missed - backlog + 1) * period)
+
+        self.cycles += 1
+        return missed
+
+    def _record_jitter(self, late_ms):
+        self.jitter_last_ms = late_ms
+        if late_ms > self.jitter_max_ms:
+            self.jitter_max_ms = late_ms
+        self._jitter_total_ms += late_ms
+        self._jitter_count += 1
+
+    def get_stats(self):
+        """
+        Get timing statistics
+
+        Returns:
+            Dictionary with cycles, overruns, skipped cycles and jitter (ms);
+            slots replayed under POLICY_CATCH_UP count as cycles only
+        """
+        return {
+            'period_ms': self.period_ms,
+            'cycles': self.cycles,
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+            'jitter_last_ms': self.jitter_last_ms,
+            'jitter_max_ms': self.jitter_max_ms,
+            'jitter_mean_ms': self._jitter_total_ms / max(1, self._jitter_count),
+        }
@@ -0,0 +1,259 @@
+"""
+Stall supervisor
+Gives each stage of the main loop a latency budget and checks them from a
+machine.Timer, so a stage stuck inside a blocking socket or WiFi call is
+still noticed. A stage over its budget escalates one step per
+SUPERVISOR_ESCALATE_MS until it makes progress again:
+
+    1. socket   Close the Modbus socket (reconnected on the next poll)
+    2. wifi     Drop the WiFi association and restart the interface
+    3. reboot   Save the escalation log and machine.reset()
+
+In dual-core mode the socket and wifi actions only queue the reset for
+core 1 (NetworkPoller), which owns all network calls.
+
+The hardware watchdog is fed from the same check, and only while every
+stage is within budget or still being recovered; if the check itself
+stops running, the watchdog resets the board SUPERVISOR_WDT_MS later.
+Every escalation is logged with its timing (budget, elapsed time, action
+time, time to recover) in RAM and in SUPERVISOR_LOG_FILE, which survives
+the reboot, so the budgets can be tuned from real stalls.
+"""
+
+import json
+import time
+import machine
+from array import array
+import config
+
+ACTION_SOCKET = 'socket'
+ACTION_WIFI = 'wifi'
+ACTION_REBOOT = 'reboot'
+ESCALATION = (ACTION_SOCKET, ACTION_WIFI, ACTION_REBOOT)
+
+# Log-only entries
+ACTION_RECOVERED = 'recovered'
+ACTION_BOOT = 'boot'
+
+
+class Supervisor:
+    """Per-stage latency budgets, stepwise recovery and watchdog feeding"""
+
+    def __init__(self, budgets=None, actions=None, check_ms=None, escalate_ms=None,
+                 wdt_ms=None, log_file=None, log_size=None):
+        """
+        Args:
+            budgets: Dict of stage name -> budget in ms (default config.SUPERVISOR_BUDGETS_MS)
+            actions: Dict of ACTION_SOCKET/ACTION_WIFI -> callable run by the
+                     Timer (must not block), optionally returning a result for
+                     the log; ACTION_REBOOT defaults to machine.reset
+            check_ms: Check period (default config.SUPERVISOR_CHECK_MS)
+            escalate_ms: Time each recovery step gets (default config.SUPERVISOR_ESCALATE_MS)
+            wdt_ms: Hardware watchdog timeout, 0 = none (default config.SUPERVISOR_WDT_MS)
+            log_file: Escalation log in flash, None = RAM only (default config.SUPERVISOR_LOG_FILE)
+            log_size: Entries kept (default config.SUPERVISOR_LOG_SIZE)
+        """
+        budgets = config.SUPERVISOR_BUDGETS_MS if budgets is None else budgets
+        self.actions = actions or {}
+        self.check_ms = config.SUPERVISOR_CHECK_MS if check_ms is None else check_ms
+        self.escalate_ms = config.SUPERVISOR_ESCALATE_MS if escalate_ms is None else escalate_ms
+        self.wdt_ms = config.SUPERVISOR_WDT_MS if wdt_ms is None else wdt_ms
+        self.log_file = config.SUPERVISOR_LOG_FILE if log_file is None else log_file
+        self.log_size = config.SUPERVISOR_LOG_SIZE if log_size is None else log_size
+
+        # Stage state in arrays: begin()/end() may run on either core and
+        # _check() in a Timer callback, none of them allocating
+        self.stages = tuple(budgets)
+        self._index = {name: i for i, name in enumerate(self.stages)}
+        n = len(self.stages)
+        self._budget = array('l', [budgets[name] for name in self.stages])
+        self._start = array('l', [0] * n)
+        self._active = bytearray(n)
+        self._max = array('l', [0] * n)
+        self._stalls = array('l', [0] * n)
+
+        self.level = 0            # Escalation steps taken for the current stall
+        self._stalled = -1        # Stage index of the current stall
+        self._stall_start = 0
+        self._level_at = 0
+        self._monitoring = False
+        self._timer = None
+        self._wdt = None
+        self.escalations = 0
+        self.feeds = 0
+
+        self.log = self._load_log()
+        self._note_boot()
+
+    def _load_log(self):
+        if not self.log_file:
+            return []
+        try:
+            with open(self.log_file) as f:
+                return json.load(f)[-self.log_size:]
+        except (OSError, ValueError):
+            return []
+
+    def _save_log(self):
+        if not self.log_file:
+            return
+        try:
+            with open(self.log_file, 'w') as f:
+                json.dump(self.log, f)
+        except OSError:
+            pass
+
+    def _record(self, entry):
+        self.log.append(entry)
+        if len(self.log) > self.log_size:
+            self.log.pop(0)
+        self._save_log()
+
+    def _note_boot(self):
+        """Log watchdog resets: ours (after a reboot entry) or the hardware backstop"""
+        if machine.reset_cause() != machine.WDT_RESET:
+            return
+        ours = self.log and self.log[-1]['action'] == ACTION_REBOOT
+        self._record({'time': int(time.time()), 'stage': None, 'action': ACTION_BOOT,
+                      'cause': 'supervisor' if ours else 'watchdog'})
+
+    def start(self):
+        """Start the hardware watchdog (if configured) and the periodic check"""
+        if self.wdt_ms:
+            self._wdt = machine.WDT(timeout=self.wdt_ms)
+        now = time.ticks_ms()
+        for i in range(len(self.stages)):
+            self._start[i] = now
+        self._monitoring = True
+        self._timer = machine.Timer(period=self.check_ms, mode=machine.Timer.PERIODIC,
+                                    callback=self._check)
+
+    def stop(self):
+        """
+        Stop monitoring (shutdown); a started hardware watchdog cannot be
+        stopped, so the Timer keeps feeding it and the REPL stays usable
+        """
+        self._monitoring = False
+        if self._timer and not self._wdt:
+            self._timer.deinit()
+            self._timer = None
+
+    def begin(self, stage):
+        """
+        Start a stage, or restart it as a heartbeat (e.g. once per loop slot)
+
+        Args:
+            stage: Stage name; stages without a budget are ignored
+        """
+        i = self._index.get(stage)
+        if i is not None:
+            self._start[i] = time.ticks_ms()
+            self._active[i] = 1
+
+    def end(self, stage):
+        """
+        Finish a stage, recording its duration
+
+        Args:
+            stage: Stage name; stages without a budget are ignored
+        """
+        i = self._index.get(stage)
+        if i is not None and self._active[i]:
+            elapsed = time.ticks_diff(time.ticks_ms(), self._start[i])
+            if elapsed > self._max[i]:
+                self._max[i] = elapsed
+            self._active[i] = 0
+
+    def end_all(self):
+        """Finish every stage (after an exception skipped the end() calls)"""
+        for stage in self.stages:
+            self.end(stage)
+
+    def _feed(self):
+        if self._wdt:
+            self._wdt.feed()
+            self.feeds += 1
+
+    def _check(self, timer):
+        """Timer callback: find the worst stalled stage, escalate, feed"""
+        if not self._monitoring:
+            self._feed()
+            return
+        now = time.ticks_ms()
+        worst = -1
+        worst_over = 0
+        for i in range(len(self._budget)):
+            if self._active[i]:
+                elapsed = time.ticks_diff(now, self._start[i])
+                if elapsed > self._max[i]:
+                    self._max[i] = elapsed
+                over = elapsed - self._budget[i]
+                if over > worst_over:
+                    worst = i
+                    worst_over = over
+
+        if worst < 0:
+            if self.level:
+                self._record({'time': int(time.time()), 'stage': self.stages[self._stalled],
+                              'action': ACTION_RECOVERED, 'level': self.level,
+                              'stall_ms': time.ticks_diff(now, self._stall_start)})
+                self.level = 0
+                self._stalled = -1
+            self._feed()
+            return
+
+        if self.level == 0:
+            self._stalled = worst
+            self._stall_start = time.ticks_add(now, -worst_over)
+            self._stalls[worst] += 1
+        if self.level == 0 or time.ticks_diff(now, self._level_at) >= self.escalate_ms:
+            if self.level < len(ESCALATION):
+                self._escalate(worst, now)
+        if self.level < len(ESCALATION):
+            self._feed()  # Recovery in progress; after the reboot step the watchdog takes over
+
+    def _escalate(self, i, now):
+        action = ESCALATION[self.level]
+        self.level += 1
+        self._level_at = now
+        self.escalations += 1
+        entry = {'time': int(time.time()), 'stage': self.stages[i], 'action': action,
+                 'level': self.level, 'budget_ms': self._budget[i],
+                 'elapsed_ms': time.ticks_diff(now, self._start[i])}
+        if action == ACTION_REBOOT:
+            self._record(entry)
+            print(f"Supervisor: stage {entry['stage']} stalled {entry['elapsed_ms']} ms, rebooting")
+            self.actions.get(ACTION_REBOOT, machine.reset)()
+            return
+
+        fn = self.actions.get(action)
+        start = time.ticks_ms()
+        try:
+            entry['result'] = (fn() or 'ok') if fn else 'none'
+        except Exception as e:
+            entry['result'] = str(e)
+        entry['action_ms'] = time.ticks_diff(time.ticks_ms(), start)
+        self._record(entry)
+        print(f"Supervisor: stage {entry['stage']} stalled {entry['elapsed_ms']} ms "
+              f"(budget {entry['budget_ms']} ms), {action} reset: {entry['result']}")
+
+    def get_stats(self):
+        """
+        Get supervisor statistics
+
+        Returns:
+            Dictionary with the escalation level, the stalled stage, per
+            stage budget / worst duration / stall count, escalation and
+            watchdog feed counts and the escalation log
+        """
+        return {
+            'level': self.level,
+            'stalled': self.stages[self._stalled] if self._stalled >= 0 else None,
+            'stages': {name: {'budget_ms': self._budget[i], 'max_ms': self._max[i],
+                              'stalls': self._stalls[i]}
+                       for i, name in enumerate(self.stages)},
+            'escalations': self.escalations,
+            'wdt_ms': self.wdt_ms if self._wdt else 0,
+            'feeds': self.feeds,
+            'log': self.log,
+        }
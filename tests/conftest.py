@@ -0,0 +1,78 @@
+"""
+Host test setup
+The application modules run under CPython with the MicroPython shims from
+host/ (machine, network, time.ticks_*), the same way host_main.py runs them
+"""
+
+import os
+import socket
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "host"))
+sys.path.insert(1, ROOT)
+
+import host_runtime  # noqa: E402
+
+# pytest owns stdin; tests that need the unbuffered device stdin build a RawStdin
+_stdin = sys.stdin
+host_runtime.install()
+sys.stdin = _stdin
+
+
+@pytest.fixture
+def port_range():
+    """Factory for a free range of consecutive local ports (simulator endpoints)"""
+
+    def find(count):
+        for base in range(20000, 60000, 97):
+            sockets = []
+            try:
+                for port in range(base, base + count):
+                    s = socket.socket()
+                    sockets.append(s)
+                    s.bind(("127.0.0.1", port))
+                return base
+            except OSError:
+                continue
+            finally:
+                for s in sockets:
+                    s.close()
+        raise RuntimeError("no free port range")
+
+    return find
+
+
+@pytest.fixture
+def simulator(port_range):
+    """
+    Factory starting a ModbusSimulator on a background event loop, for
+    tests with synchronous (device-style) clients
+
+    Returns the simulator; its first port is simulator.base_port
+    """
+    import asyncio
+    import threading
+
+    from modbus_simulator import DemoRegisterSource, ModbusSimulator
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    started = []
+
+    def start(endpoints=1, **kwargs):
+        sim = ModbusSimulator(DemoRegisterSource(endpoints), endpoints,
+                              base_port=port_range(endpoints), **kwargs)
+        asyncio.run_coroutine_threadsafe(sim.start(), loop).result(5)
+        started.append(sim)
+        return sim
+
+    yield start
+    for sim in started:
+        asyncio.run_coroutine_threadsafe(sim.close(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
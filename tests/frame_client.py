@@ -0,0 +1,62 @@
+"""
+Blocking Modbus TCP master for the client tests (umodbus is not needed on the host)
+"""
+
+import socket
+
+import config
+from modbus_frames import MBAP_SIZE, build_read_request, parse_mbap, parse_read_response
+from victron_client import VictronClient
+
+
+class FrameTCP:
+    """
+    Blocking Modbus TCP master with the umodbus.tcp.TCP interface used by
+    VictronClient: one shared socket (_sock), and a reply whose
+    transaction ID does not match the request is an error
+    """
+
+    def __init__(self, host, port, timeout):
+        self._sock = socket.create_connection((host, port), timeout)
+        self._transaction_id = 0
+
+    def _recv_exact(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise OSError("connection closed")
+            data += chunk
+        return data
+
+    def _read(self, function_code, slave_addr, starting_addr, register_qty):
+        self._transaction_id = (self._transaction_id + 1) & 0xFFFF
+        self._sock.send(build_read_request(self._transaction_id, slave_addr, function_code,
+                                           starting_addr, register_qty))
+        transaction_id, pdu_length, _ = parse_mbap(self._recv_exact(MBAP_SIZE))
+        pdu = self._recv_exact(pdu_length)
+        if transaction_id != self._transaction_id:
+            raise ValueError('wrong transaction ID')
+        return list(parse_read_response(pdu, function_code, register_qty))
+
+    def read_input_registers(self, slave_addr, starting_addr, register_qty):
+        return self._read(VictronClient.FC_READ_INPUT, slave_addr, starting_addr, register_qty)
+
+    def read_holding_registers(self, slave_addr, starting_addr, register_qty):
+        return self._read(VictronClient.FC_READ_HOLDING, slave_addr, starting_addr, register_qty)
+
+
+class FrameVictronClient(VictronClient):
+    """VictronClient over FrameTCP instead of umodbus"""
+
+    connects = 0
+
+    def connect(self):
+        self.connects += 1
+        try:
+            self.client = FrameTCP(self.host, self.port, config.CONNECT_TIMEOUT)
+        except OSError:
+            return False
+        self.client._sock.settimeout(config.MODBUS_REQUEST_TIMEOUT)
+        self._reconnect = False
+        return True
@@ -0,0 +1,34 @@
+"""
+VictronClient served from a register dict instead of the network, with a
+settable clock, for tests of the layers above _request
+"""
+
+from victron_client import VictronClient
+
+
+class RegisterClient(VictronClient):
+    """Answers reads from registers[(unit_id, register)]; counts the requests"""
+
+    def __init__(self, registers=None, **kwargs):
+        super().__init__("127.0.0.1", 502, **kwargs)
+        self.registers = dict(registers or {})
+        self.requests = []
+        self.failing = set()  # Unit IDs whose requests raise OSError
+        self.now = 1000
+
+    def _now_ms(self):
+        return self.now
+
+    def _request(self, function_code, register_addr, count, unit_id):
+        self.requests.append((unit_id, register_addr, count))
+        if unit_id in self.failing:
+            raise OSError("timed out")
+        values = []
+        for register in range(register_addr, register_addr + count):
+            if (unit_id, register) not in self.registers:
+                raise OSError(f"illegal address {register}")
+            values.append(self.registers[(unit_id, register)])
+        return values
+
+    def reset_socket(self):
+        self._reconnect = False
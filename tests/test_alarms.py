@@ -0,0 +1,63 @@
+import pytest
+
+from alarms import AlarmEngine, compile_rules
+
+RULES = [
+    ("LOW_SOC", "battery_soc", "<", 20, 25, 30),
+    ("OVER_CURRENT", "battery_current", "abs>", 100, 90, 0),
+    ("STALE", "battery_voltage", "stale", 30, None, 15),
+]
+
+
+def test_delay_and_hysteresis():
+    engine = AlarmEngine(RULES[:1])
+    assert engine.evaluate({'battery_soc': 19}, now_ms=0) == []
+    assert engine.evaluate({'battery_soc': 18}, now_ms=29999) == []
+    assert engine.evaluate({'battery_soc': 18}, now_ms=30000) == [("LOW_SOC", True)]
+    assert engine.evaluate({'battery_soc': 18}, now_ms=31000) == []
+    # Between set and clear: stays active
+    assert engine.evaluate({'battery_soc': 24}, now_ms=32000) == []
+    assert engine.evaluate({'battery_soc': 25}, now_ms=33000) == [("LOW_SOC", False)]
+    assert engine.get_stats()['raised'] == {"LOW_SOC": 1}
+
+
+def test_condition_must_hold_for_the_whole_delay():
+    engine = AlarmEngine(RULES[:1])
+    engine.evaluate({'battery_soc': 10}, now_ms=0)
+    engine.evaluate({'battery_soc': 30}, now_ms=20000)
+    assert engine.evaluate({'battery_soc': 10}, now_ms=40000) == []
+    assert engine.evaluate({'battery_soc': 10}, now_ms=70000) == [("LOW_SOC", True)]
+
+
+def test_absolute_value():
+    engine = AlarmEngine(RULES[1:2])
+    assert engine.evaluate({'battery_current': -120}, now_ms=0) == [("OVER_CURRENT", True)]
+    assert engine.evaluate({'battery_current': -95}, now_ms=10) == []
+    assert engine.evaluate({'battery_current': 80}, now_ms=20) == [("OVER_CURRENT", False)]
+
+
+def test_missing_value_holds_state():
+    engine = AlarmEngine(RULES[1:2])
+    engine.evaluate({'battery_current': 150}, now_ms=0)
+    assert engine.evaluate({'battery_current': None}, now_ms=10) == []
+    assert engine.evaluate(None, now_ms=20) == []
+    assert engine.active_alarms() == ["OVER_CURRENT"]
+
+
+def test_stale_rule():
+    engine = AlarmEngine(RULES[2:])
+    assert engine.evaluate({'battery_voltage': 52.0}, age_ms=31000, now_ms=0) == []
+    assert engine.evaluate({'battery_voltage': 52.0}, age_ms=46000, now_ms=15000) == [("STALE", True)]
+    assert engine.evaluate({'battery_voltage': 52.0}, now_ms=16000) == [("STALE", False)]
+    # Served from last-known values
+    engine.evaluate({'battery_voltage': 52.0, 'stale_fields': ['battery_voltage']}, now_ms=20000)
+    assert engine.evaluate(None, now_ms=35000) == [("STALE", True)]
+
+
+@pytest.mark.parametrize("rules", [
+    [("X", "battery_soc", "<=", 1, 2, 0)],
+    [("X", "battery_soc", "<", 1, 2, 0), ("X", "battery_soc", ">", 1, 2, 0)],
+])
+def test_invalid_rules(rules):
+    with pytest.raises(ValueError):
+        compile_rules(rules)
@@ -0,0 +1,78 @@
+import pytest
+
+import config
+from register_client import RegisterClient
+from victron_client import VictronClient
+
+SYSTEM = VictronClient.UNIT_ID_SYSTEM
+VEBUS = VictronClient.UNIT_ID_INVERTER
+
+
+def solar(unit, pv_voltage, yield_today, pv_power):
+    registers = {(unit, register): 0 for register in range(771, 791)}
+    registers[(unit, 776)] = pv_voltage
+    registers[(unit, 784)] = yield_today
+    registers[(unit, 789)] = pv_power
+    return registers
+
+
+@pytest.fixture
+def registers():
+    registers = {(SYSTEM, 840): 523, (SYSTEM, 841): 65536 - 125, (SYSTEM, 842): 0,
+                 (SYSTEM, 843): 87, (SYSTEM, 61): 29815}
+    registers.update({(VEBUS, register): 0 for register in range(3, 32)})
+    registers[(VEBUS, 23)] = 65536 - 3
+    registers[(VEBUS, 31)] = 9
+    return registers
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(config, "REGISTER_CACHE_DEFAULT_TTL_MS", 0)
+    monkeypatch.setattr(config, "REGISTER_CACHE_TTL_MS", {})
+    monkeypatch.setattr(config, "EXTENDED_DATA_ENABLED", True)
+
+
+def test_one_request_per_block(registers):
+    registers.update(solar(VictronClient.UNIT_ID_SOLAR, 4512, 37, 2405))
+    client = RegisterClient(registers)
+    data = client.read_all_data()
+    assert data['battery_voltage'] == pytest.approx(52.3)
+    assert data['battery_current'] == pytest.approx(-12.5)
+    assert data['battery_soc'] == 87
+    assert data['charging_state'] == 0
+    assert data['pv_voltage'] == pytest.approx(45.12)
+    assert data['pv_power'] == pytest.approx(240.5)
+    assert data['ac_load'] == -30
+    assert data['inverter_state'] == 9
+    assert [request[1:] for request in client.requests] == [(840, 4), (61, 1), (771, 20), (3, 29)]
+
+
+def test_solar_chargers_combined(registers):
+    registers.update(solar(226, 4500, 30, 1000))
+    registers.update(solar(228, 4700, 12, 500))
+    client = RegisterClient(registers)
+    client.solar_units = (226, 228)
+    data = client.read_solar_chargers()
+    assert data['pv_power'] == pytest.approx(150.0)
+    assert data['solar_yield_today'] == pytest.approx(4.2)
+    assert data['pv_voltage'] == pytest.approx(47.0)
+
+
+def test_missing_charger_leaves_totals_unknown(registers):
+    registers.update(solar(226, 4500, 30, 1000))
+    client = RegisterClient(registers)
+    client.solar_units = (226, 228)
+    data = client.read_solar_chargers()
+    assert data == {'pv_voltage': None, 'solar_yield_today': None, 'pv_power': None}
+
+
+def test_device_map_selects_units(registers):
+    registers.update(solar(238, 4500, 30, 1000))
+    client = RegisterClient(registers)
+    client.apply_device_map({'units': {'system': [SYSTEM], 'solarcharger': [238]}})
+    data = client.read_all_data()
+    assert data['pv_power'] == pytest.approx(100.0)
+    # No VE.Bus device: inverter fields are None without a request
+    assert data['ac_load'] is None
+    assert all(request[0] != VEBUS for request in client.requests)
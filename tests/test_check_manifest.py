@@ -0,0 +1,34 @@
+import check_manifest
+
+
+def test_repository_manifest_is_complete():
+    assert check_manifest.check() == []
+
+
+def test_lazy_imports_are_followed():
+    reachable = check_manifest.reachable_modules()
+    # Imported inside functions of main.py only
+    assert {"main.py", "supervisor.py", "sample_log.py", "dual_core.py"} <= reachable
+    assert "gateway.py" not in reachable
+
+
+def test_imported_names(tmp_path):
+    path = tmp_path / "mod.py"
+    path.write_text("import a.b, c\nfrom d.e import f\nfrom . import g\n"
+                    "def h():\n    import i\n")
+    assert check_manifest.imported_names(str(path)) == {"a", "c", "d", "i"}
+
+
+def test_read_manifest(tmp_path):
+    path = tmp_path / "manifest.py"
+    path.write_text('include("$(PORT_DIR)/boards/manifest.py")\n'
+                    'module("config.py")\nmodule("main.py", opt=3)\n')
+    assert check_manifest.read_manifest(str(path)) == ["config.py", "main.py"]
+
+
+def test_missing_module_reported(monkeypatch, tmp_path):
+    listed = check_manifest.read_manifest()
+    monkeypatch.setattr(check_manifest, "read_manifest",
+                        lambda: [name for name in listed if name != "alarms.py"])
+    problems = check_manifest.check()
+    assert "alarms.py: imported by the application but missing from manifest.py" in problems
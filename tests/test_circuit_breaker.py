@@ -0,0 +1,74 @@
+import pytest
+
+import config
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from register_client import RegisterClient
+
+UNIT = 100
+
+
+def test_opens_at_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, open_ms=1000, max_open_ms=4000)
+    for now in (0, 10):
+        assert breaker.allow(now)
+        breaker.record_failure(now)
+    assert breaker.get_stats()['state'] == 'closed'
+    breaker.record_failure(20)
+    assert not breaker.allow(500)
+    stats = breaker.get_stats()
+    assert (stats['state'], stats['trips'], stats['rejections']) == ('open', 1, 1)
+
+
+def test_probe_backoff_and_close():
+    breaker = CircuitBreaker(failure_threshold=1, open_ms=1000, max_open_ms=2500)
+    breaker.record_failure(0)
+    assert breaker.allow(1000)              # Probe
+    assert not breaker.allow(1001)          # Only one probe in flight
+    breaker.record_failure(1001)
+    assert breaker.open_ms == 2000
+    assert not breaker.allow(3000)
+    assert breaker.allow(3001)
+    breaker.record_failure(3001)
+    assert breaker.open_ms == 2500          # Capped
+    assert breaker.allow(5501)
+    breaker.record_success()
+    stats = breaker.get_stats()
+    assert (stats['state'], stats['failures'], stats['open_ms'], stats['probes']) == ('closed', 0, 1000, 3)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, "REGISTER_CACHE_DEFAULT_TTL_MS", 0)
+    monkeypatch.setattr(config, "REGISTER_CACHE_TTL_MS", {})
+    monkeypatch.setattr(config, "BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(config, "BREAKER_OPEN_MS", 1000)
+    monkeypatch.setattr(config, "STALE_MAX_AGE_S", 10)
+    registers = {(UNIT, register): register for register in range(840, 844)}
+    return RegisterClient(registers)
+
+
+def test_open_breaker_fails_fast(client):
+    client.failing.add(UNIT)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            client._cached_request(client.FC_READ_INPUT, 840, 4, UNIT)
+    with pytest.raises(CircuitOpenError):
+        client._cached_request(client.FC_READ_INPUT, 840, 4, UNIT)
+    assert len(client.requests) == 2
+    client.failing.clear()
+    client.now += 1000
+    assert client._cached_request(client.FC_READ_INPUT, 840, 4, UNIT) == [840, 841, 842, 843]
+    assert client.get_breaker_stats()[f"{UNIT}:840"]['state'] == 'closed'
+
+
+def test_last_known_values_served_stale_until_max_age(client):
+    assert client.read_all_data()['stale_fields'] == []
+    client.failing.add(UNIT)
+    client.now += 5000
+    data = client.read_all_data()
+    assert data['battery_soc'] == 843
+    assert 'battery_soc' in data['stale_fields']
+    client.now += 5001
+    data = client.read_all_data()
+    assert data['battery_soc'] is None
+    assert data['stale_fields'] == []
@@ -0,0 +1,75 @@
+import io
+import time
+
+import pytest
+
+from console_logger import DEBUG, WARNING, ConsoleLogger
+
+
+class FakeClock:
+    def __init__(self, now=1000):
+        self.now = now
+
+    def ticks_ms(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "ticks_ms", clock.ticks_ms)
+    return clock
+
+
+def lines(stream):
+    return stream.getvalue().decode().splitlines()
+
+
+def test_levels_and_deferred_formatting():
+    stream = io.BytesIO()
+    log = ConsoleLogger("INFO", stream=stream)
+
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("formatted a disabled line")
+
+    log.debug("value %s", Exploding())
+    log.info("soc %d%%", 87)
+    log.detail("  row")
+    log.warning("slow")
+    log.error("failed: %s", "timeout")
+    assert lines(stream) == ["[--:--:--] soc 87%", "  row", "[--:--:--] WARNING: slow",
+                             "[--:--:--] ERROR: failed: timeout"]
+    assert not log.is_enabled(DEBUG) and log.is_enabled(WARNING)
+
+
+def test_timestamp_per_cycle(monkeypatch):
+    stream = io.BytesIO()
+    log = ConsoleLogger(stream=stream)
+    monkeypatch.setattr(time, "localtime", lambda: (2026, 1, 2, 7, 5, 9, 4, 2))
+    log.begin_cycle()
+    monkeypatch.setattr(time, "localtime", lambda: (2026, 1, 2, 7, 5, 10, 4, 2))
+    log.info("a")
+    log.info("b")
+    assert lines(stream) == ["[07:05:09] a", "[07:05:09] b"]
+
+
+def test_long_lines_truncated():
+    stream = io.BytesIO()
+    log = ConsoleLogger(line_bytes=20, stream=stream)
+    log.detail("x" * 50)
+    assert stream.getvalue() == b"x" * 19 + b"\n"
+
+
+def test_rate_limit_reports_suppressed_lines(clock):
+    stream = io.BytesIO()
+    log = ConsoleLogger(rate_limit=2, stream=stream)
+    for i in range(5):
+        log.info("line %d", i)
+    log.warning("always shown")
+    clock.now += 1000
+    log.info("next second")
+    assert lines(stream) == ["[--:--:--] line 0", "[--:--:--] line 1",
+                             "[--:--:--] WARNING: 3 log lines suppressed",
+                             "[--:--:--] WARNING: always shown", "[--:--:--] next second"]
+    assert log.get_stats() == {'lines': 5, 'suppressed': 3}
@@ -0,0 +1,76 @@
+import pytest
+
+from derived_metrics import DerivedMetrics
+
+
+def sample(voltage=50.0, current=10.0, soc=50, stale=()):
+    return {'battery_voltage': voltage, 'battery_current': current, 'battery_soc': soc,
+            'stale_fields': list(stale)}
+
+
+def test_integrates_over_sample_time_not_wall_clock():
+    metrics = DerivedMetrics(capacity_ah=100, smoothing_s=60, max_gap_s=30)
+    # Samples 10 s apart in sample time, delivered back to back (fast replay)
+    for i in range(7):
+        data = metrics.update(sample(), now_ms=i * 10000)
+    assert metrics.charged_ah == pytest.approx(10.0 * 60 / 3600)
+    assert metrics.charged_wh == pytest.approx(500.0 * 60 / 3600)
+    assert data['battery_power'] == 500.0
+    assert data['net_ah'] == pytest.approx(metrics.charged_ah)
+    assert data['time_to_full_min'] == 300
+    assert data['time_to_empty_min'] is None
+
+
+def test_discharge_and_time_to_empty():
+    metrics = DerivedMetrics(capacity_ah=100)
+    metrics.update(sample(current=-20.0), now_ms=0)
+    data = metrics.update(sample(current=-20.0), now_ms=3600)
+    assert metrics.discharged_ah == pytest.approx(20.0 * 3.6 / 3600)
+    assert data['net_ah'] < 0
+    assert data['time_to_empty_min'] == 150
+
+
+def test_gap_is_not_integrated():
+    metrics = DerivedMetrics(max_gap_s=30)
+    metrics.update(sample(), now_ms=0)
+    metrics.update(sample(), now_ms=60000)
+    assert metrics.charged_ah == 0
+    assert metrics.gaps == 1
+
+
+def test_tick_wraparound():
+    metrics = DerivedMetrics()
+    metrics.update(sample(), now_ms=(1 << 30) - 5000)
+    metrics.update(sample(), now_ms=5000)
+    assert metrics.charged_ah == pytest.approx(10.0 * 10 / 3600)
+
+
+def test_missing_values_break_integration():
+    metrics = DerivedMetrics()
+    metrics.update(sample(), now_ms=0)
+    data = metrics.update(sample(voltage=None), now_ms=5000)
+    assert data['battery_power'] is None
+    metrics.update(sample(), now_ms=10000)
+    assert metrics.charged_ah == 0
+
+
+@pytest.mark.parametrize("field", ["battery_voltage", "battery_current"])
+def test_stale_values_are_not_integrated(field):
+    metrics = DerivedMetrics()
+    metrics.update(sample(), now_ms=0)
+    data = metrics.update(sample(stale=[field]), now_ms=5000)
+    metrics.update(sample(stale=[field]), now_ms=10000)
+    assert metrics.charged_ah == 0
+    assert data['battery_power'] == 500.0
+    assert 'battery_power' in data['stale_fields']
+    # Fresh again: integration restarts from the next fresh sample
+    metrics.update(sample(), now_ms=15000)
+    metrics.update(sample(), now_ms=20000)
+    assert metrics.charged_ah == pytest.approx(10.0 * 5 / 3600)
+
+
+def test_stale_temperature_does_not_stop_integration():
+    metrics = DerivedMetrics()
+    metrics.update(sample(), now_ms=0)
+    metrics.update(sample(stale=['battery_temperature']), now_ms=5000)
+    assert metrics.charged_ah == pytest.approx(10.0 * 5 / 3600)
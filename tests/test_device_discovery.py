@@ -0,0 +1,129 @@
+import socket
+import threading
+
+import pytest
+
+import config
+import device_discovery
+from device_discovery import ModbusProber, discover, scan
+from modbus_frames import (MBAP_SIZE, EXC_GATEWAY_TARGET_FAILED, build_exception_response,
+                           build_read_response, parse_mbap, parse_read_request)
+
+
+class RawModbusServer:
+    """
+    Single-port Modbus TCP server on a thread; answer(connection_index,
+    transaction_id, unit_id, function_code, start) returns the bytes to send
+    """
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(4)
+        self.port = self.listener.getsockname()[1]
+        self.connections = 0
+        self.clients = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            index = self.connections
+            self.connections += 1
+            self.clients.append(conn)
+            threading.Thread(target=self._serve, args=(conn, index), daemon=True).start()
+
+    def _serve(self, conn, index):
+        buffer = b''
+        try:
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                buffer += chunk
+                while len(buffer) >= MBAP_SIZE:
+                    transaction_id, pdu_length, unit_id = parse_mbap(buffer[:MBAP_SIZE])
+                    if len(buffer) < MBAP_SIZE + pdu_length:
+                        break
+                    pdu = buffer[MBAP_SIZE:MBAP_SIZE + pdu_length]
+                    buffer = buffer[MBAP_SIZE + pdu_length:]
+                    function_code, start, _ = parse_read_request(pdu)
+                    conn.sendall(self.answer(index, transaction_id, unit_id, function_code, start))
+        except OSError:
+            pass
+
+    def close(self):
+        self.listener.close()
+        for conn in self.clients:
+            conn.close()
+
+
+def installation(transaction_id, unit_id, function_code, start):
+    """System unit 100, one solar charger on 226, nothing else"""
+    if (unit_id, start) in ((100, 840), (226, 776)):
+        return build_read_response(transaction_id, unit_id, function_code, [123])
+    return build_exception_response(transaction_id, unit_id, function_code, EXC_GATEWAY_TARGET_FAILED)
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(answer):
+        servers.append(RawModbusServer(answer))
+        return servers[-1]
+
+    yield start
+    for s in servers:
+        s.close()
+
+
+def test_scan_finds_units(server):
+    srv = server(lambda index, *request: installation(*request))
+    prober = ModbusProber("127.0.0.1", srv.port, timeout_ms=500, window=8)
+    prober.open()
+    units = scan(prober, [100, 225, 226, 227])
+    prober.close()
+    assert units == {'system': [100], 'solarcharger': [226]}
+    assert prober.timeouts == 0
+
+
+@pytest.mark.parametrize("cut", [3, MBAP_SIZE, MBAP_SIZE + 1])
+def test_partial_reply_reopens_connection(server, cut):
+    def answer(index, transaction_id, *request):
+        if index == 0:
+            # Part of a header, a header alone or a cut-off PDU, then silence
+            return installation(transaction_id, *request)[:cut]
+        return installation(transaction_id, *request)
+
+    srv = server(answer)
+    prober = ModbusProber("127.0.0.1", srv.port, timeout_ms=200, window=1)
+    prober.open()
+    assert prober.probe([(100, 840)]) == {(100, 840): None}
+    assert prober.reopens == 1
+    # The next batch runs on a fresh connection and stays aligned
+    assert prober.probe([(100, 840), (226, 776), (227, 31)]) == {
+        (100, 840): True, (226, 776): True, (227, 31): False}
+    prober.close()
+
+
+def test_garbage_header_falls_back_to_default_map(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "DISCOVERY_TIMEOUT_MS", 200)
+    srv = server(lambda index, transaction_id, *request: b'\x00\x01\xff\xff\x00\x03\x64\x00\x00')
+    device_map = discover("127.0.0.1", srv.port, str(tmp_path / "map.json"), [100, 226])
+    assert device_map is None
+
+
+def test_device_map_cached_and_verified(server, tmp_path):
+    srv = server(lambda index, *request: installation(*request))
+    path = str(tmp_path / "map.json")
+    first = discover("127.0.0.1", srv.port, path, [100, 225, 226])
+    assert first['source'] == 'scan'
+    assert first['units'] == {'system': [100], 'solarcharger': [226]}
+    second = discover("127.0.0.1", srv.port, path, [100, 225, 226])
+    assert second['source'] == 'cache'
+    assert device_discovery.load_device_map(path)['units'] == first['units']
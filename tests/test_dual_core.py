@@ -0,0 +1,132 @@
+import json
+import socket
+import threading
+import time
+
+from dual_core import NetworkPoller, SnapshotMailbox
+from http_status import StatusServer
+from supervisor import ACTION_SOCKET, ACTION_WIFI, Supervisor
+
+
+class FakeVictron:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def connect(self):
+        return True
+
+    def read_all_data(self):
+        return {'battery_soc': 80}
+
+    def sample_ms(self):
+        return time.ticks_ms()
+
+    def reset_socket(self):
+        self.calls.append(('socket', threading.get_ident()))
+
+
+class FakeWiFi:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def is_connected(self):
+        return True
+
+    def connect(self, timeout=None):
+        return True
+
+    def reset_link(self):
+        self.calls.append(('wifi', threading.get_ident()))
+
+
+def run_polls(poller, polls):
+    poller.start()
+    try:
+        deadline = time.monotonic() + 5
+        while poller.poll_count < polls and time.monotonic() < deadline:
+            time.sleep(0.005)
+    finally:
+        assert poller.stop(timeout_ms=2000)
+
+
+def test_mailbox_hands_over_latest_snapshot():
+    mailbox = SnapshotMailbox()
+    assert mailbox.latest() == (0, None, None, None)
+    mailbox.publish({'battery_soc': 1}, True)
+    mailbox.publish({'battery_soc': 2}, True)
+    mailbox.set_wifi_connected(False)
+    seq, data, wifi_connected, age_ms = mailbox.latest()
+    assert (seq, data, wifi_connected) == (2, {'battery_soc': 2}, False)
+    assert age_ms >= 0
+
+
+def test_poller_publishes_snapshots():
+    calls = []
+    mailbox = SnapshotMailbox()
+    poller = NetworkPoller(FakeVictron(calls), FakeWiFi(calls), mailbox, poll_ms=10)
+    run_polls(poller, 3)
+    seq, data, wifi_connected, _ = mailbox.latest()
+    assert seq >= 3
+    assert data == {'battery_soc': 80}
+    assert wifi_connected is True
+    assert calls == []
+
+
+def test_status_server_on_core_1_serves_stats_from_core_0(port_range):
+    server = StatusServer(port=port_range(1))
+    server.start()
+    mailbox = SnapshotMailbox()
+    poller = NetworkPoller(FakeVictron([]), None, mailbox, poll_ms=10, status_server=server)
+    # Core 0 builds its stats; the poller thread only serves what was published
+    mailbox.publish_stats({'scheduler': {'overruns': 0}})
+    poller.start()
+    try:
+        deadline = time.monotonic() + 5
+        while poller.poll_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        client = socket.create_connection(("127.0.0.1", server.port), timeout=2)
+        client.sendall(b"GET /stats HTTP/1.0\r\n\r\n")
+        response = b""
+        while True:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            response += chunk
+        client.close()
+    finally:
+        assert poller.stop(timeout_ms=2000)
+        server.close()
+    stats = json.loads(response.partition(b"\r\n\r\n")[2])
+    assert stats['scheduler'] == {'overruns': 0}
+    assert stats['poller']['poll_count'] >= 1
+    assert stats['http']['updates'] >= 1
+
+
+def test_supervisor_resets_run_on_the_poller_thread():
+    calls = []
+    victron = FakeVictron(calls)
+    poller = NetworkPoller(victron, FakeWiFi(calls), SnapshotMailbox(), poll_ms=10)
+    supervisor = Supervisor(budgets={'modbus': 100}, wdt_ms=0, log_file='',
+                            actions={ACTION_SOCKET: poller.request_socket_reset,
+                                     ACTION_WIFI: poller.request_wifi_reset})
+
+    # Escalation from the Timer (here: this thread) only queues the reset
+    supervisor._escalate(0, time.ticks_ms())
+    supervisor._escalate(0, time.ticks_ms())
+    assert [entry['result'] for entry in supervisor.log] == ['queued', 'queued']
+    assert calls == []
+
+    run_polls(poller, 1)
+    main = threading.get_ident()
+    # The WiFi reset covers the socket; both ran once, off the calling thread
+    assert [name for name, _ in calls] == ['wifi', 'socket']
+    assert all(ident != main for _, ident in calls)
+    assert poller.get_stats()['resets'] == 1
+
+
+def test_socket_reset_without_wifi():
+    calls = []
+    poller = NetworkPoller(FakeVictron(calls), None, SnapshotMailbox(), poll_ms=10)
+    poller.request_socket_reset()
+    run_polls(poller, 2)
+    assert [name for name, _ in calls] == ['socket']
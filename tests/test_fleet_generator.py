@@ -0,0 +1,97 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fleet_generator import (FAULT_FROZEN, FAULT_OFFLINE, FAULT_SPIKE, UNIT_FIELDS,  # noqa: E402
+                             FleetRegisterSource, encode_columns)
+from modbus_simulator import encode_value  # noqa: E402
+from victron_client import VictronClient  # noqa: E402
+
+SYSTEM = VictronClient.UNIT_ID_SYSTEM
+SOLAR = VictronClient.UNIT_ID_SOLAR
+
+
+class Clock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make(sites=50, **kwargs):
+    clock = Clock()
+    return FleetRegisterSource(sites, seed=1, clock=clock, **kwargs), clock
+
+
+def test_encode_columns_matches_scalar_encoding():
+    fields = VictronClient.BATTERY_FIELDS
+    values = {'battery_voltage': np.array([52.31, 0.0, 7000.0]),
+              'battery_current': np.array([-12.5, 3.3, -4000.0]),
+              'battery_soc': np.array([87.0, 20.0, 100.0])}
+    image = encode_columns(values, fields)
+    for site in range(3):
+        for column, (name, _, scale, signed) in enumerate(fields):
+            assert image[site, column] == encode_value(values[name][site], scale, signed)
+
+
+def test_registers_decode_like_a_cerbo():
+    source, _ = make()
+    for site in range(source.sites):
+        raw = source.read(site, SYSTEM, 840, 4)
+        data = VictronClient.decode_fields(raw, 840, VictronClient.BATTERY_FIELDS)
+        assert 47.9 <= data['battery_voltage'] <= 52.1
+        assert -15.1 <= data['battery_current'] <= 25.1
+        assert 20 <= data['battery_soc'] <= 95
+        raw = source.read(site, SOLAR, 771, 20)
+        assert len(raw) == 20
+        assert VictronClient.decode_fields(raw, 771, VictronClient.SOLAR_FIELDS)['pv_power'] >= 0
+
+
+def test_read_contract():
+    source, _ = make(extended=False)
+    assert source.read(0, SOLAR, 771, 20) is None
+    assert source.read(0, SYSTEM, 1000, 2) == []
+    assert source.read(0, SYSTEM, 841, 3)[1] == 0  # Unmapped register inside a mapped range
+
+
+def test_image_reused_until_refresh_interval():
+    source, clock = make(refresh_ms=100)
+    first = source.read(3, SYSTEM, 840, 4)
+    clock.now += 0.05
+    assert source.read(3, SYSTEM, 840, 4) == first
+    assert source.refreshes == 1
+    clock.now += 30
+    source.read(3, SYSTEM, 840, 4)
+    assert source.refreshes == 2
+
+
+def test_same_seed_same_fleet():
+    a, _ = make(noise=0.05)
+    b, _ = make(noise=0.05)
+    assert a.read(7, SOLAR, 771, 20) == b.read(7, SOLAR, 771, 20)
+
+
+def test_faults():
+    source, clock = make(sites=400, fault_rate=1.0, fault_s=1000.0)
+    before = {site: source.read(site, SYSTEM, 840, 4) for site in range(source.sites)}
+    clock.now += 1.0
+    source.refresh()
+    stats = source.get_stats()
+    assert stats['faults_started'] == source.sites
+    assert stats['faulted_offline'] + stats['faulted_frozen'] + stats['faulted_spike'] == source.sites
+    fault = source.fault
+    for site in range(source.sites):
+        values = source.read(site, SYSTEM, 840, 4)
+        if fault[site] == FAULT_OFFLINE:
+            assert values is None
+        elif fault[site] == FAULT_FROZEN:
+            assert values == before[site]
+        else:
+            assert fault[site] == FAULT_SPIKE
+            assert values[0] == 0
+
+
+def test_fields_cover_the_client_blocks():
+    registers = {register for _, register, _, _ in UNIT_FIELDS[SYSTEM]}
+    assert {840, 841, 843, VictronClient.TEMPERATURE_REGISTER} <= registers
@@ -0,0 +1,49 @@
+import asyncio
+
+from gateway import Gateway, Site
+from modbus_simulator import DemoRegisterSource, ModbusSimulator
+
+
+def run_gateway(base_port, endpoints, interval, duration, deadline, on_cycle=None, **simulator_args):
+    async def scenario():
+        simulator = ModbusSimulator(DemoRegisterSource(endpoints), endpoints, base_port=base_port,
+                                    **simulator_args)
+        await simulator.start()
+        sites = [Site(f"sim{i}", "127.0.0.1", base_port + i, extended=True) for i in range(endpoints)]
+        gateway = Gateway(sites, deadline=deadline)
+        try:
+            await gateway.run(interval, duration, on_cycle)
+        finally:
+            gateway.close()
+            await simulator.close()
+        return gateway
+
+    return asyncio.run(scenario())
+
+
+def test_healthy_sites_poll_at_their_interval(port_range):
+    gateway = run_gateway(port_range(3), 3, interval=0.1, duration=1.0, deadline=0.5)
+    assert gateway.timeouts == 0
+    assert gateway.samples >= 3 * 8
+    assert all(data is not None for data in gateway.latest)
+    assert gateway.latest[0]['battery_voltage'] > 0
+
+
+def test_dead_and_late_sites_do_not_delay_healthy_sites(port_range):
+    # Sites 0-1 healthy, 2 late (answers after the deadline), 3 dead
+    gateway = run_gateway(port_range(4), 4, interval=0.1, duration=1.5, deadline=0.3,
+                          dead=1, late=1, late_ms=1000)
+    # A shared cycle would wait out the deadline: at most 5 polls per site
+    assert gateway.samples >= 2 * 12
+    assert gateway.timeouts >= 2 * 3
+    assert gateway.latest[0] is not None and gateway.latest[1] is not None
+    assert gateway.latest[2] is None and gateway.latest[3] is None
+
+
+def test_on_cycle_reports_latest_result_per_site(port_range):
+    reports = []
+    run_gateway(port_range(2), 2, interval=1, duration=2.5, deadline=0.3, on_cycle=reports.append, dead=1)
+    assert len(reports) == 2
+    (site0, data0), (site1, data1) = reports[-1]
+    assert site0.name == "sim0" and data0 is not None
+    assert site1.name == "sim1" and data1 is None
@@ -0,0 +1,31 @@
+from history import History
+
+
+def test_sample_ring_keeps_newest():
+    history = History(samples=3, rollup_s=60, rollups=4)
+    for i in range(5):
+        history.add({'battery_soc': 50 + i, 'battery_voltage': None}, now_ms=i * 1000)
+    samples = history.samples(now_ms=5000)
+    assert samples['battery_soc'] == [52, 53, 54]
+    assert samples['battery_voltage'] == [None, None, None]
+    assert samples['age_s'] == [3, 2, 1]
+    assert history.total_samples == 5
+
+
+def test_rollups_min_max_avg():
+    history = History(samples=10, rollup_s=10, rollups=2)
+    for t, soc in ((0, 50), (5000, 60), (10000, 70), (15000, 80), (20000, 90)):
+        history.add({'battery_soc': soc}, now_ms=t)
+    summary = history.rollup_summary(now_ms=25000)
+    assert summary['period_s'] == 10
+    assert summary['age_s'] == [25, 15]
+    assert summary['battery_soc'] == {'min': [50, 70], 'max': [60, 80], 'avg': [55, 75]}
+    # Fields without values stay empty
+    assert summary['battery_current']['avg'] == [None, None]
+
+
+def test_rollup_ring_drops_oldest_period():
+    history = History(samples=10, rollup_s=1, rollups=2)
+    for t in range(4):
+        history.add({'battery_soc': t}, now_ms=t * 1000)
+    assert history.rollup_summary(now_ms=4000)['battery_soc']['avg'] == [1, 2]
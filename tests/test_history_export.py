@@ -0,0 +1,205 @@
+import binascii
+import math
+import os
+import random
+import struct
+import time
+
+import pytest
+
+from history import FIELDS, History
+from history_export import FRAME_HEADER, KIND_DATA, MAGIC, SOURCE_SAMPLES, HistoryExporter
+from history_pull import FrameReader, PullError, pull, records
+from sample_log import RECORD_SIZE, SampleLog
+
+
+class PipeStdin:
+    """Command side of the exporter: an unbuffered pipe like the device's stdin"""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+
+    def fileno(self):
+        return self.read_fd
+
+    def read(self, n=1):
+        return os.read(self.read_fd, n).decode()
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class Output:
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+
+class LoopbackTransport:
+    """Runs the exporter in-process, one poll() per read, like the main loop"""
+
+    def __init__(self, exporter, stdin, output, console=b''):
+        self.exporter = exporter
+        self.stdin = stdin
+        self.output = output
+        self.console = console
+
+    def write(self, data):
+        os.write(self.stdin.write_fd, data)
+
+    def read(self, timeout):
+        self.exporter.poll()
+        data = bytes(self.output.data)
+        self.output.data.clear()
+        return self.console + data if data else data
+
+
+def make_log(tmp_path, records, segment_records=20):
+    log = SampleLog(str(tmp_path / "log"), segment_records=segment_records, segments=100,
+                    buffer_records=7)
+    for i in range(records):
+        log.add({'battery_voltage': 50 + i * 0.01, 'battery_soc': i % 100})
+    log.flush()
+    return log
+
+
+def log_bytes(log):
+    data = b''
+    for number in log.segments():
+        with open(log.segment_path(number), 'rb') as f:
+            data += f.read()
+    return data
+
+
+@pytest.fixture
+def loopback():
+    pipes = []
+
+    def make(sample_log=None, history=None, chunk_bytes=3 * RECORD_SIZE, console=b''):
+        stdin = PipeStdin()
+        pipes.append(stdin)
+        output = Output()
+        exporter = HistoryExporter(sample_log, history, chunk_bytes=chunk_bytes, slice_ms=5,
+                                   stdin=stdin, stdout=output)
+        return LoopbackTransport(exporter, stdin, output, console)
+
+    yield make
+    for stdin in pipes:
+        stdin.close()
+
+
+def test_pull_whole_log(tmp_path, loopback):
+    log = make_log(tmp_path, 130)
+    header, data, stats = pull(loopback(log, console=b"console line\n"), timeout_s=0.5)
+    assert data == log_bytes(log)
+    assert header['records'] == 130
+    assert header['fields'] == list(FIELDS)
+    assert stats['resumes'] == 0
+    assert stats['skipped_bytes'] > 0
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_pull_with_dropped_chunks_is_complete(tmp_path, loopback, seed):
+    # Single-chunk segments and lost final chunks are the cases that used to slip through
+    log = make_log(tmp_path, 130, segment_records=3)
+    random.seed(seed)
+    header, data, stats = pull(loopback(log), timeout_s=0.5, retries=50, drop_rate=0.3)
+    assert stats['dropped'] > 0
+    assert data == log_bytes(log)
+
+
+def filtered(transport, keep):
+    """Wrap transport.read so the first data passes only the frames keep(frames) picks"""
+    read = transport.read
+    first = [True]
+
+    def read_filtered(timeout):
+        data = read(timeout)
+        if data and first[0]:
+            first[0] = False
+            data = b''.join(rebuild(*frame) for frame in keep(FrameReader().feed(data)))
+        return data
+
+    transport.read = read_filtered
+    return transport
+
+
+def test_end_before_last_chunk_resumes(tmp_path, loopback):
+    log = make_log(tmp_path, 12, segment_records=6)
+
+    def drop_last_data(frames):
+        last = max(i for i, frame in enumerate(frames) if frame[0] == KIND_DATA)
+        return frames[:last] + frames[last + 1:]
+
+    header, data, stats = pull(filtered(loopback(log), drop_last_data), timeout_s=0.5)
+    assert stats['incomplete'] == 1
+    assert data == log_bytes(log)
+
+
+def test_resume_into_rotated_segment_continues_with_next(tmp_path, loopback):
+    log = make_log(tmp_path, 30, segment_records=5)
+    expected = log_bytes(log)[:3 * RECORD_SIZE]
+
+    def rotate_and_drop(frames):
+        # Header, chunk 0 of segment 0, then skip to segment 1: the host resumes
+        # at segment 0 chunk 1, which is rotated out before the resume arrives
+        for number in log.segments()[:3]:
+            os.remove(log.segment_path(number))
+        header, first = frames[:2]
+        jump = next(frame for frame in frames if frame[0] == KIND_DATA and frame[2] == 1)
+        return [header, first, jump]
+
+    header, data, stats = pull(filtered(loopback(log), rotate_and_drop), timeout_s=0.5)
+    assert stats['lost_segments']
+    assert stats['rejected'] == 1
+    assert data == expected + log_bytes(log)
+
+
+def test_pull_samples(loopback):
+    history = History(samples=10)
+    for i in range(15):
+        history.add({'battery_voltage': 50.0 + i, 'battery_soc': 60})
+    header, data, stats = pull(loopback(history=history), source=SOURCE_SAMPLES, timeout_s=0.5)
+    times, boots, columns = records(header, data)
+    assert len(times) == 10
+    voltage = columns[header['fields'].index('battery_voltage')]
+    assert voltage == [55.0 + i for i in range(10)]
+
+
+def test_boot_counter_increments(tmp_path):
+    directory = str(tmp_path / "log")
+    assert [SampleLog(directory).boot for _ in range(3)] == [0, 1, 2]
+    assert SampleLog(directory, clock_synced=True).get_stats()['boot'] == 3
+
+
+def test_records_of_earlier_boots(tmp_path, loopback):
+    directory = str(tmp_path / "log")
+    for synced in (False, True, False):
+        log = SampleLog(directory, segment_records=4, segments=100, buffer_records=2,
+                        clock_synced=synced)
+        for i in range(5):
+            log.add({'battery_soc': 50})
+        log.flush()
+    header, data, stats = pull(loopback(log), timeout_s=0.5)
+    assert header['boot'] == 2
+    times, boots, columns = records(header, data)
+    assert boots == [0] * 5 + [1] * 5 + [2] * 5
+    # Unsynced earlier boot: its RTC started over, so no time
+    assert all(math.isnan(t) for t in times[:5])
+    # Synced earlier boot and the running boot: real times
+    for t in times[5:]:
+        assert abs(t - time.time()) < 60
+
+
+def test_unavailable_source_is_an_error(loopback, tmp_path):
+    with pytest.raises(PullError):
+        pull(loopback(make_log(tmp_path, 1)), source=SOURCE_SAMPLES, timeout_s=0.5)
+
+
+def rebuild(kind, flags, segment, chunk, payload):
+    frame = struct.pack(FRAME_HEADER, MAGIC, kind, flags, segment, chunk, len(payload)) + payload
+    return frame + struct.pack('<I', binascii.crc32(frame))
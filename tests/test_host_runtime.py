@@ -0,0 +1,60 @@
+import time
+
+import machine
+import network
+import pytest
+
+import host_runtime
+from wifi_manager import WiFiManager
+
+
+def test_ticks_wrap_like_micropython():
+    top = host_runtime.TICKS_MAX
+    assert time.ticks_add(top, 1) == 0
+    assert time.ticks_diff(5, top - 4) == 10
+    assert time.ticks_diff(top - 4, 5) == -10
+    assert 0 <= time.ticks_ms() <= top
+
+
+def test_uart_file_backend(tmp_path):
+    path = str(tmp_path / "uart1.bin")
+    machine.configure_uart(1, path)
+    try:
+        uart = machine.UART(1, baudrate=115200)
+        assert uart.write(b"BATTERY:75\n") == 11
+        uart.deinit()
+    finally:
+        machine.configure_uart(1, "pty")
+    with open(path, "rb") as f:
+        assert f.read() == b"BATTERY:75\n"
+
+
+def test_uart_null_backend():
+    machine.configure_uart(1, "null")
+    try:
+        uart = machine.UART(1)
+        assert uart.write(b"x" * 100) == 100
+        assert uart.any() == 0
+    finally:
+        machine.configure_uart(1, "pty")
+
+
+@pytest.fixture
+def link():
+    yield network.simulate_link
+    network.simulate_link(True)
+
+
+def test_wlan_link_drop_and_reconnect(link, monkeypatch):
+    monkeypatch.setattr(network, "ASSOCIATE_DELAY", 0)
+    wifi = WiFiManager()
+    assert wifi.connect(timeout=1)
+    link(False)
+    assert not wifi.is_connected()
+    assert not wifi.connect(timeout=0)
+    link(True)
+    assert wifi.connect(timeout=1)
+    wifi.reset_link()
+    assert not wifi.is_connected()
+    assert wifi.wlan.active()
+
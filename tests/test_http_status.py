@@ -0,0 +1,114 @@
+import json
+import socket
+import time
+
+import pytest
+
+from history import History
+from http_status import StatusServer
+
+
+@pytest.fixture
+def server(port_range):
+    server = StatusServer(port=port_range(1), timeout_ms=300)
+    server.start()
+    yield server
+    server.close()
+
+
+def fetch(server, request):
+    """Send a raw request and poll the server until it closes the connection"""
+    client = socket.create_connection(("127.0.0.1", server.port), timeout=1)
+    client.sendall(request)
+    client.settimeout(0.01)
+    response = b""
+    deadline = time.monotonic() + 2
+    while time.monotonic() < deadline:
+        server.poll()
+        try:
+            chunk = client.recv(4096)
+        except socket.timeout:
+            continue
+        if not chunk:
+            break
+        response += chunk
+    client.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return head.split(b"\r\n")[0], body
+
+
+def get(server, path):
+    return fetch(server, b"GET " + path + b" HTTP/1.0\r\nHost: pico\r\n\r\n")
+
+
+def test_not_ready_before_first_update(server):
+    assert get(server, b"/status")[0] == b"HTTP/1.0 503 Service Unavailable"
+
+
+def test_serves_cached_snapshot(server):
+    server.update({'battery_soc': 87}, {'client': {'polls': 3}})
+    status, body = get(server, b"/status?pretty=1")
+    assert status == b"HTTP/1.0 200 OK"
+    assert json.loads(body) == {'battery_soc': 87}
+    assert json.loads(get(server, b"/")[1]) == {'battery_soc': 87}
+    assert json.loads(get(server, b"/stats")[1]) == {'client': {'polls': 3}}
+    # Later requests see the next update only
+    server.update({'battery_soc': 88})
+    assert json.loads(get(server, b"/status")[1]) == {'battery_soc': 88}
+    assert server.get_stats()['requests'] == 4
+
+
+def test_history(server):
+    history = History(samples=10)
+    history.add({'battery_soc': 50})
+    server.update({'battery_soc': 50}, history=history)
+    body = json.loads(get(server, b"/history")[1])
+    assert set(body) == {'samples', 'rollups'}
+
+
+def test_stats_and_history_serialized_on_first_request_only(server):
+    history = History(samples=10)
+    calls = []
+    samples = history.samples
+    history.samples = lambda: calls.append('history') or samples()
+
+    def stats():
+        calls.append('stats')
+        return {'client': {'polls': len(calls)}}
+
+    for soc in range(5):
+        history.add({'battery_soc': soc})
+        server.update({'battery_soc': soc}, stats, history)
+    assert calls == []
+
+    assert json.loads(get(server, b"/stats")[1]) == {'client': {'polls': 1}}
+    get(server, b"/stats")
+    get(server, b"/history")
+    get(server, b"/history")
+    assert calls == ['stats', 'history']
+    assert server.get_stats()['serializations'] == 2
+
+    # The next update drops both; the next request serializes them again
+    server.update({'battery_soc': 5}, stats, history)
+    assert len(json.loads(get(server, b"/history")[1])['samples']['age_s']) == 5
+    assert calls == ['stats', 'history', 'history']
+
+
+def test_unknown_path_and_method(server):
+    server.update({})
+    assert get(server, b"/nope")[0] == b"HTTP/1.0 404 Not Found"
+    assert fetch(server, b"POST /status HTTP/1.0\r\n\r\n")[0] == b"HTTP/1.0 404 Not Found"
+
+
+def test_idle_client_dropped(server):
+    server.update({})
+    client = socket.create_connection(("127.0.0.1", server.port), timeout=1)
+    client.sendall(b"GET /sta")
+    deadline = time.monotonic() + 2
+    while server.get_stats()['dropped'] == 0 and time.monotonic() < deadline:
+        server.poll()
+        time.sleep(0.01)
+    client.close()
+    stats = server.get_stats()
+    assert stats['dropped'] == 1
+    assert stats['open'] == 0
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from image_stream import BYTES_PER_PIXEL, FlashImageSource, export_image
+
+WIDTH = 8
+HEIGHT = 6
+
+
+def make_image(path):
+    image = bytes(i & 0xFF for i in range(WIDTH * HEIGHT * BYTES_PER_PIXEL))
+    export_image(image, str(path), chunk_size=7)
+    return image
+
+
+def test_export_writes_image(tmp_path):
+    path = tmp_path / "bg.raw"
+    image = make_image(path)
+    assert path.read_bytes() == image
+    assert [p.name for p in tmp_path.iterdir()] == ["bg.raw"]
+
+
+def test_export_replaces_file_only_when_complete(tmp_path, monkeypatch):
+    path = tmp_path / "bg.raw"
+    path.write_bytes(b"\x00" * 10)
+
+    def reset(*args):
+        raise KeyboardInterrupt
+
+    # Reset before the rename: the old file is untouched
+    monkeypatch.setattr(os, "rename", reset)
+    with pytest.raises(KeyboardInterrupt):
+        make_image(path)
+    monkeypatch.undo()
+    assert path.read_bytes() == b"\x00" * 10
+
+    image = make_image(path)
+    assert path.read_bytes() == image
+    assert not (tmp_path / "bg.raw.tmp").exists()
+
+
+def test_wrong_size_rejected(tmp_path):
+    path = tmp_path / "bg.raw"
+    path.write_bytes(b"\x00" * 10)
+    with pytest.raises(ValueError):
+        FlashImageSource(str(path), WIDTH, HEIGHT)
+
+
+@pytest.mark.parametrize("cache_rows", [None, (2, 4)])
+def test_blit_rows_matches_image(tmp_path, cache_rows):
+    path = tmp_path / "bg.raw"
+    image = make_image(path)
+    source = FlashImageSource(str(path), WIDTH, HEIGHT, chunk_rows=4, cache_rows=cache_rows)
+    framebuffer = bytearray(len(image))
+    source.blit_rows(framebuffer)
+    source.close()
+    assert framebuffer == image
+    stats = source.get_stats()
+    assert stats['bytes_streamed'] + stats['bytes_from_cache'] == len(image)
+    if cache_rows:
+        assert stats['bytes_from_cache'] == 2 * WIDTH * BYTES_PER_PIXEL
+
+
+def test_blit_rect_only_touches_region(tmp_path):
+    path = tmp_path / "bg.raw"
+    image = make_image(path)
+    source = FlashImageSource(str(path), WIDTH, HEIGHT, cache_rows=(1, 2))
+    framebuffer = bytearray(b"\xff" * len(image))
+    source.blit_rect(framebuffer, 2, 1, 3, 2)
+    source.close()
+
+    row_bytes = WIDTH * BYTES_PER_PIXEL
+    for y in range(HEIGHT):
+        for x in range(WIDTH):
+            i = y * row_bytes + x * BYTES_PER_PIXEL
+            inside = 2 <= x < 5 and 1 <= y < 3
+            expected = image[i:i + 2] if inside else b"\xff\xff"
+            assert framebuffer[i:i + 2] == expected, (x, y)
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+from output_fanout import (FRAME_SIZE, PROTOCOL_BINARY, PROTOCOL_TEXT, BinaryEncoder,
+                           OutputFanout, StreamSink, decode_binary, encode_text, make_sink)
+
+DATA = {'battery_soc': 87, 'battery_voltage': 52.31, 'battery_current': -12.5,
+        'battery_temperature': 21.4, 'charging_state': 0, 'pv_power': 240.5, 'ac_load': None,
+        'battery_power': -653.9, 'stale_fields': ['ac_load']}
+
+
+class Stream:
+    """Byte stream taking at most limit bytes per write (None = all)"""
+
+    def __init__(self, limit=None):
+        self.data = bytearray()
+        self.limit = limit
+
+    def write(self, buf):
+        n = len(buf) if self.limit is None else min(self.limit, len(buf))
+        self.data += bytes(buf[:n])
+        return n
+
+
+def test_binary_round_trip():
+    frame = BinaryEncoder().encode(DATA, 2, True)
+    assert len(frame) == FRAME_SIZE
+    decoded = decode_binary(bytes(frame))
+    assert decoded['seq'] == 0
+    assert decoded['battery_soc'] == 87.0
+    assert decoded['battery_voltage'] == pytest.approx(52.31)
+    assert decoded['battery_current'] == pytest.approx(-12.5)
+    assert decoded['battery_temperature'] == pytest.approx(21.4)
+    assert decoded['charging_state'] == 0
+    assert (decoded['wifi_status'], decoded['demo_mode'], decoded['stale']) == (2, True, True)
+    assert decoded['pv_power'] == 240
+    assert decoded['ac_load'] is None
+    assert decoded['battery_power'] == -653
+
+
+def test_binary_missing_values_and_sequence():
+    encoder = BinaryEncoder()
+    encoder.encode(DATA, 1, False)
+    empty = dict.fromkeys(('battery_soc', 'battery_voltage', 'battery_current',
+                           'battery_temperature', 'charging_state'))
+    decoded = decode_binary(bytes(encoder.encode(empty, 0, False)))
+    assert decoded['seq'] == 1
+    assert all(decoded[name] is None for name in empty)
+    assert decoded['battery_power'] is None
+    assert not decoded['stale']
+
+
+def test_binary_corruption_detected():
+    frame = bytearray(BinaryEncoder().encode(DATA, 1, False))
+    frame[8] ^= 0x01
+    with pytest.raises(ValueError):
+        decode_binary(frame)
+    with pytest.raises(ValueError):
+        decode_binary(frame[:-1])
+
+
+def test_text_lines():
+    assert encode_text(DATA, 1, False) == (b"BATTERY:87\nBATSYS:52.3,-12.5,21.4\nCHARGING:0\n"
+                                           b"WIFI:1\nDEMO:0\n")
+
+
+def test_encoded_once_per_protocol():
+    streams = [Stream() for _ in range(4)]
+    protocols = [PROTOCOL_TEXT, PROTOCOL_BINARY, PROTOCOL_TEXT, PROTOCOL_BINARY]
+    fanout = OutputFanout([StreamSink(stream, name=f"s{i}", protocol=protocol)
+                           for i, (stream, protocol) in enumerate(zip(streams, protocols))])
+    assert fanout.publish(DATA, 1, False) == 4
+    assert fanout.get_stats()['encodes'] == {PROTOCOL_TEXT: 1, PROTOCOL_BINARY: 1}
+    assert streams[0].data == streams[2].data == encode_text(DATA, 1, False)
+    assert streams[1].data == streams[3].data
+    assert decode_binary(streams[1].data)['battery_soc'] == 87.0
+
+
+def test_busy_sink_skips_snapshot():
+    stream = Stream(limit=10)
+    sink = StreamSink(stream, protocol=PROTOCOL_BINARY)
+    fanout = OutputFanout([sink])
+    assert fanout.publish(DATA, 1, False) == 1
+    assert fanout.publish(DATA, 1, False) == 0
+    # The first frame is finished before the next one starts
+    for _ in range(FRAME_SIZE // 10):
+        fanout.poll()
+    assert fanout.publish(DATA, 1, False) == 1
+    assert decode_binary(stream.data[:FRAME_SIZE])['seq'] == 0
+    stats = sink.get_stats()
+    assert (stats['frames'], stats['busy'], stats['short_writes']) == (2, 1, 2)
+
+
+def test_rate_limit(monkeypatch):
+    now = [1000]
+    monkeypatch.setattr(time, "ticks_ms", lambda: now[0])
+    sink = StreamSink(Stream(), min_interval_ms=500)
+    fanout = OutputFanout([sink])
+    sent = []
+    for _ in range(6):
+        sent.append(fanout.publish(DATA, 1, False))
+        now[0] += 200
+    assert sent == [1, 0, 0, 1, 0, 0]
+    assert sink.get_stats()['rate_limited'] == 4
+
+
+def test_file_sink(tmp_path):
+    path = tmp_path / "out.bin"
+    fanout = OutputFanout([make_sink({'type': 'file', 'path': str(path), 'protocol': 'binary'})])
+    fanout.publish(DATA, 1, False)
+    fanout.publish(DATA, 1, False)
+    fanout.close()
+    data = path.read_bytes()
+    assert [decode_binary(data[i:i + FRAME_SIZE])['seq'] for i in (0, FRAME_SIZE)] == [0, 1]
+
+
+@pytest.mark.parametrize("spec", [{'type': 'can'}, {'type': 'usb', 'protocol': 'json'}])
+def test_invalid_sink(spec):
+    with pytest.raises(ValueError):
+        make_sink(spec)
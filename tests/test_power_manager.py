@@ -0,0 +1,64 @@
+import time
+
+import machine
+import network
+import pytest
+
+from power_manager import SLEEP_IDLE, SLEEP_LIGHTSLEEP, PowerManager
+
+
+class FakeClock:
+    def __init__(self, now=1000):
+        self.now = now
+        self.sleeps = []
+
+    def ticks_ms(self):
+        return self.now
+
+    def sleep_ms(self, ms):
+        self.sleeps.append(('idle', ms))
+        self.now += ms
+
+    def lightsleep(self, ms):
+        self.sleeps.append(('lightsleep', ms))
+        self.now += ms
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "ticks_ms", clock.ticks_ms)
+    monkeypatch.setattr(time, "sleep_ms", clock.sleep_ms)
+    monkeypatch.setattr(machine, "lightsleep", clock.lightsleep)
+    return clock
+
+
+def test_duty_cycle_accounting(clock):
+    power = PowerManager(SLEEP_LIGHTSLEEP, min_lightsleep_ms=20)
+    clock.now += 300  # Active window
+    power.sleep_ms(9700)
+    clock.now += 500
+    power.sleep_ms(10)
+    assert clock.sleeps == [('lightsleep', 9700), ('idle', 10)]
+    stats = power.get_stats()
+    assert stats['cycles'] == 2
+    assert (stats['active_ms'], stats['idle_ms']) == (800, 9710)
+    assert (stats['last_active_ms'], stats['last_idle_ms'], stats['max_active_ms']) == (500, 10, 500)
+    assert stats['duty_cycle'] == pytest.approx(800 / 10510)
+
+
+def test_idle_mode_never_lightsleeps(clock):
+    power = PowerManager(SLEEP_IDLE)
+    power.sleep_ms(5000)
+    assert clock.sleeps == [('idle', 5000)]
+
+
+def test_unknown_sleep_mode():
+    with pytest.raises(ValueError):
+        PowerManager('deepsleep')
+
+
+def test_wlan_power_save():
+    wlan = network.WLAN(network.STA_IF)
+    assert PowerManager(SLEEP_IDLE).configure_wlan(wlan)
+    assert wlan.config('pm') == network.WLAN.PM_POWERSAVE
@@ -0,0 +1,88 @@
+import pytest
+
+import config
+from register_client import RegisterClient
+
+UNIT = 100
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, "REGISTER_CACHE_DEFAULT_TTL_MS", 500)
+    monkeypatch.setattr(config, "REGISTER_CACHE_TTL_MS", {61: 10000, (UNIT, 843): 0})
+    monkeypatch.setattr(config, "REGISTER_CACHE_MAX_ENTRIES", 8)
+    registers = {(UNIT, register): register for register in range(830, 850)}
+    registers[(UNIT, 61)] = 29815
+    return RegisterClient(registers)
+
+
+def test_repeated_read_within_ttl_is_a_hit(client):
+    assert client.read_input_register(840, 2) == [840, 841]
+    client.now += 500
+    assert client.read_input_register(840, 2) == [840, 841]
+    assert len(client.requests) == 1
+    client.now += 1
+    client.read_input_register(840, 2)
+    assert len(client.requests) == 2
+    stats = client.get_cache_stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+
+def test_block_read_serves_single_registers(client):
+    client.read_input_register(840, 3)
+    assert client.read_input_register(841) == [841]
+    assert len(client.requests) == 1
+    # Partly cached ranges go to the network
+    client.read_input_register(841, 3)
+    assert len(client.requests) == 2
+
+
+def test_per_register_ttls(client):
+    client.read_input_register(61)
+    client.now += 5000
+    client.read_input_register(61)
+    assert len(client.requests) == 1
+    # TTL 0 for (unit, register) disables caching of that register only
+    client.read_input_register(843)
+    client.read_input_register(843)
+    assert len(client.requests) == 3
+
+
+def test_oldest_entry_evicted_at_max_entries(client):
+    for register in range(830, 838):
+        client.read_input_register(register)
+        client.now += 10
+    client.read_input_register(838)
+    stats = client.get_cache_stats()
+    assert stats['entries'] == 8
+    assert stats['evictions'] == 1
+    requests = len(client.requests)
+    client.read_input_register(830)
+    assert len(client.requests) == requests + 1
+
+
+def test_expired_entries_evicted_first(client):
+    for register in range(830, 838):
+        client.read_input_register(register)
+    client.now += 501
+    client.read_input_register(838)
+    assert client.get_cache_stats()['entries'] == 1
+
+
+def test_disabled_cache_always_reads(client):
+    client.cache_default_ttl_ms = 0
+    client.cache_ttls = {}
+    client.read_input_register(840)
+    client.read_input_register(840)
+    assert len(client.requests) == 2
+    assert client.get_cache_stats()['entries'] == 0
+
+
+def test_input_and_holding_reads_cached_apart(client):
+    client.read_input_register(840)
+    client.read_holding_register(840)
+    assert len(client.requests) == 2
+    client.read_holding_register(840)
+    client.read_input_register(840)
+    assert len(client.requests) == 2
+    assert client.get_cache_stats()['entries'] == 2
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from scheduler import POLICY_CATCH_UP, POLICY_SKIP, FixedRateScheduler
+
+
+class FakeClock:
+    def __init__(self, now=1000):
+        self.now = now
+
+    def ticks_ms(self):
+        return self.now
+
+    def sleep_ms(self, ms):
+        self.now += ms
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "ticks_ms", clock.ticks_ms)
+    return clock
+
+
+def make(clock, policy=POLICY_SKIP):
+    scheduler = FixedRateScheduler(100, policy, max_catch_up=3, sleep_ms=clock.sleep_ms)
+    scheduler.start()
+    return scheduler
+
+
+def test_sleeps_to_absolute_deadlines(clock):
+    scheduler = make(clock)
+    clock.now += 30  # Work
+    scheduler.wait()
+    assert clock.now == 1100
+    clock.now += 70
+    scheduler.wait()
+    assert clock.now == 1200
+    stats = scheduler.get_stats()
+    assert stats['overruns'] == 0 and stats['jitter_max_ms'] == 0
+
+
+def test_cycle_ending_on_its_deadline_is_not_an_overrun(clock):
+    scheduler = make(clock)
+    clock.now += 100
+    assert scheduler.wait() == 0
+    assert scheduler.get_stats()['overruns'] == 0
+    clock.now += 50
+    scheduler.wait()
+    assert clock.now == 1200
+
+
+def test_skip_realigns_to_grid(clock):
+    scheduler = make(clock)
+    clock.now += 350  # Deadline 1100 missed by 250 ms
+    assert scheduler.wait() == 2
+    stats = scheduler.get_stats()
+    assert stats['overruns'] == 1 and stats['skipped'] == 2
+    assert stats['jitter_last_ms'] == 250
+    scheduler.wait()
+    assert clock.now == 1400
+
+
+def test_catch_up_backlog_is_not_counted_again(clock):
+    scheduler = make(clock, POLICY_CATCH_UP)
+    clock.now += 350  # Deadlines 1100, 1200, 1300 missed
+    assert scheduler.wait() == 2
+    # The two missed slots run back to back without sleeping
+    assert scheduler.wait() == 0
+    assert scheduler.wait() == 0
+    assert clock.now == 1350
+    scheduler.wait()
+    assert clock.now == 1400
+    stats = scheduler.get_stats()
+    assert stats['overruns'] == 1
+    assert stats['skipped'] == 0
+    assert stats['cycles'] == 4
+    assert stats['jitter_max_ms'] == 250
+    # Jitter mean over the two measured wakeups (250 ms late, then on time)
+    assert stats['jitter_mean_ms'] == 125
+
+
+def test_catch_up_skips_beyond_max(clock):
+    scheduler = make(clock, POLICY_CATCH_UP)
+    clock.now += 650  # Five whole periods late, three replayed
+    assert scheduler.wait() == 5
+    assert scheduler.get_stats()['skipped'] == 2
+    for _ in range(3):
+        scheduler.wait()
+    assert clock.now == 1650
+    scheduler.wait()
+    assert clock.now == 1700
+    assert scheduler.get_stats()['overruns'] == 1
+
+
+def test_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        FixedRateScheduler(100, "sometimes")
+    with pytest.raises(ValueError):
+        FixedRateScheduler(0)
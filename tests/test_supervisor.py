@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from supervisor import (ACTION_REBOOT, ACTION_RECOVERED, ACTION_SOCKET, ACTION_WIFI,
+                        Supervisor)
+
+
+class FakeClock:
+    def __init__(self, now=1000):
+        self.now = now
+
+    def ticks_ms(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "ticks_ms", clock.ticks_ms)
+    return clock
+
+
+@pytest.fixture
+def make(clock):
+    started = []
+
+    def make(actions):
+        # The Timer never fires during a test; _check() is driven by hand
+        supervisor = Supervisor(budgets={'modbus': 100, 'loop': 1000}, actions=actions,
+                                check_ms=3600000, escalate_ms=500, wdt_ms=0, log_file='',
+                                log_size=10)
+        supervisor.start()
+        started.append(supervisor)
+        return supervisor
+
+    yield make
+    for supervisor in started:
+        supervisor.stop()
+
+
+def test_within_budget_does_nothing(clock, make):
+    calls = []
+    supervisor = make({ACTION_SOCKET: lambda: calls.append(ACTION_SOCKET)})
+    supervisor.begin('modbus')
+    clock.now += 100
+    supervisor._check(None)
+    supervisor.end('modbus')
+    assert calls == []
+    assert supervisor.level == 0
+    assert supervisor.get_stats()['stages']['modbus']['max_ms'] == 100
+
+
+def test_escalates_one_step_per_interval(clock, make):
+    calls = []
+    supervisor = make({ACTION_SOCKET: lambda: calls.append(ACTION_SOCKET),
+                       ACTION_WIFI: lambda: calls.append(ACTION_WIFI),
+                       ACTION_REBOOT: lambda: calls.append(ACTION_REBOOT)})
+    supervisor.begin('modbus')
+    clock.now += 150
+    supervisor._check(None)
+    assert calls == [ACTION_SOCKET]
+    clock.now += 400
+    supervisor._check(None)
+    assert calls == [ACTION_SOCKET]
+    clock.now += 100
+    supervisor._check(None)
+    assert calls == [ACTION_SOCKET, ACTION_WIFI]
+    clock.now += 500
+    supervisor._check(None)
+    assert calls == [ACTION_SOCKET, ACTION_WIFI, ACTION_REBOOT]
+    clock.now += 500
+    supervisor._check(None)
+    assert len(calls) == 3
+    assert [entry['action'] for entry in supervisor.log] == [ACTION_SOCKET, ACTION_WIFI,
+                                                            ACTION_REBOOT]
+    assert supervisor.log[0]['stage'] == 'modbus'
+    assert supervisor.log[0]['budget_ms'] == 100
+
+
+def test_recovery_is_logged(clock, make):
+    supervisor = make({ACTION_SOCKET: lambda: None})
+    supervisor.begin('modbus')
+    clock.now += 200
+    supervisor._check(None)
+    supervisor.end('modbus')
+    clock.now += 10
+    supervisor._check(None)
+    assert supervisor.level == 0
+    entry = supervisor.log[-1]
+    assert entry['action'] == ACTION_RECOVERED
+    assert entry['stall_ms'] == 110
+    assert supervisor.get_stats()['stages']['modbus']['stalls'] == 1
+
+
+def test_action_result_and_errors_are_logged(clock, make):
+    def fail():
+        raise OSError("busy")
+
+    supervisor = make({ACTION_SOCKET: lambda: 'queued', ACTION_WIFI: fail})
+    supervisor.begin('modbus')
+    clock.now += 200
+    supervisor._check(None)
+    clock.now += 500
+    supervisor._check(None)
+    assert [entry['result'] for entry in supervisor.log] == ['queued', 'busy']
+
+
+def test_missing_action_is_logged_as_none(clock, make):
+    supervisor = make({})
+    supervisor.begin('loop')
+    clock.now += 1001
+    supervisor._check(None)
+    assert supervisor.log[-1]['result'] == 'none'
@@ -0,0 +1,159 @@
+import time
+
+import pytest
+
+from uart_feedback import DisplayFeedback
+
+
+class FakeClock:
+    def __init__(self, now=1000):
+        self.now = now
+
+    def ticks_ms(self):
+        return self.now
+
+
+class LoopbackUART:
+    """RX side of the display UART: bytes the display sent back"""
+
+    def __init__(self):
+        self.rx = bytearray()
+
+    def any(self):
+        return len(self.rx)
+
+    def read(self, n):
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "ticks_ms", clock.ticks_ms)
+    return clock
+
+
+@pytest.fixture
+def link(clock):
+    uart = LoopbackUART()
+    feedback = DisplayFeedback(uart, 1000, min_period_ms=200, max_period_ms=4000, late_ms=500,
+                               ack_timeout_ms=3000, max_in_flight=4, window_ms=3000,
+                               step_hz=0.5, reduce_below=0.75)
+    return feedback, uart
+
+
+def run(clock, feedback, uart, slots, ack=lambda seq: True, render_ms=20):
+    """One message per slot; the display acks before the next slot"""
+    periods = []
+    for _ in range(slots):
+        frame = feedback.tag(b"BATTERY:75\n")
+        seq = int(frame[frame.index(b";") + 1:-1])
+        if ack(seq):
+            uart.rx += b"ACK:%d,%d\n" % (seq, render_ms)
+        clock.now += feedback.period_ms
+        period = feedback.poll()
+        if period is not None:
+            periods.append(period)
+    return periods
+
+
+def test_tag_appends_sequence(link):
+    feedback, _ = link
+    assert feedback.tag(b"BATTERY:75\n") == b"BATTERY:75;0\n"
+    assert feedback.tag(b"SOC:80\n") == b"SOC:80;1\n"
+
+
+def test_speeds_up_while_display_keeps_up(clock, link):
+    feedback, uart = link
+    periods = run(clock, feedback, uart, 20)
+    assert periods[:3] == [666, 500, 400]
+    assert feedback.link_up
+    stats = feedback.get_stats()
+    assert stats['lost'] == stats['late'] == 0
+    assert stats['increases'] == len(periods)
+
+
+def test_never_faster_than_min_period(clock, link):
+    feedback, uart = link
+    run(clock, feedback, uart, 200)
+    assert feedback.period_ms == 200
+
+
+def test_halves_rate_on_loss(clock, link):
+    feedback, uart = link
+    run(clock, feedback, uart, 4)
+    rate = feedback.rate_hz
+    run(clock, feedback, uart, 6, ack=lambda seq: seq % 3 != 0)
+    assert feedback.get_stats()['lost'] >= 1
+    assert feedback.decreases >= 1
+    assert feedback.rate_hz < rate
+
+
+def test_slow_render_is_late(clock, link):
+    feedback, uart = link
+    run(clock, feedback, uart, 1)
+    run(clock, feedback, uart, 4, render_ms=800)
+    assert feedback.late == 4
+    assert feedback.decreases == 1
+    assert feedback.period_ms == 2000
+    assert feedback.reduced
+
+
+def send(feedback, uart, message, ack=True, render_ms=20):
+    frame = feedback.tag(message)
+    if ack:
+        uart.rx += b"ACK:%s,%d\n" % (frame[frame.index(b";") + 1:-1], render_ms)
+
+
+def test_alarm_sharing_a_slot_is_not_late(clock, link):
+    feedback, uart = link
+    periods = []
+    for i in range(20):
+        # Main loop order: alarm change, poll, then the slot's message
+        if i % 2:
+            send(feedback, uart, b"ALARM:LOW_SOC,%d\n" % (i // 2 % 2))
+        period = feedback.poll()
+        if period is not None:
+            periods.append(period)
+        send(feedback, uart, b"BATTERY:75\n")
+        clock.now += feedback.period_ms
+    assert feedback.late == 0
+    assert feedback.decreases == 0
+    assert periods[:3] == [666, 500, 400]
+
+
+def test_ack_after_next_slot_is_late(clock, link):
+    feedback, uart = link
+    run(clock, feedback, uart, 1)
+    send(feedback, uart, b"ALARM:LOW_SOC,1\n", ack=False)
+    feedback.poll()
+    send(feedback, uart, b"BATTERY:75\n", ack=False)
+    clock.now += feedback.period_ms
+    feedback.poll()
+    send(feedback, uart, b"BATTERY:75\n")
+    # Both acks only arrive after the next slot's message went out
+    uart.rx = bytearray(b"ACK:1,20\nACK:2,20\n") + uart.rx
+    clock.now += feedback.period_ms
+    feedback.poll()
+    assert feedback.late == 2
+    assert feedback.acked == 4
+
+
+def test_open_loop_after_silence(clock, link):
+    feedback, uart = link
+    run(clock, feedback, uart, 10)
+    assert feedback.period_ms < 1000
+    run(clock, feedback, uart, 30, ack=lambda seq: False)
+    assert not feedback.link_up
+    assert feedback.period_ms == 1000
+    assert not feedback.reduced
+
+
+def test_bad_lines_ignored(clock, link):
+    feedback, uart = link
+    uart.rx += b"hello\nACK:x,1\n" + b"~" * 70
+    feedback.poll()
+    assert feedback.bad_lines == 3
+    assert not feedback.link_up
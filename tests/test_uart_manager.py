@@ -0,0 +1,121 @@
+import machine
+import pytest
+
+from output_fanout import encode_text
+from uart_manager import (OVERFLOW_COALESCE, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST,
+                          UARTManager)
+
+
+class StalledUART:
+    """UART whose driver buffer is full until released"""
+
+    def __init__(self):
+        self.stalled = True
+        self.written = bytearray()
+
+    def write(self, data):
+        if self.stalled:
+            return 0
+        self.written += data
+        return len(data)
+
+    def txdone(self):
+        return not self.stalled
+
+
+def make(queue_size=4, overflow=OVERFLOW_COALESCE):
+    machine.configure_uart(0, "null")
+    manager = UARTManager(0, queue_size=queue_size, overflow=overflow)
+    manager.uart = StalledUART()
+    return manager
+
+
+def drain(manager):
+    manager.uart.stalled = False
+    manager.poll()
+    return manager.uart.written.decode().splitlines()
+
+
+def test_coalesces_readings_of_same_type():
+    manager = make()
+    manager.send_battery_soc(70)
+    manager.send_charging_state(1)
+    manager.send_battery_soc(71)
+    assert drain(manager) == ["BATTERY:71", "CHARGING:1"]
+    assert manager.coalesced == 1
+
+
+def test_alarms_are_never_coalesced():
+    manager = make()
+    manager.send_alarm("LOW_SOC", True)
+    manager.send_alarm("OVER_TEMP", True)
+    manager.send_alarm("LOW_SOC", False)
+    assert drain(manager) == ["ALARM:LOW_SOC,1", "ALARM:OVER_TEMP,1", "ALARM:LOW_SOC,0"]
+    assert manager.coalesced == 0
+
+
+def test_full_queue_drops_readings_before_alarms():
+    manager = make(queue_size=3)
+    manager.send_alarm("LOW_SOC", True)
+    manager.send_battery_soc(70)
+    manager.send_charging_state(1)
+    manager.send_wifi_status(1)
+    assert drain(manager) == ["ALARM:LOW_SOC,1", "CHARGING:1", "WIFI:1"]
+    assert manager.dropped == 1
+
+
+@pytest.mark.parametrize("overflow, expected", [
+    (OVERFLOW_DROP_OLDEST, ["BATTERY:71", "BATTERY:72"]),
+    (OVERFLOW_DROP_NEWEST, ["BATTERY:70", "BATTERY:71"]),
+])
+def test_drop_policies(overflow, expected):
+    manager = make(queue_size=2, overflow=overflow)
+    for soc in (70, 71, 72):
+        manager.send_battery_soc(soc)
+    assert drain(manager) == expected
+    assert manager.dropped == 1
+
+
+def test_partly_written_head_is_finished_first():
+    manager = make()
+    uart = manager.uart
+
+    def write_once(data):
+        if uart.written:
+            return 0
+        uart.written += data[:2]
+        return 2
+
+    uart.write = write_once
+    manager.send_battery_soc(70)
+    assert uart.written == b"BA"
+    del uart.write
+    manager.send_battery_soc(71)  # The head is locked, so this one queues behind it
+    assert drain(manager) == ["BATTERY:70", "BATTERY:71"]
+
+
+def test_unknown_policy_rejected():
+    machine.configure_uart(0, "null")
+    with pytest.raises(ValueError):
+        UARTManager(0, overflow="sometimes")
+
+
+def test_lines_match_the_text_output():
+    data = {'battery_soc': 87.6, 'battery_voltage': 52.31, 'battery_current': -12.5,
+            'battery_temperature': 21.4, 'charging_state': 0, 'pv_power': 240.5, 'pv_voltage': 98.2,
+            'solar_yield_today': 3.4, 'ac_load': 310.0, 'inverter_state': 9,
+            'battery_power': -653.9, 'net_ah': -1.25, 'time_to_full_min': None,
+            'time_to_empty_min': 412.7}
+    manager = make(queue_size=10)
+    manager.send_battery_soc(data['battery_soc'])
+    manager.send_battery_system(data['battery_voltage'], data['battery_current'],
+                                data['battery_temperature'])
+    manager.send_charging_state(data['charging_state'])
+    manager.send_wifi_status(1)
+    manager.send_demo_mode(False)
+    manager.send_solar(data['pv_power'], data['pv_voltage'], data['solar_yield_today'])
+    manager.send_inverter(data['ac_load'], data['inverter_state'])
+    manager.send_power(data['battery_power'], data['net_ah'], data['time_to_empty_min'])
+    lines = drain(manager)
+    assert lines == encode_text(data, 1, False).decode().splitlines()
+    assert lines[-1] == "POWER:-654,-1.2,412"
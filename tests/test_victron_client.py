@@ -0,0 +1,74 @@
+import pytest
+
+import config
+from frame_client import FrameVictronClient
+from victron_client import VictronClient
+
+
+@pytest.fixture(autouse=True)
+def fast_config(monkeypatch):
+    monkeypatch.setattr(config, "MODBUS_REQUEST_TIMEOUT", 0.25)
+    monkeypatch.setattr(config, "CONNECT_TIMEOUT", 1)
+    monkeypatch.setattr(config, "REGISTER_CACHE_DEFAULT_TTL_MS", 0)
+    monkeypatch.setattr(config, "REGISTER_CACHE_TTL_MS", {})
+    monkeypatch.setattr(config, "EXTENDED_DATA_ENABLED", False)
+
+
+def make_client(sim):
+    client = FrameVictronClient("127.0.0.1", sim.base_port)
+    assert client.connect()
+    return client
+
+
+def test_reads_battery_block(simulator):
+    client = make_client(simulator())
+    data = client.read_all_data()
+    assert data['battery_voltage'] > 0
+    assert data['stale_fields'] == []
+    client.close()
+
+
+def test_late_reply_does_not_desync_other_units(simulator):
+    # Unit 100 answers after the request timeout; unit 226 answers at once
+    sim = simulator(late=1, late_ms=400, late_units=(VictronClient.UNIT_ID_SYSTEM,))
+    client = make_client(sim)
+
+    assert client.read_input_register(840, 4, VictronClient.UNIT_ID_SYSTEM) is None
+    # Sent while the late reply is still on its way: must not read it
+    values = client.read_input_register(771, 20, VictronClient.UNIT_ID_SOLAR)
+    assert values is not None and len(values) == 20
+    values = client.read_input_register(771, 20, VictronClient.UNIT_ID_SOLAR)
+    assert values is not None
+
+    stats = client.get_breaker_stats()
+    assert stats[f"{VictronClient.UNIT_ID_SOLAR}:771"]['failures'] == 0
+    assert stats[f"{VictronClient.UNIT_ID_SYSTEM}:840"]['failures'] == 1
+    assert client.connects == 2
+    client.close()
+
+
+def test_one_reconnect_attempt_per_cycle(simulator):
+    sim = simulator()
+    client = make_client(sim)
+    client.reset_socket()
+    client.port = sim.base_port + 1000  # Nothing listens here
+    data = client.read_all_data()
+    assert data['battery_voltage'] is None
+    assert client.connects == 2
+    client.port = sim.base_port
+    data = client.read_all_data()
+    assert data['battery_voltage'] is not None
+    assert client.connects == 3
+    client.close()
+
+
+def test_failed_block_served_stale(simulator):
+    sim = simulator()
+    client = make_client(sim)
+    fresh = client.read_all_data()
+    client.reset_socket()
+    client.port = sim.base_port + 1000
+    data = client.read_all_data()
+    assert data['battery_voltage'] == fresh['battery_voltage']
+    assert 'battery_voltage' in data['stale_fields']
+    client.close()
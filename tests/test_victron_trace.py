@@ -0,0 +1,89 @@
+import pytest
+
+import config
+from replay_victron_client import ReplayVictronClient
+from victron_client import VictronClient
+from victron_trace import FC_CYCLE_MARK, TraceRecorder, read_trace
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(config, "REGISTER_CACHE_DEFAULT_TTL_MS", 0)
+    monkeypatch.setattr(config, "REGISTER_CACHE_TTL_MS", {})
+
+
+class RegisterMaster:
+    """umodbus TCP master stand-in answering from a register dict"""
+
+    def __init__(self, registers):
+        self.registers = registers
+
+    def read_input_registers(self, slave_addr, starting_addr, register_qty):
+        try:
+            return [self.registers[(slave_addr, starting_addr + i)] for i in range(register_qty)]
+        except KeyError:
+            raise OSError(f"illegal address {starting_addr}")
+
+    read_holding_registers = read_input_registers
+
+
+def test_trace_round_trip(tmp_path):
+    path = str(tmp_path / "trace.bin")
+    recorder = TraceRecorder(path, flush_bytes=16)
+    recorder.mark_cycle()
+    recorder.record(4, 100, 840, 3, [5230, 0xFFF6, 87])
+    recorder.record(3, 226, 771, 2, None)
+    recorder.close()
+    records = list(read_trace(path))
+    assert [r[1:] for r in records] == [
+        (FC_CYCLE_MARK, 0, 0, 0, ()),
+        (4, 100, 840, 3, (5230, 0xFFF6, 87)),
+        (3, 226, 771, 2, None),
+    ]
+    assert all(r[0] >= 0 for r in records)
+    assert recorder.record_count == 3
+
+
+def test_not_a_trace(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"XXXX\x01")
+    with pytest.raises(ValueError):
+        list(read_trace(str(path)))
+
+
+def test_replay_decodes_like_the_recording(tmp_path):
+    path = str(tmp_path / "trace.bin")
+    registers = {(100, 840): 523, (100, 841): 65536 - 125, (100, 842): 0, (100, 843): 87,
+                 (100, 61): 29815}
+    client = VictronClient("127.0.0.1", 502, recorder=TraceRecorder(path))
+    client.client = RegisterMaster(registers)
+    live = []
+    for soc in (87, 88, 89):
+        registers[(100, 843)] = soc
+        live.append(client.read_all_data())
+    client.close()
+
+    replay = ReplayVictronClient(path, speed=0)
+    assert replay.connect()
+    replayed = [replay.read_all_data() for _ in range(3)]
+    assert replayed == live
+    assert [data['battery_soc'] for data in live] == [87, 88, 89]
+
+    replay.read_all_data()
+    assert replay.finished
+    replay.close()
+
+
+def test_replay_loops(tmp_path):
+    path = str(tmp_path / "trace.bin")
+    recorder = TraceRecorder(path)
+    for soc in (50, 51):
+        recorder.mark_cycle()
+        recorder.record(4, 100, 840, 4, [523, 10, 0, soc])
+    recorder.close()
+
+    replay = ReplayVictronClient(path, speed=0, loop=True)
+    assert replay.connect()
+    socs = [replay.read_all_data()['battery_soc'] for _ in range(4)]
+    assert socs == [50, 51, 50, 51]
+    assert not replay.finished
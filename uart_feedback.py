@@ -0,0 +1,251 @@
+"""
+Display feedback over the UART return channel
+Tags each outgoing message with a sequence number (BATTERY:75;42), reads
+the display's ACK:<seq>,<render_ms> replies from RX and adapts the message
+rate AIMD-style: a step faster after every window in which all frames were
+acknowledged in time, half as fast when frames are lost, late or pile up
+unacknowledged
+
+Acks are read once per message slot, just before the next message goes
+out, so round trip times are only as fine as the slot period. A frame is
+therefore late when its ack was not back before the next slot's message
+was sent, or when the display reports a render time over the late
+threshold. ALARM messages go out on top of the slot messages and share
+the deadline of the slot message that follows them.
+"""
+
+import time
+import config
+
+SEQ_MASK = 0xFFFF
+_SEQ_HALF = 0x8000
+_EXTRA_PREFIX = b'ALARM:'  # Sent in addition to the slot's message
+
+
+class DisplayFeedback:
+    """Sequence tagging, ack tracking and rate adaptation for one UART link"""
+
+    def __init__(self, uart, base_period_ms, min_period_ms=None, max_period_ms=None,
+                 late_ms=None, ack_timeout_ms=None, max_in_flight=None,
+                 window_ms=None, step_hz=None, reduce_below=None):
+        """
+        Args:
+            uart: machine.UART shared with UARTManager (only read here)
+            base_period_ms: Message period without feedback (open loop)
+            min_period_ms: Fastest period (default config.UART_FEEDBACK_MIN_PERIOD_MS)
+            max_period_ms: Slowest period (default config.UART_FEEDBACK_MAX_PERIOD_MS)
+            late_ms: Render times above this count as late (default config.UART_FEEDBACK_LATE_MS)
+            ack_timeout_ms: Unacknowledged frames older than this count as
+                            lost (default config.UART_FEEDBACK_ACK_TIMEOUT_MS)
+            max_in_flight: More unacknowledged frames than this is a backlog
+                           (default config.UART_FEEDBACK_MAX_IN_FLIGHT)
+            window_ms: Clean interval before each rate increase, also the
+                       minimum time between two decreases
+                       (default config.UART_FEEDBACK_WINDOW_MS)
+            step_hz: Additive rate increase (default config.UART_FEEDBACK_STEP_HZ)
+            reduce_below: Send the reduced message set below this fraction of
+                          the base rate (default config.UART_FEEDBACK_REDUCE_BELOW)
+        """
+        self.uart = uart
+        self.base_period_ms = base_period_ms
+        self.min_period_ms = config.UART_FEEDBACK_MIN_PERIOD_MS if min_period_ms is None else min_period_ms
+        self.max_period_ms = config.UART_FEEDBACK_MAX_PERIOD_MS if max_period_ms is None else max_period_ms
+        self.late_ms = config.UART_FEEDBACK_LATE_MS if late_ms is None else late_ms
+        self.ack_timeout_ms = config.UART_FEEDBACK_ACK_TIMEOUT_MS if ack_timeout_ms is None else ack_timeout_ms
+        self.max_in_flight = config.UART_FEEDBACK_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+        self.window_ms = config.UART_FEEDBACK_WINDOW_MS if window_ms is None else window_ms
+        self.step_hz = config.UART_FEEDBACK_STEP_HZ if step_hz is None else step_hz
+        reduce_below = config.UART_FEEDBACK_REDUCE_BELOW if reduce_below is None else reduce_below
+        self.reduce_below_hz = reduce_below * 1000 / base_period_ms
+
+        self.rate_hz = 1000 / base_period_ms
+        self.link_up = False      # Set by the first ack, cleared after silence
+        self._next_seq = 0
+        self._slot = 0            # Slot messages tagged so far (wraps at SEQ_MASK)
+        self._pending = []        # [(seq, sent ticks_ms, slot)] oldest first
+        self._max_pending = 4 * self.max_in_flight
+        self._rx = bytearray()
+        now = time.ticks_ms()
+        self._last_ack = now
+        self._last_change = now
+        self._congested = False   # Loss or lateness since the last rate change
+
+        self.sent = 0
+        self.acked = 0
+        self.lost = 0
+        self.late = 0
+        self.bad_lines = 0
+        self.increases = 0
+        self.decreases = 0
+        self.rtt_last_ms = 0
+        self.rtt_max_ms = 0
+        self._rtt_total_ms = 0
+        self.render_last_ms = 0
+        self.render_max_ms = 0
+
+    @property
+    def period_ms(self):
+        return int(1000 / self.rate_hz)
+
+    @property
+    def reduced(self):
+        """True while the display is too busy for the full message set"""
+        return self.link_up and self.rate_hz < self.reduce_below_hz
+
+    def tag(self, data):
+        """
+        Append the next sequence number to an encoded message
+
+        Args:
+            data: Message bytes ending in a newline
+
+        Returns:
+            Message bytes with ';<seq>' before the newline
+        """
+        seq = self._next_seq
+        self._next_seq = (seq + 1) & SEQ_MASK
+        if data.startswith(_EXTRA_PREFIX):
+            slot = (self._slot + 1) & SEQ_MASK  # Due with the next slot message
+        else:
+            self._slot = slot = (self._slot + 1) & SEQ_MASK
+        pending = self._pending
+        if len(pending) >= self._max_pending:
+            pending.pop(0)
+            if self.link_up:
+                self.lost += 1
+                self._congested = True
+        pending.append((seq, time.ticks_ms(), slot))
+        self.sent += 1
+        return data[:-1] + (';' + str(seq) + '\n').encode()
+
+    def _ack(self, seq, render_ms, now):
+        """Retire pending frames up to seq; skipped ones were lost"""
+        pending = self._pending
+        while pending:
+            sent_seq, sent_ms, sent_slot = pending[0]
+            if (seq - sent_seq) & SEQ_MASK >= _SEQ_HALF:
+                break  # Ack for a frame already expired as lost
+            pending.pop(0)
+            if sent_seq != seq:
+                if self.link_up:
+                    self.lost += 1
+                    self._congested = True
+                continue
+            rtt = time.ticks_diff(now, sent_ms)
+            self.acked += 1
+            self.rtt_last_ms = rtt
+            self._rtt_total_ms += rtt
+            if rtt > self.rtt_max_ms:
+                self.rtt_max_ms = rtt
+            # Late once a later slot's message went out before this ack was read
+            overtaken = 0 < (self._slot - sent_slot) & SEQ_MASK < _SEQ_HALF
+            if overtaken or render_ms > self.late_ms:
+                self.late += 1
+                self._congested = True
+            break
+
+        self.render_last_ms = render_ms
+        if render_ms > self.render_max_ms:
+            self.render_max_ms = render_ms
+        if not self.link_up:
+            self.link_up = True
+            self._last_change = now
+        self._last_ack = now
+
+    def _read_acks(self, now):
+        """Parse every complete ACK line waiting in the RX buffer"""
+        waiting = self.uart.any()
+        if not waiting:
+            return
+        chunk = self.uart.read(waiting)
+        if chunk:
+            self._rx += chunk
+        while True:
+            end = self._rx.find(b'\n')
+            if end < 0:
+                break
+            line = bytes(self._rx[:end]).strip()
+            del self._rx[:end + 1]
+            if not line.startswith(b'ACK:'):
+                self.bad_lines += 1
+                continue
+            try:
+                seq, render_ms = line[4:].split(b',')
+                self._ack(int(seq) & SEQ_MASK, int(render_ms), now)
+            except ValueError:
+                self.bad_lines += 1
+        if len(self._rx) > 64:
+            self._rx = bytearray()  # No newline in sight: noise on the line
+            self.bad_lines += 1
+
+    def poll(self):
+        """
+        Read acks, expire overdue frames and adapt the rate (never blocks)
+
+        Returns:
+            New message period in ms when the rate changed, else None
+        """
+        now = time.ticks_ms()
+        self._read_acks(now)
+
+        pending = self._pending
+        while pending and time.ticks_diff(now, pending[0][1]) > self.ack_timeout_ms:
+            pending.pop(0)
+            if self.link_up:
+                self.lost += 1
+                self._congested = True
+
+        if not self.link_up:
+            return None
+
+        if time.ticks_diff(now, self._last_ack) > 2 * self.max_period_ms:
+            # Display stopped answering (restarted without feedback?): open loop
+            self.link_up = False
+            self._congested = False
+            return self._set_rate(1000 / self.base_period_ms, now)
+
+        since_change = time.ticks_diff(now, self._last_change)
+        if self._congested or len(pending) > self.max_in_flight:
+            if since_change >= self.window_ms:
+                self.decreases += 1
+                return self._set_rate(self.rate_hz / 2, now)
+        elif since_change >= self.window_ms:
+            self.increases += 1
+            return self._set_rate(self.rate_hz + self.step_hz, now)
+        return None
+
+    def _set_rate(self, rate_hz, now):
+        old_period = self.period_ms
+        rate_hz = min(rate_hz, 1000 / self.min_period_ms)
+        self.rate_hz = max(rate_hz, 1000 / self.max_period_ms)
+        self._last_change = now
+        self._congested = False
+        period = self.period_ms
+        return period if period != old_period else None
+
+    def get_stats(self):
+        """
+        Get link statistics
+
+        Returns:
+            Dictionary with frames sent/acked/lost/late, frames in flight,
+            round trip and render times (ms), and the current rate
+        """
+        return {
+            'link_up': self.link_up,
+            'period_ms': self.period_ms,
+            'reduced': self.reduced,
+            'sent': self.sent,
+            'acked': self.acked,
+            'lost': self.lost,
+            'late': self.late,
+            'in_flight': len(self._pending),
+            'bad_lines': self.bad_lines,
+            'increases': self.increases,
+            'decreases': self.decreases,
+            'rtt_last_ms': self.rtt_last_ms,
+            'rtt_max_ms': self.rtt_max_ms,
+            'rtt_mean_ms': self._rtt_total_ms / max(1, self.acked),
+            'render_last_ms': self.render_last_ms,
+            'render_max_ms': self.render_max_ms,
+        }
@@ -3,13 +3,26 @@ UART Manager for Battery Data Transmission
 Sends battery SOC to Waveshare RP2350B display via one-way UART
 """
 
+import time
 from machine import UART, Pin
 import config
+from display_protocol import (format_alarm, format_battery_soc, format_battery_system,
+                              format_charging_state, format_demo_mode, format_inverter,
+                              format_power, format_solar, format_wifi_status)
+
+# Transmit queue overflow policies
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # Discard the oldest queued message
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # Refuse the new message
+OVERFLOW_COALESCE = 'coalesce'        # Replace a queued message of the same type, else drop oldest
+
+# Alarm transitions are events, not readings: never coalesced, dropped last
+ALARM_PREFIX = b'ALARM:'
 
 class UARTManager:
     """Manages UART communication for sending battery data to display"""
 
-    def __init__(self, uart_id=0, baudrate=115200, tx_pin=0, rx_pin=1):
+    def __init__(self, uart_id=0, baudrate=115200, tx_pin=0, rx_pin=1,
+                 queue_size=None, overflow=None, tx_buffer=None):
         """
         Initialize UART interface
 
@@ -18,6 +31,12 @@ class UARTManager:
             baudrate: Communication speed (default 115200)
             tx_pin: GPIO pin for TX
             rx_pin: GPIO pin for RX (unused but required for init)
+            queue_size: Transmit queue length, 0 = write synchronously
+                        (default config.UART_TX_QUEUE_SIZE)
+            overflow: OVERFLOW_* policy when the queue is full
+                      (default config.UART_TX_OVERFLOW)
+            tx_buffer: UART driver TX ring buffer in bytes
+                       (default config.UART_TX_BUFFER)
 
         Raises:
             Exception: If UART initialization fails
@@ -27,6 +46,12 @@ class UARTManager:
         self.tx_pin = tx_pin
         self.rx_pin = rx_pin
 
+        self.queue_size = config.UART_TX_QUEUE_SIZE if queue_size is None else queue_size
+        self.overflow = overflow or config.UART_TX_OVERFLOW
+        if self.overflow not in (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_COALESCE):
+            raise ValueError(f"unknown UART overflow policy: {self.overflow}")
+        self.tx_buffer = tx_buffer or config.UART_TX_BUFFER
+
         try:
             self.uart = UART(
                 uart_id,
@@ -35,7 +60,8 @@ class UARTManager:
                 rx=Pin(rx_pin),
                 bits=8,
                 parity=None,
-                stop=1
+                stop=1,
+                txbuf=self.tx_buffer
             )
             print(f"UART{uart_id} initialized: TX=GP{tx_pin}, RX=GP{rx_pin}, {baudrate} baud")
 
@@ -46,34 +72,55 @@ class UARTManager:
         self.send_count = 0
         self.error_count = 0
 
-    def send_battery_soc(self, soc_percentage):
+        # DisplayFeedback that tags messages with sequence numbers (optional)
+        self.feedback = None
+
+        # Transmit queue: entries are [type prefix, bytes, enqueue ticks_ms]
+        self._queue = []
+        self._offset = 0          # Bytes of the head entry already written
+        self._in_flight = 0       # Bytes estimated to be in the driver buffer
+        self._last_write_us = time.ticks_us()
+        self.queue_max_depth = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.drain_latency_last_ms = 0
+        self.drain_latency_max_ms = 0
+        self._drain_latency_total_ms = 0
+
+    def _send_message(self, message):
         """
-        Send battery SOC via UART
+        Send one protocol message, through the transmit queue if enabled
 
         Args:
-            soc_percentage: Battery SOC 0-100 (int or None)
+            message: Complete message including trailing newline
 
         Returns:
-            True if sent successfully, False otherwise
+            True if sent (or queued) successfully, False otherwise
         """
-        # Validate input
-        if soc_percentage is None:
-            if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
-                print("UART: Skipping send (SOC is None)")
-            return False
+        if self.queue_size:
+            return self._enqueue(message)
+        return self._write_message(message)
 
-        # Clamp to valid range
-        soc = max(0, min(100, int(soc_percentage)))
+    def _write_message(self, message):
+        """
+        Write one protocol message to the UART synchronously
 
-        # Format message
-        message = f"BATTERY:{soc}\n"
+        Args:
+            message: Complete message including trailing newline
 
+        Returns:
+            True if sent successfully, False otherwise
+        """
         try:
+            data = message.encode('utf-8')
+            if self.feedback:
+                data = self.feedback.tag(data)
+
             # Send via UART
-            bytes_written = self.uart.write(message.encode('utf-8'))
+            bytes_written = self.uart.write(data)
 
-            if bytes_written != len(message):
-                print(f"UART: Incomplete write ({bytes_written}/{len(message)} bytes)")
+            if bytes_written != len(data):
+                print(f"UART: Incomplete write ({bytes_written}/{len(data)} bytes)")
                 self.error_count += 1
                 return False
 
@@ -89,6 +136,130 @@ class UARTManager:
             self.error_count += 1
             return False
 
+    def _enqueue(self, message):
+        """
+        Queue a message and drain as much as the UART can take now
+
+        Under OVERFLOW_COALESCE a queued reading of the same type is replaced
+        right away (the display only needs the newest), and a full queue
+        drops its oldest reading; ALARM messages are kept in order.
+
+        Returns:
+            False if the message was refused (OVERFLOW_DROP_NEWEST), else True
+        """
+        data = message.encode('utf-8')
+        prefix = data[:data.find(b':') + 1]
+        queue = self._queue
+        # The head entry is locked once partly written
+        first = 1 if self._offset else 0
+
+        if self.overflow == OVERFLOW_COALESCE and prefix != ALARM_PREFIX:
+            for i in range(first, len(queue)):
+                if queue[i][0] == prefix:
+                    queue[i][1] = data  # Keeps its place and enqueue time
+                    self.coalesced += 1
+                    self.poll()
+                    return True
+
+        if len(queue) >= self.queue_size:
+            if self.overflow == OVERFLOW_DROP_NEWEST or first >= len(queue):
+                self.dropped += 1
+                return False
+            victim = first
+            if self.overflow == OVERFLOW_COALESCE:
+                for i in range(first, len(queue)):
+                    if queue[i][0] != ALARM_PREFIX:
+                        victim = i
+                        break
+            queue.pop(victim)
+            self.dropped += 1
+
+        queue.append([prefix, data, time.ticks_ms()])
+        if len(queue) > self.queue_max_depth:
+            self.queue_max_depth = len(queue)
+
+        if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
+            print(f"UART TX queued: {message.strip()} (depth {len(queue)})")
+
+        self.poll()
+        return True
+
+    def _tx_free(self):
+        """Estimate free space in the driver TX buffer"""
+        if self.uart.txdone():
+            self._in_flight = 0
+        elif self._in_flight:
+            now = time.ticks_us()
+            # 10 bits per byte on the wire (8N1)
+            drained = time.ticks_diff(now, self._last_write_us) * self.baudrate // 10000000
+            if drained:
+                self._in_flight = max(0, self._in_flight - drained)
+                self._last_write_us = now
+        return self.tx_buffer - self._in_flight
+
+    def poll(self):
+        """
+        Write queued messages while the UART has buffer space (never blocks)
+
+        Call regularly from the main loop; a message that does not fit is
+        written partly and finished on a later call.
+
+        Returns:
+            Number of messages still queued
+        """
+        queue = self._queue
+        while queue:
+            free = self._tx_free()
+            if free <= 0:
+                break
+            entry = queue[0]
+            if self.feedback and entry[0] is not None:
+                # Sequence numbers follow wire order; a tagged entry no longer coalesces
+                entry[1] = self.feedback.tag(entry[1])
+                entry[0] = None
+            data = entry[1]
+            try:
+                written = self.uart.write(memoryview(data)[self._offset:self._offset + free]) or 0
+            except Exception as e:
+                print(f"UART send error: {e}")
+                self.error_count += 1
+                break
+            if written:
+                if not self._in_flight:
+                    self._last_write_us = time.ticks_us()
+                self._in_flight += written
+                self._offset += written
+            if self._offset < len(data):
+                break  # Driver buffer full: finish on a later poll
+
+            queue.pop(0)
+            self._offset = 0
+            self.send_count += 1
+            latency = time.ticks_diff(time.ticks_ms(), entry[2])
+            self.drain_latency_last_ms = latency
+            if latency > self.drain_latency_max_ms:
+                self.drain_latency_max_ms = latency
+            self._drain_latency_total_ms += latency
+        return len(queue)
+
+    def send_battery_soc(self, soc_percentage):
+        """
+        Send battery SOC via UART
+
+        Args:
+            soc_percentage: Battery SOC 0-100 (int or None)
+
+        Returns:
+            True if sent successfully, False otherwise
+        """
+        # Validate input
+        if soc_percentage is None:
+            if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
+                print("UART: Skipping send (SOC is None)")
+            return False
+
+        return self._send_message(format_battery_soc(soc_percentage))
+
     def send_battery_system(self, voltage, current, temperature):
         """
         Send battery system data via UART
@@ -107,29 +278,7 @@ class UARTManager:
                 print("UART: Skipping BATSYS send (one or more values is None)")
             return False
 
-        # Format message: BATSYS:<voltage>,<current>,<temp>\n
-        message = f"BATSYS:{voltage:.1f},{current:.1f},{temperature:.1f}\n"
-
-        try:
-            # Send via UART
-            bytes_written = self.uart.write(message.encode('utf-8'))
-
-            if bytes_written != len(message):
-                print(f"UART: Incomplete write ({bytes_written}/{len(message)} bytes)")
-                self.error_count += 1
-                return False
-
-            self.send_count += 1
-
-            if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
-                print(f"UART TX: {message.strip()} ({bytes_written} bytes)")
-
-            return True
-
-        except Exception as e:
-            print(f"UART send error: {e}")
-            self.error_count += 1
-            return False
+        return self._send_message(format_battery_system(voltage, current, temperature))
 
     def send_charging_state(self, state):
         """
@@ -147,32 +296,7 @@ class UARTManager:
                 print("UART: Skipping CHARGING send (state is None)")
             return False
 
-        # Ensure state is 0 or 1
-        state_value = 1 if state else 0
-
-        # Format message: CHARGING:<state>\n
-        message = f"CHARGING:{state_value}\n"
-
-        try:
-            # Send via UART
-            bytes_written = self.uart.write(message.encode('utf-8'))
-
-            if bytes_written != len(message):
-                print(f"UART: Incomplete write ({bytes_written}/{len(message)} bytes)")
-                self.error_count += 1
-                return False
-
-            self.send_count += 1
-
-            if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
-                print(f"UART TX: {message.strip()} ({bytes_written} bytes)")
-
-            return True
-
-        except Exception as e:
-            print(f"UART send error: {e}")
-            self.error_count += 1
-            return False
+        return self._send_message(format_charging_state(state))
 
     def send_wifi_status(self, status):
         """
@@ -196,29 +320,7 @@ class UARTManager:
             print(f"UART: Invalid WiFi status {status_value}, must be 0, 1, or 2")
             return False
 
-        # Format message: WIFI:<status>\n
-        message = f"WIFI:{status_value}\n"
-
-        try:
-            # Send via UART
-            bytes_written = self.uart.write(message.encode('utf-8'))
-
-            if bytes_written != len(message):
-                print(f"UART: Incomplete write ({bytes_written}/{len(message)} bytes)")
-                self.error_count += 1
-                return False
-
-            self.send_count += 1
-
-            if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
-                print(f"UART TX: {message.strip()} ({bytes_written} bytes)")
-
-            return True
-
-        except Exception as e:
-            print(f"UART send error: {e}")
-            self.error_count += 1
-            return False
+        return self._send_message(format_wifi_status(status_value))
 
     def send_demo_mode(self, is_demo):
         """
@@ -236,49 +338,126 @@ class UARTManager:
                 print("UART: Skipping DEMO send (is_demo is None)")
             return False
 
-        # Ensure state is 0 or 1
-        demo_value = 1 if is_demo else 0
+        return self._send_message(format_demo_mode(is_demo))
 
-        # Format message: DEMO:<state>\n
-        message = f"DEMO:{demo_value}\n"
+    def send_solar(self, pv_power, pv_voltage, yield_today):
+        """
+        Send solar charger data via UART
 
-        try:
-            # Send via UART
-            bytes_written = self.uart.write(message.encode('utf-8'))
+        Args:
+            pv_power: PV power in watts (float or None)
+            pv_voltage: PV voltage in volts (float or None)
+            yield_today: Energy yield today in kWh (float or None)
 
-            if bytes_written != len(message):
-                print(f"UART: Incomplete write ({bytes_written}/{len(message)} bytes)")
-                self.error_count += 1
-                return False
+        Returns:
+            True if sent successfully, False otherwise
+        """
+        # Validate inputs
+        if pv_power is None or pv_voltage is None or yield_today is None:
+            if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
+                print("UART: Skipping SOLAR send (one or more values is None)")
+            return False
 
-            self.send_count += 1
+        return self._send_message(format_solar(pv_power, pv_voltage, yield_today))
+
+    def send_inverter(self, ac_load, state):
+        """
+        Send inverter data via UART
 
+        Args:
+            ac_load: AC output power in watts (float or None)
+            state: VE.Bus state code, e.g. 9=inverting (int or None)
+
+        Returns:
+            True if sent successfully, False otherwise
+        """
+        # Validate inputs
+        if ac_load is None or state is None:
             if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
-                print(f"UART TX: {message.strip()} ({bytes_written} bytes)")
+                print("UART: Skipping INVERTER send (one or more values is None)")
+            return False
 
-            return True
+        return self._send_message(format_inverter(ac_load, state))
 
-        except Exception as e:
-            print(f"UART send error: {e}")
-            self.error_count += 1
+    def send_power(self, power, net_ah, time_to_go_min):
+        """
+        Send derived power data via UART
+
+        Args:
+            power: Battery power in watts, + charging / - discharging (float or None)
+            net_ah: Net Ah charged since start (float or None)
+            time_to_go_min: Minutes to full when charging, to empty when
+                            discharging, or None when idle/unknown (sent as -1)
+
+        Returns:
+            True if sent successfully, False otherwise
+        """
+        # Validate inputs
+        if power is None or net_ah is None:
+            if hasattr(config, 'UART_DEBUG') and config.UART_DEBUG:
+                print("UART: Skipping POWER send (one or more values is None)")
             return False
 
+        return self._send_message(format_power(power, net_ah, time_to_go_min))
+
+    def send_alarm(self, name, active):
+        """
+        Send an alarm state change via UART
+
+        Args:
+            name: Alarm name from config.ALARM_RULES (str)
+            active: True when raised, False when cleared
+
+        Returns:
+            True if sent successfully, False otherwise
+        """
+        return self._send_message(format_alarm(name, active))
+
+    def flush(self, timeout_ms=100):
+        """
+        Drain the transmit queue and wait until the last byte has left the
+        UART (before sleeping)
+
+        Args:
+            timeout_ms: Max wait in milliseconds
+
+        Returns:
+            True if transmission finished
+        """
+        start = time.ticks_ms()
+        while self.poll():
+            if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                return False
+        while not self.uart.txdone():
+            if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                return False
+        return True
+
     def get_stats(self):
         """
         Get transmission statistics
 
         Returns:
-            Dictionary with send_count and error_count
+            Dictionary with send_count, error_count and the transmit queue
+            depth, drops, coalesced messages and drain latency (ms)
         """
         return {
             'send_count': self.send_count,
             'error_count': self.error_count,
-            'error_rate': self.error_count / max(1, self.send_count)
+            'error_rate': self.error_count / max(1, self.send_count),
+            'queue_depth': len(self._queue),
+            'queue_max_depth': self.queue_max_depth,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'drain_latency_last_ms': self.drain_latency_last_ms,
+            'drain_latency_max_ms': self.drain_latency_max_ms,
+            'drain_latency_mean_ms': self._drain_latency_total_ms / max(1, self.send_count),
         }
 
     def close(self):
         """Cleanup UART resources"""
         if self.uart:
+            self.flush()
             stats = self.get_stats()
             print(f"UART closing: {stats['send_count']} sent, {stats['error_count']} errors")
             self.uart.deinit()
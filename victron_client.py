@@ -3,8 +3,9 @@ Victron Cerbo GX Modbus TCP client
 Uses micropython-modbus library to communicate with Victron devices
 """
 
-from umodbus.tcp import TCP as ModbusTCPMaster
+import time
 import config
+from circuit_breaker import CircuitBreaker, CircuitOpenError
 
 class VictronClient:
     """
@@ -17,7 +18,34 @@ class VictronClient:
     UNIT_ID_SOLAR = 226   # Solar charger (MPPT)
     UNIT_ID_INVERTER = 227  # Inverter/Charger
 
-    def __init__(self, host=None, port=None, unit_id=None):
+    # Modbus function codes
+    FC_READ_HOLDING = 3
+    FC_READ_INPUT = 4
+
+    # Contiguous register blocks read with a single request: (start, count)
+    BATTERY_BLOCK = (840, 4)    # com.victronenergy.system, 840-843
+    SOLAR_BLOCK = (771, 20)     # com.victronenergy.solarcharger, 771-790
+    INVERTER_BLOCK = (3, 29)    # com.victronenergy.vebus, 3-31
+
+    TEMPERATURE_REGISTER = 61   # 0.01 K units
+
+    # Field decoding: (name, register, scale, signed)
+    BATTERY_FIELDS = (
+        ('battery_voltage', 840, 0.1, False),    # V
+        ('battery_current', 841, 0.1, True),     # A, + charging / - discharging
+        ('battery_soc', 843, 1, False),          # %
+    )
+    SOLAR_FIELDS = (
+        ('pv_voltage', 776, 0.01, False),        # V
+        ('solar_yield_today', 784, 0.1, False),  # kWh
+        ('pv_power', 789, 0.1, False),           # W
+    )
+    INVERTER_FIELDS = (
+        ('ac_load', 23, 10, True),               # W, AC output power L1
+        ('inverter_state', 31, 1, False),        # VE.Bus state (9 = inverting)
+    )
+
+    def __init__(self, host=None, port=None, unit_id=None, recorder=None):
         """
         Initialize Victron Modbus client
 
@@ -25,11 +53,37 @@ class VictronClient:
             host: Cerbo GX IP address (defaults to config.CERBO_IP)
             port: Modbus TCP port (defaults to config.CERBO_PORT)
             unit_id: Modbus unit ID (defaults to UNIT_ID_SYSTEM)
+            recorder: Optional victron_trace.TraceRecorder capturing raw responses
         """
         self.host = host or config.CERBO_IP
         self.port = port or config.CERBO_PORT
         self.unit_id = unit_id or self.UNIT_ID_SYSTEM
+        self.recorder = recorder
         self.client = None
+        self._reconnect = False         # Set by reset_socket()
+        self._reconnect_failed = False  # One reconnect attempt per read_all_data()
+        self.extended_data = config.EXTENDED_DATA_ENABLED
+
+        # Devices read with extended data (replaced by apply_device_map)
+        self.solar_units = (self.UNIT_ID_SOLAR,)
+        self.inverter_unit = self.UNIT_ID_INVERTER
+
+        # Response cache: (function_code, unit_id, register) -> (ticks_ms, raw value)
+        self._cache = {}
+        self.cache_default_ttl_ms = config.REGISTER_CACHE_DEFAULT_TTL_MS
+        self.cache_ttls = config.REGISTER_CACHE_TTL_MS
+        self.cache_max_entries = config.REGISTER_CACHE_MAX_ENTRIES
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+        # Circuit breaker per (unit_id, start register) and the last good
+        # values per (function_code, unit_id, start register, count), served marked stale
+        # while a block fails
+        self._breakers = {}
+        self._last_known = {}
+        self._stale_reads = set()
+        self.stale_max_age_ms = config.STALE_MAX_AGE_S * 1000
 
     def connect(self):
         """
@@ -39,61 +93,312 @@ class VictronClient:
             True if connected successfully
         """
         try:
+            # Imported lazily so subclasses (e.g. replay) work without umodbus
+            from umodbus.tcp import TCP as ModbusTCPMaster
             self.client = ModbusTCPMaster(
                 slave_ip=self.host,
                 slave_port=self.port,
                 timeout=config.CONNECT_TIMEOUT
             )
+            # Per-request deadline: CONNECT_TIMEOUT only covers connecting
+            sock = getattr(self.client, '_sock', None)
+            if sock is not None:
+                sock.settimeout(config.MODBUS_REQUEST_TIMEOUT)
+            self._reconnect = False
             print(f"Connected to Victron Cerbo GX at {self.host}:{self.port}")
             return True
         except Exception as e:
             print(f"Failed to connect to Cerbo GX: {e}")
             return False
 
-    def read_holding_register(self, register_addr, count=1):
+    def apply_device_map(self, device_map):
+        """
+        Use the unit IDs found by device_discovery instead of the defaults
+
+        Args:
+            device_map: Device map from device_discovery.discover()
+        """
+        units = device_map['units']
+        self.unit_id = units.get('system', [self.unit_id])[0]
+        self.solar_units = tuple(units.get('solarcharger', ()))
+        vebus = units.get('vebus')
+        self.inverter_unit = vebus[0] if vebus else None
+
+    def read_holding_register(self, register_addr, count=1, unit_id=None):
         """
         Read holding register(s) - Modbus function 3
 
         Args:
             register_addr: Starting register address
             count: Number of registers to read
+            unit_id: Modbus unit ID (defaults to the client's unit_id)
 
         Returns:
             List of register values or None on error
         """
         try:
-            result = self.client.read_holding_registers(
-                slave_addr=self.unit_id,
-                starting_addr=register_addr,
-                register_qty=count
-            )
-            return result
+            return self._cached_request(self.FC_READ_HOLDING, register_addr, count, unit_id or self.unit_id)
         except Exception as e:
             print(f"Error reading holding register {register_addr}: {e}")
             return None
 
-    def read_input_register(self, register_addr, count=1):
+    def read_input_register(self, register_addr, count=1, unit_id=None):
         """
         Read input register(s) - Modbus function 4
 
         Args:
             register_addr: Starting register address
             count: Number of registers to read
+            unit_id: Modbus unit ID (defaults to the client's unit_id)
 
         Returns:
             List of register values or None on error
         """
         try:
-            result = self.client.read_input_registers(
-                slave_addr=self.unit_id,
-                starting_addr=register_addr,
-                register_qty=count
-            )
-            return result
+            return self._cached_request(self.FC_READ_INPUT, register_addr, count, unit_id or self.unit_id)
         except Exception as e:
             print(f"Error reading input register {register_addr}: {e}")
             return None
 
+    def _now_ms(self):
+        """Clock used for cache ages (overridden by the replay client)"""
+        return time.ticks_ms()
+
+    def sample_ms(self):
+        """
+        Time of the last read_all_data() snapshot
+
+        Returns:
+            ticks_ms now, or the trace clock when replaying, so counters
+            integrate over trace time at any replay speed
+        """
+        return self._now_ms()
+
+    def _cache_ttl(self, unit_id, register_addr):
+        """Max age in ms for a register: (unit, register) entry, then register, then default"""
+        ttls = self.cache_ttls
+        ttl = ttls.get((unit_id, register_addr))
+        if ttl is None:
+            ttl = ttls.get(register_addr, self.cache_default_ttl_ms)
+        return ttl
+
+    def _cached_request(self, function_code, register_addr, count, unit_id):
+        """
+        Serve a read from the response cache, or from the network on a miss
+
+        A request is a hit only if every register in the range is cached
+        and younger than its max age. Network results are stored per
+        function code and register, so a block read also serves later
+        single-register reads, but input and holding reads of the same
+        address never serve each other.
+
+        Args:
+            function_code: FC_READ_HOLDING or FC_READ_INPUT
+            register_addr: Starting register address
+            count: Number of registers to read
+            unit_id: Modbus unit ID
+
+        Returns:
+            List of raw register values
+
+        Raises:
+            Exception: On any Modbus or socket error (from _request)
+        """
+        now = self._now_ms()
+
+        if self.cache_default_ttl_ms or self.cache_ttls:
+            cache = self._cache
+            values = []
+            for register in range(register_addr, register_addr + count):
+                entry = cache.get((function_code, unit_id, register))
+                if entry is None or time.ticks_diff(now, entry[0]) > self._cache_ttl(unit_id, register):
+                    break
+                values.append(entry[1])
+            else:
+                self.cache_hits += 1
+                return values
+            self.cache_misses += 1
+
+        result, stale = self._guarded_request(function_code, register_addr, count, unit_id, now)
+        if stale:
+            self._stale_reads.add((unit_id, register_addr))
+        else:
+            self._cache_store(function_code, unit_id, register_addr, result, now)
+        return result
+
+    def _breaker(self, unit_id, register_addr):
+        """Get (or create) the circuit breaker of one unit and block"""
+        key = (unit_id, register_addr)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(config.BREAKER_FAILURE_THRESHOLD,
+                                     config.BREAKER_OPEN_MS, config.BREAKER_MAX_OPEN_MS)
+            self._breakers[key] = breaker
+        return breaker
+
+    def _guarded_request(self, function_code, register_addr, count, unit_id, now):
+        """
+        Send a request through its circuit breaker
+
+        While the breaker is open, or when the request fails, the last good
+        values of the block (if younger than stale_max_age_ms) are returned
+        instead.
+
+        Returns:
+            Tuple (raw register values, stale flag)
+
+        Raises:
+            CircuitOpenError: Breaker open and no last-known values
+            Exception: Request failed and no last-known values
+        """
+        breaker = self._breaker(unit_id, register_addr)
+        key = (function_code, unit_id, register_addr, count)
+
+        if breaker.allow(now):
+            try:
+                result = self._request(function_code, register_addr, count, unit_id)
+            except Exception as e:
+                if isinstance(e, OSError):
+                    # A timed-out request may still be answered: drop the
+                    # connection, or the late reply would be read as the
+                    # answer to the next request (of any unit)
+                    self.reset_socket()
+                breaker.record_failure(now)
+                stale = self._last_known_values(key, now)
+                if stale is None:
+                    raise
+            else:
+                breaker.record_success()
+                self._last_known[key] = (now, result)
+                return result, False
+        else:
+            stale = self._last_known_values(key, now)
+            if stale is None:
+                raise CircuitOpenError(f"circuit open for unit {unit_id} register {register_addr}")
+
+        return stale, True
+
+    def _last_known_values(self, key, now):
+        """Last good values of a block, or None if missing or too old"""
+        entry = self._last_known.get(key)
+        if entry is None or time.ticks_diff(now, entry[0]) > self.stale_max_age_ms:
+            return None
+        return entry[1]
+
+    def get_breaker_stats(self):
+        """
+        Get circuit breaker statistics
+
+        Returns:
+            Dictionary of "unit:register" -> breaker stats
+        """
+        return {f"{unit}:{register}": breaker.get_stats()
+                for (unit, register), breaker in self._breakers.items()}
+
+    def _cache_store(self, function_code, unit_id, register_addr, values, now):
+        """Store raw register values, evicting to stay within cache_max_entries"""
+        cache = self._cache
+        for i in range(len(values)):
+            key = (function_code, unit_id, register_addr + i)
+            if self._cache_ttl(unit_id, register_addr + i) <= 0:
+                continue
+            if key not in cache and len(cache) >= self.cache_max_entries:
+                self._cache_evict(now)
+            cache[key] = (now, values[i])
+
+    def _cache_evict(self, now):
+        """Drop expired entries, or the oldest entry if none have expired"""
+        cache = self._cache
+        oldest_key = None
+        oldest_age = -1
+        expired = []
+        for key, entry in cache.items():
+            age = time.ticks_diff(now, entry[0])
+            if age > self._cache_ttl(key[1], key[2]):
+                expired.append(key)
+            elif age > oldest_age:
+                oldest_key = key
+                oldest_age = age
+
+        if not expired and oldest_key is not None:
+            expired.append(oldest_key)
+        for key in expired:
+            del cache[key]
+        self.cache_evictions += len(expired)
+
+    def invalidate_cache(self):
+        """Forget all cached register values"""
+        self._cache = {}
+
+    def get_cache_stats(self):
+        """
+        Get response cache statistics
+
+        Returns:
+            Dictionary with hits, misses, evictions, entries and hit_rate
+        """
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'evictions': self.cache_evictions,
+            'entries': len(self._cache),
+            'hit_rate': self.cache_hits / max(1, lookups)
+        }
+
+    def _request(self, function_code, register_addr, count, unit_id):
+        """
+        Perform one Modbus read on the network
+
+        Every register access that reaches the Cerbo GX goes through here,
+        so this is where raw responses are captured for trace recording.
+
+        Args:
+            function_code: FC_READ_HOLDING or FC_READ_INPUT
+            register_addr: Starting register address
+            count: Number of registers to read
+            unit_id: Modbus unit ID
+
+        Returns:
+            List of raw register values
+
+        Raises:
+            Exception: On any Modbus or socket error
+        """
+        try:
+            self._ensure_connected()
+            if function_code == self.FC_READ_HOLDING:
+                read = self.client.read_holding_registers
+            else:
+                read = self.client.read_input_registers
+            result = read(
+                slave_addr=unit_id,
+                starting_addr=register_addr,
+                register_qty=count
+            )
+        except Exception:
+            if self.recorder:
+                self.recorder.record(function_code, unit_id, register_addr, count, None)
+            raise
+
+        if self.recorder:
+            self.recorder.record(function_code, unit_id, register_addr, count, result)
+        return result
+
+    def _ensure_connected(self):
+        """
+        Reconnect after reset_socket(), trying once per read_all_data() so a
+        down Cerbo GX costs one connect timeout per poll, not one per block
+
+        Raises:
+            OSError: If the reconnect fails
+        """
+        if self._reconnect:
+            if self._reconnect_failed or not self.connect():
+                self._reconnect_failed = True
+                raise OSError("not connected to Cerbo GX")
+            self._reconnect = False
+
     def read_battery_voltage(self):
         """
         Read battery voltage (register 840)
@@ -146,15 +451,27 @@ class VictronClient:
         Returns:
             Temperature in Celsius (float) or None on error
         """
-        result = self.read_input_register(61)
+        result = self.read_input_register(self.TEMPERATURE_REGISTER)
         if result:
-            # Victron stores temperature in 0.01 Kelvin units
-            # Convert to Celsius: (K * 0.01) - 273.15
-            kelvin = result[0] * 0.01
-            celsius = kelvin - 273.15
-            return round(celsius, 1)
+            return self.decode_temperature(result[0])
         return None
 
+    @staticmethod
+    def decode_temperature(raw):
+        """
+        Convert a raw temperature register to Celsius
+
+        Args:
+            raw: Register value in 0.01 Kelvin units
+
+        Returns:
+            Temperature in Celsius rounded to 0.1 (float)
+        """
+        # Convert to Celsius: (K * 0.01) - 273.15
+        kelvin = raw * 0.01
+        celsius = kelvin - 273.15
+        return round(celsius, 1)
+
     def get_charging_state(self, current=None):
         """
         Determine if battery is charging based on current
@@ -168,6 +485,19 @@ class VictronClient:
         if current is None:
             current = self.read_battery_current()
 
+        return self.charging_state_from_current(current)
+
+    @staticmethod
+    def charging_state_from_current(current):
+        """
+        Derive the charging state from a battery current
+
+        Args:
+            current: Battery current in amps (or None)
+
+        Returns:
+            1 if charging (current > 0), 0 if not charging, None if unknown
+        """
         if current is None:
             return None
 
@@ -181,19 +511,126 @@ class VictronClient:
         Returns:
             Dictionary with all data or None on error
         """
-        battery_current = self.read_battery_current()
+        self._reconnect_failed = False
+        if self.recorder:
+            self.recorder.mark_cycle()
+        self._stale_reads = set()
 
-        data = {
-            'battery_voltage': self.read_battery_voltage(),
-            'battery_current': battery_current,
-            'battery_temperature': self.read_battery_temperature(),
-            'battery_soc': self.read_battery_soc(),
-            'charging_state': self.get_charging_state(battery_current),
-        }
+        # Voltage, current and SOC in one request (840-843)
+        stale_fields = []
+        data = self.read_block(self.unit_id, self.BATTERY_BLOCK, self.BATTERY_FIELDS, stale_fields)
+        data['battery_temperature'] = self.read_battery_temperature()
+        if (self.unit_id, self.TEMPERATURE_REGISTER) in self._stale_reads:
+            stale_fields.append('battery_temperature')
+        data['charging_state'] = self.charging_state_from_current(data['battery_current'])
+
+        if self.extended_data:
+            data.update(self.read_solar_chargers(stale_fields))
+            if self.inverter_unit is not None:
+                data.update(self.read_block(self.inverter_unit, self.INVERTER_BLOCK, self.INVERTER_FIELDS, stale_fields))
+            else:
+                data.update(self.decode_fields(None, 0, self.INVERTER_FIELDS))
+
+        # Fields served from last-known values because their block failed
+        data['stale_fields'] = stale_fields
+        return data
+
+    def read_solar_chargers(self, stale_fields=None):
+        """
+        Read all solar chargers and combine them into one set of fields
+
+        PV power and yield are summed and PV voltage is the highest of the
+        chargers. A total is None if any charger could not be read.
+
+        Args:
+            stale_fields: Optional list collecting stale field names
+
+        Returns:
+            Dictionary of solar field name -> combined value
+        """
+        if len(self.solar_units) == 1:
+            return self.read_block(self.solar_units[0], self.SOLAR_BLOCK, self.SOLAR_FIELDS, stale_fields)
+
+        combined = self.decode_fields(None, 0, self.SOLAR_FIELDS)
+        readings = [self.read_block(unit_id, self.SOLAR_BLOCK, self.SOLAR_FIELDS, stale_fields)
+                    for unit_id in self.solar_units]
+        if readings and all(reading['pv_power'] is not None for reading in readings):
+            combined['pv_power'] = sum(reading['pv_power'] for reading in readings)
+            combined['solar_yield_today'] = sum(reading['solar_yield_today'] for reading in readings)
+            combined['pv_voltage'] = max(reading['pv_voltage'] for reading in readings)
+        if stale_fields:
+            # Several chargers report the same names; keep each once
+            unique = []
+            for name in stale_fields:
+                if name not in unique:
+                    unique.append(name)
+            stale_fields[:] = unique
+        return combined
+
+    def read_block(self, unit_id, block, fields, stale_fields=None):
+        """
+        Read a contiguous register block with one request and decode its fields
+
+        Args:
+            unit_id: Modbus unit ID
+            block: (start register, register count)
+            fields: Tuple of (name, register, scale, signed) within the block
+            stale_fields: Optional list; field names are appended if the
+                          block was served from last-known values
+
+        Returns:
+            Dictionary of field name -> decoded value (all None on error)
+        """
+        start, count = block
+        values = self.read_input_register(start, count, unit_id)
+        if stale_fields is not None and (unit_id, start) in self._stale_reads:
+            stale_fields.extend(field[0] for field in fields)
+        return self.decode_fields(values, start, fields)
+
+    @staticmethod
+    def decode_fields(values, start, fields):
+        """
+        Decode raw register values of a block
+
+        Args:
+            values: Raw register values starting at register start (or None)
+            start: Register address of values[0]
+            fields: Tuple of (name, register, scale, signed)
+
+        Returns:
+            Dictionary of field name -> scaled value (None if unavailable)
+        """
+        data = {}
+        for name, register, scale, signed in fields:
+            offset = register - start
+            if values is None or offset >= len(values):
+                data[name] = None
+                continue
+            value = values[offset]
+            if signed and value > 32767:  # Two's complement
+                value -= 65536
+            data[name] = value * scale
         return data
 
+    def reset_socket(self):
+        """
+        Close the Modbus socket so a request hung on it fails; reconnects
+        before the next request. Does not block (called after a failed
+        request and by supervisor.py)
+        """
+        sock = getattr(self.client, '_sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._reconnect = True
+
     def close(self):
         """Close the Modbus connection"""
+        if self.recorder:
+            self.recorder.close()
+        self.invalidate_cache()
         if self.client:
             # Note: micropython-modbus TCP client doesn't have explicit close
             self.client = None
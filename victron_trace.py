@@ -0,0 +1,154 @@
+"""
+Victron Modbus trace recording
+Captures raw Modbus register responses with timestamps into a compact
+binary file that ReplayVictronClient can play back
+
+File format (little endian):
+    Header:  b"VTRC", version (u8)
+    Record:  time_ms (u32), function_code (u8), unit_id (u8),
+             register (u16), count (u8), then count x u16 values
+    - time_ms is milliseconds since the start of the recording
+    - A failed read sets bit 0x80 in function_code and stores no values
+      (the Modbus exception convention)
+    - function_code 0 marks the start of a read_all_data() cycle
+"""
+
+import struct
+import time
+
+try:
+    from time import ticks_ms, ticks_diff
+except ImportError:  # CPython (host-side replay and benchmarking)
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+TRACE_MAGIC = b"VTRC"
+TRACE_VERSION = 1
+
+HEADER_FORMAT = "<4sB"
+RECORD_FORMAT = "<IBBHB"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+FC_CYCLE_MARK = 0
+FC_ERROR_FLAG = 0x80
+
+
+class TraceRecorder:
+    """Appends Modbus responses to a trace file, buffering writes to spare flash"""
+
+    def __init__(self, path, flush_bytes=512):
+        """
+        Create a new trace file
+
+        Args:
+            path: Trace file path (overwritten)
+            flush_bytes: Buffered bytes before writing to the file
+        """
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self._file = open(path, "wb")
+        self._file.write(struct.pack(HEADER_FORMAT, TRACE_MAGIC, TRACE_VERSION))
+        self._buffer = bytearray()
+
+        # Accumulate tick deltas so the u32 timestamp outlives ticks_ms wraparound
+        self._last_ticks = ticks_ms()
+        self._elapsed_ms = 0
+
+        self.record_count = 0
+        self.byte_count = HEADER_SIZE
+
+    def _now(self):
+        """Milliseconds since the recording started"""
+        now = ticks_ms()
+        self._elapsed_ms += ticks_diff(now, self._last_ticks)
+        self._last_ticks = now
+        return self._elapsed_ms & 0xFFFFFFFF
+
+    def record(self, function_code, unit_id, register_addr, count, values):
+        """
+        Record one Modbus response
+
+        Args:
+            function_code: Modbus function code (3 or 4)
+            unit_id: Modbus unit ID
+            register_addr: Starting register address
+            count: Number of registers requested
+            values: Raw register values, or None if the read failed
+        """
+        if self._file is None:
+            return
+
+        if values is None:
+            self._buffer += struct.pack(RECORD_FORMAT, self._now(),
+                                        function_code | FC_ERROR_FLAG, unit_id, register_addr, count)
+        else:
+            self._buffer += struct.pack(RECORD_FORMAT, self._now(),
+                                        function_code, unit_id, register_addr, len(values))
+            if values:
+                self._buffer += struct.pack(f"<{len(values)}H", *[v & 0xFFFF for v in values])
+
+        self.record_count += 1
+        if len(self._buffer) >= self.flush_bytes:
+            self.flush()
+
+    def mark_cycle(self):
+        """Record the start of a read_all_data() cycle"""
+        self.record(FC_CYCLE_MARK, 0, 0, 0, ())
+
+    def flush(self):
+        """Write buffered records to the file"""
+        if self._file is None or not self._buffer:
+            return
+        self._file.write(self._buffer)
+        self._file.flush()
+        self.byte_count += len(self._buffer)
+        self._buffer = bytearray()
+
+    def close(self):
+        """Flush and close the trace file"""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        print(f"Trace: {self.record_count} records, {self.byte_count} bytes written to {self.path}")
+
+
+def read_trace(path):
+    """
+    Iterate over the records in a trace file
+
+    Args:
+        path: Trace file path
+
+    Yields:
+        Tuples of (time_ms, function_code, unit_id, register, count, values).
+        function_code has the error flag stripped; values is None for a
+        failed read and an empty tuple for a cycle mark.
+
+    Raises:
+        ValueError: If the file is not a supported trace
+    """
+    with open(path, "rb") as f:
+        magic, version = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path}: not a version {TRACE_VERSION} Victron trace")
+
+        while True:
+            header = f.read(RECORD_SIZE)
+            if len(header) < RECORD_SIZE:
+                return
+            time_ms, function_code, unit_id, register_addr, count = struct.unpack(RECORD_FORMAT, header)
+
+            if function_code & FC_ERROR_FLAG:
+                yield time_ms, function_code & ~FC_ERROR_FLAG, unit_id, register_addr, count, None
+                continue
+
+            payload = f.read(count * 2)
+            if len(payload) < count * 2:
+                return  # Truncated final record (recording was interrupted)
+            yield time_ms, function_code, unit_id, register_addr, count, struct.unpack(f"<{count}H", payload)
@@ -54,6 +54,15 @@ class WiFiManager:
             self.wlan.disconnect()
             print("WiFi disconnected")
 
+    def reset_link(self):
+        """
+        Drop the association and restart the interface; the main loop
+        reconnects (supervisor.py recovery step)
+        """
+        self.wlan.disconnect()
+        self.wlan.active(False)
+        self.wlan.active(True)
+
     def is_connected(self):
         """Check if connected to WiFi"""
         return self.wlan.isconnected()